@@ -0,0 +1,207 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - availability history
+# Per-entity problem/recovery transitions in SQLite: the last HISTORY_LENGTH
+# transitions of each entity in a fixed-size ring, plus per-day downtime,
+# failure and repair totals updated as each transition arrives. Availability,
+# MTBF and MTTR over a window are sums of at most one row per day, never a
+# rescan of the transition history.
+####################
+
+import sqlite3
+import threading
+import time
+
+
+HISTORY_LENGTH = 100        # transitions kept per entity (oldest overwritten)
+DAILY_RETENTION_DAYS = 31   # per-day totals kept (enough for a 30-day window)
+DAY_SECONDS = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    entity_id TEXT PRIMARY KEY,
+    next_slot INTEGER NOT NULL,     -- ring position of the next transition
+    down_since REAL,                -- start of the current problem, NULL while healthy
+    problem TEXT                    -- type of the current problem
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    entity_id TEXT NOT NULL,
+    slot INTEGER NOT NULL,          -- 0 .. HISTORY_LENGTH - 1
+    ts REAL NOT NULL,
+    problem TEXT,                   -- problem type, NULL for a recovery
+    PRIMARY KEY (entity_id, slot)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily (
+    entity_id TEXT NOT NULL,
+    day INTEGER NOT NULL,           -- UTC day number (epoch // 86400)
+    down_seconds REAL NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    recoveries INTEGER NOT NULL DEFAULT 0,
+    repair_seconds REAL NOT NULL DEFAULT 0,     -- outage lengths, booked on the day of recovery
+    PRIMARY KEY (entity_id, day)
+) WITHOUT ROWID;
+"""
+
+
+def _day(ts):
+    return int(ts // DAY_SECONDS)
+
+
+class AvailabilityHistory:
+    """Transition history and windowed availability per entity.
+
+    Usage (check thread records, menu thread reports):
+        history.problem("light.porch", "unavailable", now)
+        history.recovered("light.porch", now)
+        history.flush()                          # one transaction per cycle
+        history.worst(7 * 86400, limit=20)       # least available entities
+
+    A problem while an entity is already down, or a recovery while it is up,
+    is ignored, so replays and restarts can't double-count. Downtime is only
+    measured from when tracking started (the file was created).
+    """
+
+    def __init__(self, path, now=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = []
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        now = time.time() if now is None else now
+        self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('started', ?)", (now,))
+        self.started = self._db.execute("SELECT value FROM meta WHERE key = 'started'").fetchone()[0]
+        self._pruned_day = None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- recording -----------------------------------------------------------
+
+    def problem(self, entity_id, problem_type, ts):
+        self._pending.append((entity_id, problem_type, ts))
+
+    def recovered(self, entity_id, ts):
+        self._pending.append((entity_id, None, ts))
+
+    def flush(self):
+        """Apply pending transitions in one transaction. Returns the number applied."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, []
+        applied = 0
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN")
+            try:
+                for entity_id, problem_type, ts in pending:
+                    applied += self._apply(entity_id, problem_type, ts)
+                today = _day(pending[-1][2])
+                if today != self._pruned_day:
+                    db.execute("DELETE FROM daily WHERE day < ?", (today - DAILY_RETENTION_DAYS,))
+                    self._pruned_day = today
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return applied
+
+    def _apply(self, entity_id, problem_type, ts):
+        db = self._db
+        row = db.execute("SELECT next_slot, down_since FROM entities WHERE entity_id = ?", (entity_id,)).fetchone()
+        next_slot, down_since = row if row is not None else (0, None)
+        if problem_type is not None:
+            if down_since is not None:
+                return 0
+            self._add_daily(entity_id, _day(ts), failures=1)
+            down_since = ts
+        else:
+            if down_since is None:
+                return 0
+            # Book the outage's downtime on each day it spans
+            start = max(down_since, self.started)
+            while start < ts:
+                end = min(ts, (_day(start) + 1) * DAY_SECONDS)
+                self._add_daily(entity_id, _day(start), down_seconds=end - start)
+                start = end
+            self._add_daily(entity_id, _day(ts), recoveries=1, repair_seconds=ts - down_since)
+            down_since = None
+        db.execute("INSERT OR REPLACE INTO transitions (entity_id, slot, ts, problem) VALUES (?, ?, ?, ?)",
+                   (entity_id, next_slot % HISTORY_LENGTH, ts, problem_type))
+        db.execute("INSERT OR REPLACE INTO entities (entity_id, next_slot, down_since, problem) VALUES (?, ?, ?, ?)",
+                   (entity_id, next_slot + 1, down_since, problem_type))
+        return 1
+
+    def _add_daily(self, entity_id, day, down_seconds=0.0, failures=0, recoveries=0, repair_seconds=0.0):
+        self._db.execute(
+            "INSERT INTO daily (entity_id, day, down_seconds, failures, recoveries, repair_seconds) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (entity_id, day) DO UPDATE SET "
+            "down_seconds = down_seconds + excluded.down_seconds, failures = failures + excluded.failures, "
+            "recoveries = recoveries + excluded.recoveries, "
+            "repair_seconds = repair_seconds + excluded.repair_seconds",
+            (entity_id, day, down_seconds, failures, recoveries, repair_seconds)
+        )
+
+    # --- reporting -----------------------------------------------------------
+
+    def worst(self, window_seconds, limit=20, now=None, entity_ids=None):
+        """Least available entities over the last `window_seconds` (whole UTC days).
+
+        Returns dicts with entity, availability (%), failures, down_seconds,
+        mtbf and mttr (seconds, None without failures/recoveries) and the
+        current problem (None if healthy), worst first. Entities without
+        downtime or failures in the window are left out; `entity_ids`
+        restricts the result to those entities.
+        """
+        now = time.time() if now is None else now
+        window_start = now - window_seconds
+        observed_from = max(window_start, self.started)
+        observed = now - observed_from
+        if observed <= 0:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT e.entity_id, e.down_since, e.problem, "
+                "COALESCE(SUM(d.down_seconds), 0), COALESCE(SUM(d.failures), 0), "
+                "COALESCE(SUM(d.recoveries), 0), COALESCE(SUM(d.repair_seconds), 0) "
+                "FROM entities e LEFT JOIN daily d ON d.entity_id = e.entity_id AND d.day >= ? "
+                "GROUP BY e.entity_id",
+                (_day(window_start),)
+            ).fetchall()
+        results = []
+        for entity_id, down_since, problem, down, failures, recoveries, repair in rows:
+            if entity_ids is not None and entity_id not in entity_ids:
+                continue
+            if down_since is not None:
+                down += now - max(down_since, observed_from)
+            else:
+                problem = None
+            if not down and not failures:
+                continue
+            down = min(down, observed)
+            results.append({
+                "entity": entity_id,
+                "availability": 100.0 * (1 - down / observed),
+                "failures": failures,
+                "down_seconds": down,
+                "mtbf": (observed - down) / failures if failures else None,
+                "mttr": repair / recoveries if recoveries else None,
+                "problem": problem,
+            })
+        results.sort(key=lambda r: (r["availability"], -r["failures"], r["entity"]))
+        return results[:limit]
+
+    def transitions(self, entity_id, since=0.0):
+        """[(ts, problem_type or None)] from the entity's ring, oldest first."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT ts, problem FROM transitions WHERE entity_id = ? AND ts >= ? ORDER BY ts",
+                (entity_id, since)
+            ).fetchall()
@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - exclude rules
+# Compiles the exclude list (exact entity IDs from the device picker plus
+# glob, regex and domain rules) once into a set, a single regex for the glob
+# and domain rules and one regex per re: rule, so the check cycle pays one
+# dict lookup per entity.
+####################
+
+import fnmatch
+import re
+
+
+def split_rules(raw):
+    """Split a rules setting on semicolons and newlines, dropping blanks."""
+    return [r.strip() for r in (raw or "").replace("\n", ";").split(";") if r.strip()]
+
+
+def split_entity_ids(raw):
+    """Split the picker's entity ID list on commas, semicolons and newlines."""
+    return [e.strip() for e in (raw or "").replace(";", ",").replace("\n", ",").split(",") if e.strip()]
+
+
+def rule_regex(rule):
+    """Regex source matching the whole entity ID for a glob or domain rule.
+
+        domain:button       every entity in the button domain
+        button.*_identify   a glob (* ? [...])
+
+    Raises ValueError if the rule is invalid.
+    """
+    if rule.startswith("domain:"):
+        domain = rule[len("domain:"):].strip()
+        if not domain or "." in domain:
+            raise ValueError(f"'{rule}' is not a valid domain rule")
+        return re.escape(domain + ".") + r".*\Z"
+    return fnmatch.translate(rule)
+
+
+def compile_re_rule(rule):
+    """Compiled regex of an re: rule, e.g. re:(?i)^sensor\\..*_rssi$; raises ValueError if invalid.
+
+    The expression must match the whole entity ID. Each re: rule is compiled
+    on its own rather than into the shared alternation, so inline global
+    flags and numbered backreferences mean what they do in the rule alone.
+    """
+    try:
+        return re.compile(rule[len("re:"):])
+    except re.error as e:
+        raise ValueError(f"'{rule}': {e}")
+
+
+def is_pattern(rule):
+    return rule.startswith(("domain:", "re:")) or any(c in rule for c in "*?[")
+
+
+class ExcludeRules:
+    """Compiled exclude list.
+
+    `match(entity_id)` returns the rule that excludes the entity (the entity
+    ID itself for exact entries, else the first matching pattern) or None.
+    Results are cached per entity ID, so after the first cycle a check is a
+    dict lookup. Build a new instance when the rules change.
+    """
+
+    def __init__(self, entity_ids=(), patterns=()):
+        self.exact = set(entity_ids)
+        self.patterns = []
+        self._re_rules = []     # (index in patterns, compiled regex) of re: rules
+        sources = []
+        for rule in patterns:
+            if not is_pattern(rule):
+                self.exact.add(rule)
+                continue
+            if rule.startswith("re:"):
+                self._re_rules.append((len(self.patterns), compile_re_rule(rule)))
+            else:
+                sources.append(f"(?P<r{len(self.patterns)}>{rule_regex(rule)})")
+            self.patterns.append(rule)
+        self._regex = re.compile("|".join(sources)) if sources else None
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.exact) + len(self.patterns)
+
+    def match(self, entity_id):
+        try:
+            return self._cache[entity_id]
+        except KeyError:
+            pass
+        rule = None
+        if entity_id in self.exact:
+            rule = entity_id
+        else:
+            # First matching rule in setting order, across both kinds
+            first = len(self.patterns)
+            if self._regex is not None:
+                m = self._regex.match(entity_id)
+                if m is not None:
+                    first = int(m.lastgroup[1:])
+            for index, regex in self._re_rules:
+                if index >= first:
+                    break
+                if regex.fullmatch(entity_id) is not None:
+                    first = index
+                    break
+            if first < len(self.patterns):
+                rule = self.patterns[first]
+        self._cache[entity_id] = rule
+        return rule
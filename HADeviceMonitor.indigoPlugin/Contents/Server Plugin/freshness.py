@@ -0,0 +1,189 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - freshness engine
+# Keeps each entity's "goes stale at" deadline in a min-heap so stale
+# detection costs a dict lookup per entity per cycle instead of an ISO
+# timestamp parse, and the scheduler can wake exactly when the next
+# deadline passes. Thresholds can differ per domain, device type and entity.
+####################
+
+import heapq
+from datetime import datetime
+
+
+def parse_ha_timestamp(value):
+    """Parse an HA ISO-8601 timestamp to epoch seconds (None if unparseable)."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class FreshnessTracker:
+    """Tracks when monitored entities go stale.
+
+    `update()` only parses a timestamp when an entity's `last_updated` string
+    changes, and then pushes its new deadline (last_updated plus the entity's
+    threshold). Superseded heap entries are discarded lazily when they reach
+    the top. `pop_expired()` moves entities whose deadline has passed into
+    `stale`; a later update with a fresh timestamp takes them out again.
+    """
+
+    def __init__(self):
+        self._entries = {}   # entity_id -> [last_updated_str, updated_ts, deadline, threshold]
+        self._heap = []      # (deadline, entity_id)
+        self.stale = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._heap = []
+        self.stale.clear()
+
+    def update(self, entity_id, last_updated, now, threshold):
+        """Record the entity's current last_updated and threshold (seconds).
+
+        Returns False if last_updated can't be parsed. A threshold change
+        recomputes the deadline without re-parsing the timestamp.
+        """
+        entry = self._entries.get(entity_id)
+        if entry is not None and entry[0] == last_updated:
+            if entry[1] is None:
+                return False
+            if entry[3] == threshold:
+                return True
+            updated_ts = entry[1]
+        else:
+            updated_ts = parse_ha_timestamp(last_updated) if last_updated else None
+        if updated_ts is None:
+            self._entries[entity_id] = [last_updated, None, None, threshold]
+            self.stale.discard(entity_id)
+            return False
+
+        deadline = updated_ts + threshold
+        self._entries[entity_id] = [last_updated, updated_ts, deadline, threshold]
+        if deadline <= now:
+            self.stale.add(entity_id)
+        else:
+            self.stale.discard(entity_id)
+            heapq.heappush(self._heap, (deadline, entity_id))
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._compact()
+        return True
+
+    def _compact(self):
+        """Rebuild the heap from live deadlines, dropping superseded entries."""
+        self._heap = [
+            (entry[2], entity_id) for entity_id, entry in self._entries.items()
+            if entry[2] is not None and entity_id not in self.stale
+        ]
+        heapq.heapify(self._heap)
+
+    def remove(self, entity_id):
+        if self._entries.pop(entity_id, None) is not None:
+            self.stale.discard(entity_id)
+
+    def retain(self, entity_ids):
+        """Forget entities no longer monitored (heap entries are dropped lazily)."""
+        for entity_id in [e for e in self._entries if e not in entity_ids]:
+            self.remove(entity_id)
+
+    def pop_expired(self, now):
+        """Move every entity whose deadline has passed into `stale`; return the newly stale IDs."""
+        expired = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, entity_id = heapq.heappop(heap)
+            entry = self._entries.get(entity_id)
+            if entry is None or entry[2] != deadline:
+                continue    # superseded by a newer update or removed
+            if entity_id not in self.stale:
+                self.stale.add(entity_id)
+                expired.append(entity_id)
+        return expired
+
+    def next_deadline(self):
+        """Epoch time of the next entity going stale, or None."""
+        heap = self._heap
+        while heap:
+            deadline, entity_id = heap[0]
+            entry = self._entries.get(entity_id)
+            if entry is not None and entry[2] == deadline:
+                return deadline
+            heapq.heappop(heap)
+        return None
+
+    def age_minutes(self, entity_id, now):
+        entry = self._entries.get(entity_id)
+        if entry is None or entry[1] is None:
+            return None
+        return (now - entry[1]) / 60.0
+
+    def threshold_minutes(self, entity_id):
+        entry = self._entries.get(entity_id)
+        return entry[3] / 60.0 if entry is not None else None
+
+
+class StaleThresholds:
+    """Resolves the stale threshold of each monitored device.
+
+    Overrides are "key=minutes" rules separated by semicolons or newlines,
+    where key is "domain:<domain>", "type:<deviceTypeId>" or an entity ID.
+    The most specific rule wins: entity ID, then device type, then domain,
+    then the default. 0 disables the stale check for that class. Results are
+    memoized, so a lookup is one dict access once a device has been seen.
+    """
+
+    def __init__(self, default_minutes, overrides=""):
+        self.default = default_minutes * 60
+        self.domains = {}
+        self.types = {}
+        self.entities = {}
+        for rule in (overrides or "").replace("\n", ";").split(";"):
+            rule = rule.strip()
+            if not rule:
+                continue
+            key, sep, value = rule.rpartition("=")
+            key = key.strip()
+            try:
+                minutes = int(value) if sep and key else None
+            except ValueError:
+                minutes = None
+            if minutes is None or minutes < 0:
+                raise ValueError(f"'{rule}' is not key=minutes")
+            if key.startswith("domain:"):
+                self.domains[key[len("domain:"):].strip()] = minutes * 60
+            elif key.startswith("type:"):
+                self.types[key[len("type:"):].strip()] = minutes * 60
+            else:
+                self.entities[key] = minutes * 60
+        self._memo = {}
+
+    @property
+    def enabled(self):
+        """True if any device can go stale."""
+        return self.default > 0 or any(
+            v > 0 for table in (self.domains, self.types, self.entities) for v in table.values()
+        )
+
+    @property
+    def override_count(self):
+        return len(self.domains) + len(self.types) + len(self.entities)
+
+    def seconds(self, entity_id, device_type):
+        """Threshold in seconds for a device (0 = not checked)."""
+        key = (entity_id, device_type)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        threshold = self.entities.get(entity_id)
+        if threshold is None:
+            threshold = self.types.get(device_type)
+        if threshold is None:
+            threshold = self.domains.get(entity_id.split(".", 1)[0], self.default)
+        self._memo[key] = threshold
+        return threshold
@@ -0,0 +1,488 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - Home Assistant REST API helpers
+# Keep-alive connection pool, streaming parser for the /api/states response,
+# the compact /api/template projection and per-instance fetch state with a
+# circuit breaker.
+####################
+
+import codecs
+import fnmatch
+import gzip
+import http.client
+import json
+import re
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from rename_index import RenameIndex
+
+
+CHUNK_SIZE = 64 * 1024
+
+# Circuit breaker: after a failed fetch an instance is left alone for
+# BREAKER_MIN_SECONDS, doubling per consecutive failure up to BREAKER_MAX_SECONDS
+BREAKER_MIN_SECONDS = 30
+BREAKER_MAX_SECONDS = 600
+
+# Rendered by HA for POST /api/template. The first line is the total entity
+# count; then one "entity_id|state|last_updated" line per requested ID that
+# exists (climate lines add "|current_temperature", empty when it is unset
+# or null - Jinja would render None as "None") and "!entity_id" for IDs HA
+# doesn't know. `ids` is passed as a template variable so the template text
+# itself never changes.
+STATES_TEMPLATE = (
+    "{{ states | count }}"
+    "{% for id in ids %}{{ '\\n' }}"
+    "{% set s = states[id] %}"
+    "{% if s %}{{ id }}|{{ s.state | replace('\\n', ' ') }}|{{ s.last_updated.isoformat() }}"
+    "{% if id.startswith('climate.') %}{% set t = s.attributes.get('current_temperature') %}"
+    "|{{ t if t is not none else '' }}{% endif %}"
+    "{% else %}!{{ id }}{% endif %}"
+    "{% endfor %}"
+)
+
+_WHITESPACE = " \t\r\n"
+
+
+def project_state(state):
+    """Reduce a full HA state object to the fields the checks actually use.
+
+    Climate entities also keep "value" (current_temperature), the reading the
+    stuck-value check follows, since their state is the HVAC mode.
+    """
+    projected = {
+        "entity_id": state["entity_id"],
+        "state": state.get("state", ""),
+        "last_updated": state.get("last_updated", ""),
+    }
+    if projected["entity_id"].startswith("climate."):
+        projected["value"] = (state.get("attributes") or {}).get("current_temperature")
+    return projected
+
+
+def parse_template_states(text):
+    """Parse the rendered STATES_TEMPLATE into ({entity_id: projected_state}, total)."""
+    lines = text.split("\n")
+    total = int(lines[0])
+    entities = {}
+    for line in lines[1:]:
+        if not line or line.startswith("!"):
+            continue
+        # state is the middle field and may itself contain "|"; climate
+        # lines end with an extra current_temperature field
+        entity_id, _, rest = line.partition("|")
+        value = None
+        if entity_id.startswith("climate."):
+            rest, _, value = rest.rpartition("|")
+        state, _, last_updated = rest.rpartition("|")
+        entities[entity_id] = {"entity_id": entity_id, "state": state, "last_updated": last_updated}
+        if value is not None:
+            entities[entity_id]["value"] = value or None
+    return entities, total
+
+
+def iter_json_array(fp, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array read incrementally from fp.
+
+    Only one chunk plus the element currently being decoded is held in memory,
+    instead of the whole response body, its decoded copy and every parsed dict.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+    # Minimum buffer length before retrying a failed decode; doubles on each
+    # failure so a very large element costs O(n) re-scans, not O(n^2)
+    need = 0
+
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buf) and (buf[pos] in _WHITESPACE or (started and buf[pos] == ",")):
+            pos += 1
+
+        if pos < len(buf) and len(buf) - pos >= need:
+            ch = buf[pos]
+            if not started:
+                if ch != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if ch == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                need = max(need, len(buf) - pos) * 2
+            else:
+                need = 0
+                pos = end
+                yield element
+                continue
+        elif eof:
+            if need and pos < len(buf):
+                need = 0
+                continue
+            raise ValueError("Truncated JSON array")
+
+        # Refill: drop consumed text, append the next chunk
+        chunk = fp.read(chunk_size)
+        buf = buf[pos:] + utf8.decode(chunk or b"", final=not chunk)
+        pos = 0
+        if not chunk:
+            eof = True
+
+
+def parse_states_stream(fp, wanted=None, chunk_size=CHUNK_SIZE, all_ids=None):
+    """Parse an /api/states response body into {entity_id: projected_state}.
+
+    If `wanted` is given, entities not in it are dropped as soon as they are
+    decoded. Every entity ID seen is appended to the `all_ids` list, if given.
+    Returns (entities, total_entity_count).
+    """
+    entities = {}
+    total = 0
+    for state in iter_json_array(fp, chunk_size):
+        total += 1
+        entity_id = state.get("entity_id")
+        if entity_id is None:
+            continue
+        if all_ids is not None:
+            all_ids.append(entity_id)
+        if wanted is not None and entity_id not in wanted:
+            continue
+        entities[entity_id] = project_state(state)
+    return entities, total
+
+
+# -----------------------------------------------------------------------------
+# Connection layer
+# -----------------------------------------------------------------------------
+
+class HAHTTPError(Exception):
+    """Non-2xx response from Home Assistant."""
+
+    def __init__(self, code, reason):
+        super().__init__(f"{code}: {reason}")
+        self.code = code
+        self.reason = reason
+
+
+# Errors on a reused keep-alive socket that mean "server closed it while idle";
+# the request is retried once on a fresh connection
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+class _CountingReader:
+    """File-like wrapper that counts the bytes read from the wire."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.fp.read(size)
+        self.count += len(data)
+        return data
+
+    def readable(self):
+        return True
+
+
+_ssl_context = None
+_ssl_context_lock = threading.Lock()
+
+
+def shared_ssl_context():
+    """One SSL context for every HA connection (allows self-signed certificates)."""
+    global _ssl_context
+    with _ssl_context_lock:
+        if _ssl_context is None:
+            ctx = ssl.create_default_context()
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+            _ssl_context = ctx
+        return _ssl_context
+
+
+class HAClient:
+    """Keep-alive HTTP(S) client for one HA base URL.
+
+    Idle connections are pooled and reused, so a steady polling loop pays for
+    TCP and TLS setup once. Responses are requested gzip-compressed and handed
+    to the caller as a file-like stream. `last_timing` holds the connect, TTFB
+    and transfer times (ms), parser CPU time (ms) and wire bytes of the most
+    recent request;
+    `bytes_received` is a running total across all requests and threads.
+    """
+
+    def __init__(self, base_url, token, timeout=15, max_idle=8):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.secure = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.secure else 80)
+        self.token = token
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._busy = set()      # connections checked out by a request in progress
+        self.aborted = False
+        self._lock = threading.Lock()
+        self.last_timing = None
+        self.connections_opened = 0
+        self.bytes_received = 0
+
+    def _new_connection(self):
+        if self.secure:
+            conn = http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout, context=shared_ssl_context()
+            )
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        start = time.perf_counter()
+        conn.connect()
+        self.connections_opened += 1
+        return conn, (time.perf_counter() - start) * 1000
+
+    def _checkout(self):
+        with self._lock:
+            if self.aborted:
+                raise ConnectionAbortedError("HA request aborted")
+            if self._idle:
+                conn = self._idle.pop()
+                self._busy.add(conn)
+                return conn, 0.0, True
+        conn, connect_ms = self._new_connection()
+        with self._lock:
+            self._busy.add(conn)
+        return conn, connect_ms, False
+
+    def _checkin(self, conn):
+        with self._lock:
+            self._busy.discard(conn)
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _drop(self, conn):
+        with self._lock:
+            self._busy.discard(conn)
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def abort(self):
+        """Close all connections and refuse new requests; requests blocked on
+        other threads fail straight away."""
+        with self._lock:
+            self.aborted = True
+            busy = list(self._busy)
+        for conn in busy:
+            if conn.sock is not None:
+                try:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.close()
+
+    def request(self, method, path, body=None, parse=None):
+        """Send a request and return (status, parse(stream)).
+
+        `parse` receives a file-like object yielding the decompressed body; if
+        omitted the raw body bytes are returned. Raises HAHTTPError for any
+        non-2xx status and OSError/http.client.HTTPException for transport errors.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip",
+        }
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+
+        for attempt in (1, 2):
+            conn, connect_ms, reused = self._checkout()
+            try:
+                start = time.perf_counter()
+                conn.request(method, path, body=payload, headers=headers)
+                resp = conn.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                self._drop(conn)
+                if reused and attempt == 1:
+                    # Other idle sockets have likely timed out too
+                    self.close()
+                    continue
+                raise
+            except Exception:
+                self._drop(conn)
+                raise
+            break
+
+        try:
+            ttfb_ms = (time.perf_counter() - start) * 1000
+            wire = _CountingReader(resp)
+            stream = wire
+            if (resp.getheader("Content-Encoding") or "").lower() == "gzip":
+                stream = gzip.GzipFile(fileobj=wire)
+
+            if not 200 <= resp.status < 300:
+                resp.read()
+                raise HAHTTPError(resp.status, resp.reason)
+
+            cpu_start = time.thread_time()
+            result = parse(stream) if parse is not None else stream.read()
+            parse_cpu_ms = (time.thread_time() - cpu_start) * 1000
+            wire.read()     # drain anything the parser left so the socket can be reused
+            transfer_ms = (time.perf_counter() - start) * 1000 - ttfb_ms
+        except HAHTTPError:
+            self._release(conn, resp)
+            raise
+        except Exception:
+            self._drop(conn)
+            raise
+
+        self._release(conn, resp)
+        with self._lock:
+            self.bytes_received += wire.count
+        self.last_timing = {
+            "connect_ms": int(connect_ms),
+            "ttfb_ms": int(ttfb_ms),
+            "transfer_ms": int(transfer_ms),
+            "bytes": wire.count,
+            "parse_cpu_ms": parse_cpu_ms,
+            "reused": reused,
+        }
+        return resp.status, result
+
+    def _release(self, conn, resp):
+        if resp.will_close:
+            self._drop(conn)
+        else:
+            self._checkin(conn)
+
+    def get_state(self, entity_id):
+        """Fetch one entity via /api/states/<entity_id>; returns None if HA answers 404."""
+        try:
+            _, state = self.request("GET", f"/api/states/{quote(entity_id, safe='.')}", parse=json.load)
+        except HAHTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+        return project_state(state)
+
+    def render_states_template(self, entity_ids):
+        """Fetch entity_ids through one POST /api/template; returns (entities, total)."""
+        body = {"template": STATES_TEMPLATE, "variables": {"ids": sorted(entity_ids)}}
+        _, text = self.request("POST", "/api/template", body=body,
+                               parse=lambda fp: fp.read().decode("utf-8"))
+        return parse_template_states(text)
+
+
+class HAInstance:
+    """Connection and fetch state for one Home Assistant server.
+
+    `patterns` are entity ID globs (fnmatch) that route devices to this
+    instance; the primary instance (from the HA Agent) has none and takes
+    every entity no other instance claims.
+    """
+
+    def __init__(self, name, base_url=None, token=None, patterns=()):
+        self.name = name
+        self.base_url = base_url
+        self.token = token
+        self.patterns = tuple(patterns)
+        self._regex = re.compile("|".join(fnmatch.translate(p) for p in self.patterns)) if self.patterns else None
+        self.client = None
+        self.entity_total = None        # total HA entities seen by the last bulk fetch
+        self.last_bulk_fetch = 0.0      # time of the last /api/states fetch (entity total and ID set)
+        self.last_fetch_strategy = None     # "bulk", "template", "targeted" or "websocket"
+        self.template_fetch_failed = False  # log the /api/template fallback once, not every cycle
+        self.last_response_ms = None
+        self.last_timing = None         # HAClient.last_timing of the last bulk/template fetch
+        self.last_error = None          # message of the last failed fetch, None once it succeeds
+        self.payload_bytes = None       # wire bytes of the last fetch
+        self.monitored = 0              # monitored entities routed here in the last cycle
+        self.failures = 0               # consecutive failed fetches (circuit breaker)
+        self.down_since = None          # time of the first failure in the current run
+        self.retry_at = 0.0             # no fetch before this while the breaker is open
+        self.entity_ids = None          # every entity ID from the last /api/states fetch or WebSocket sync
+        self.entity_ids_version = None  # HAEventStream.entity_set_version the IDs came from
+        self._rename_index = None
+
+    def matches(self, entity_id):
+        return self._regex is not None and self._regex.match(entity_id) is not None
+
+    def reconfigure(self, base_url, token):
+        """Point at a new URL/token; the pooled connection is dropped if either changed."""
+        if (base_url, token) != (self.base_url, self.token):
+            self.close()
+            self.base_url = base_url
+            self.token = token
+
+    def breaker_open(self, now):
+        return self.failures > 0 and now < self.retry_at
+
+    def record_failure(self, now):
+        """Count a failed fetch; returns the backoff (seconds) before the next attempt."""
+        if self.failures == 0:
+            self.down_since = now
+        self.failures += 1
+        backoff = min(BREAKER_MAX_SECONDS, BREAKER_MIN_SECONDS * 2 ** (self.failures - 1))
+        self.retry_at = now + backoff
+        return backoff
+
+    def record_success(self):
+        self.failures = 0
+        self.down_since = None
+        self.retry_at = 0.0
+
+    def set_entity_ids(self, entity_ids, version=None):
+        """Record the full entity ID set; the rename index is rebuilt on next use if it changed."""
+        if entity_ids != self.entity_ids:
+            self._rename_index = None
+        self.entity_ids = entity_ids
+        self.entity_ids_version = version
+
+    def rename_index(self):
+        """RenameIndex over entity_ids (built once per entity set), or None if no IDs are known."""
+        if self._rename_index is None and self.entity_ids is not None:
+            self._rename_index = RenameIndex(self.entity_ids)
+        return self._rename_index
+
+    def abort(self):
+        """Break off any request in progress (used when a check cycle overruns its deadline).
+
+        The aborted client is dropped; the next fetch opens a new one.
+        """
+        client, self.client = self.client, None
+        if client is not None:
+            client.abort()
+
+    def get_client(self):
+        if self.client is None:
+            self.client = HAClient(self.base_url, self.token)
+        return self.client
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
@@ -0,0 +1,415 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - Home Assistant WebSocket event stream
+# Minimal stdlib-only RFC 6455 client plus a background thread that keeps an
+# in-memory entity table in sync with HA via subscribe_events/get_states.
+####################
+
+import base64
+import hashlib
+import json
+import os
+import select
+import socket
+import ssl
+import struct
+import threading
+import time
+from urllib.parse import urlsplit
+
+from ha_api import project_state
+
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+UNAVAILABLE_STATES = ("unavailable", "unknown")
+
+
+class WebSocketError(Exception):
+    pass
+
+
+class WebSocketClosed(WebSocketError):
+    pass
+
+
+class WebSocketClient:
+    """Blocking WebSocket client (text frames only, no extensions)."""
+
+    def __init__(self, url, ssl_context=None, timeout=15):
+        self.url = url
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.sock = None
+
+    def connect(self):
+        parts = urlsplit(self.url)
+        secure = parts.scheme == "wss"
+        host = parts.hostname
+        port = parts.port or (443 if secure else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        sock = socket.create_connection((host, port), timeout=self.timeout)
+        try:
+            if secure:
+                ctx = self.ssl_context or ssl.create_default_context()
+                sock = ctx.wrap_socket(sock, server_hostname=host)
+
+            key = base64.b64encode(os.urandom(16)).decode("ascii")
+            request = (
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {host}:{port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n"
+                "\r\n"
+            )
+            sock.sendall(request.encode("ascii"))
+
+            response = b""
+            while b"\r\n\r\n" not in response:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    raise WebSocketError("Connection closed during handshake")
+                response += chunk
+                if len(response) > 65536:
+                    raise WebSocketError("Handshake response too large")
+
+            header_blob, _, leftover = response.partition(b"\r\n\r\n")
+            header_lines = header_blob.decode("latin-1").split("\r\n")
+            status = header_lines[0].split(" ", 2)
+            if len(status) < 2 or status[1] != "101":
+                raise WebSocketError(f"Handshake rejected: {header_lines[0]}")
+
+            headers = {}
+            for line in header_lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            expected = base64.b64encode(
+                hashlib.sha1((key + WS_GUID).encode("ascii")).digest()
+            ).decode("ascii")
+            if headers.get("sec-websocket-accept") != expected:
+                raise WebSocketError("Handshake failed: bad Sec-WebSocket-Accept")
+        except Exception:
+            sock.close()
+            raise
+
+        self.sock = sock
+        self._buffer = bytearray(leftover)
+
+    def close(self):
+        if self.sock is None:
+            return
+        try:
+            self._send_frame(OP_CLOSE, struct.pack("!H", 1000))
+        except Exception:
+            pass
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+        self.sock = None
+
+    # --- sending -------------------------------------------------------------
+
+    def send_json(self, obj):
+        self._send_frame(OP_TEXT, json.dumps(obj).encode("utf-8"))
+
+    def _send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 65536:
+            header.append(0x80 | 126)
+            header += struct.pack("!H", length)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack("!Q", length)
+        mask = os.urandom(4)
+        header += mask
+        self.sock.sendall(bytes(header) + _apply_mask(payload, mask))
+
+    # --- receiving -----------------------------------------------------------
+
+    def recv_json(self, timeout):
+        """Return the next JSON message, or None if nothing arrived within timeout."""
+        text = self.recv_text(timeout)
+        if text is None:
+            return None
+        return json.loads(text)
+
+    def recv_text(self, timeout):
+        if not self._readable(timeout):
+            return None
+
+        message = bytearray()
+        message_started = False
+        while True:
+            fin, opcode, payload = self._recv_frame()
+            if opcode == OP_PING:
+                self._send_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                raise WebSocketClosed("Server closed the connection")
+            if opcode in (OP_TEXT, OP_BINARY):
+                message = bytearray(payload)
+                message_started = True
+            elif opcode == OP_CONT and message_started:
+                message += payload
+            else:
+                raise WebSocketError(f"Unexpected opcode {opcode}")
+            if fin:
+                return message.decode("utf-8")
+
+    def _readable(self, timeout):
+        if self._buffer:
+            return True
+        if isinstance(self.sock, ssl.SSLSocket) and self.sock.pending():
+            return True
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        return bool(readable)
+
+    def _recv_exact(self, count):
+        while len(self._buffer) < count:
+            chunk = self.sock.recv(max(65536, count - len(self._buffer)))
+            if not chunk:
+                raise WebSocketClosed("Connection closed by peer")
+            self._buffer += chunk
+        data = bytes(self._buffer[:count])
+        del self._buffer[:count]
+        return data
+
+    def _recv_frame(self):
+        b1, b2 = self._recv_exact(2)
+        fin = bool(b1 & 0x80)
+        opcode = b1 & 0x0F
+        masked = bool(b2 & 0x80)
+        length = b2 & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self._recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._recv_exact(8))[0]
+        mask = self._recv_exact(4) if masked else None
+        payload = self._recv_exact(length) if length else b""
+        if mask:
+            payload = _apply_mask(payload, mask)
+        return fin, opcode, payload
+
+
+def _apply_mask(payload, mask):
+    if not payload:
+        return b""
+    # XOR whole payload at once via int arithmetic (much faster than a per-byte loop)
+    repeated = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(payload), "big")
+
+
+class HAEventStream(threading.Thread):
+    """Keeps an entity table in sync with Home Assistant over /api/websocket.
+
+    After each (re)connect the stream subscribes to state_changed, requests a
+    full get_states snapshot and replaces the table, so a dropped connection
+    always resyncs. `changed` is set (and `on_change` called) whenever
+    something the check cycle cares about happens: an entity appearing or
+    disappearing, an entity moving in or out of unavailable/unknown, or any
+    update to a watched entity_id.
+    """
+
+    HEARTBEAT_INTERVAL = 30     # seconds of silence before we send a ping
+    HEARTBEAT_TIMEOUT = 15      # seconds to wait for the pong
+    MAX_BACKOFF = 60
+
+    def __init__(self, base_url, token, logger, ssl_context=None, on_change=None):
+        super().__init__(name="HAEventStream", daemon=True)
+        scheme, _, rest = base_url.partition("://")
+        ws_scheme = "wss" if scheme == "https" else "ws"
+        self.url = f"{ws_scheme}://{rest}/api/websocket"
+        self.token = token
+        self.logger = logger
+        self.ssl_context = ssl_context
+        self.on_change = on_change
+
+        self.changed = threading.Event()
+        self.synced = threading.Event()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._entities = {}
+        self._watched = frozenset()
+        self._client = None
+        self._msg_id = 0
+        self.events_applied = 0
+        self.reconnects = 0
+        self.last_sync_ms = None
+        self.entity_set_version = 0     # bumped whenever an entity is added or removed
+
+    # --- public API ----------------------------------------------------------
+
+    def snapshot(self):
+        """Return a copy of the entity table, or None if not currently synced."""
+        if not self.synced.is_set():
+            return None
+        with self._lock:
+            return dict(self._entities)
+
+    def set_watched(self, entity_ids):
+        """Entity IDs whose every update should wake the check loop (e.g. known problems)."""
+        self._watched = frozenset(entity_ids)
+
+    def stop(self):
+        self._stop_event.set()
+        client = self._client
+        if client is not None:
+            client.close()
+
+    # --- thread body ---------------------------------------------------------
+
+    def run(self):
+        backoff = 1
+        while not self._stop_event.is_set():
+            try:
+                self._session()
+                backoff = 1
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                self.logger.warning(f"HA WebSocket disconnected ({e}) - reconnecting in {backoff}s")
+            finally:
+                self.synced.clear()
+                if self._client is not None:
+                    self._client.close()
+                    self._client = None
+            if self._stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.MAX_BACKOFF)
+            self.reconnects += 1
+
+    def _next_id(self):
+        self._msg_id += 1
+        return self._msg_id
+
+    def _session(self):
+        self._msg_id = 0
+        client = WebSocketClient(self.url, ssl_context=self.ssl_context)
+        client.connect()
+        self._client = client
+
+        msg = client.recv_json(15)
+        if not msg or msg.get("type") != "auth_required":
+            raise WebSocketError(f"Unexpected greeting: {msg}")
+        client.send_json({"type": "auth", "access_token": self.token})
+        msg = client.recv_json(15)
+        if not msg or msg.get("type") != "auth_ok":
+            # Invalid token will not fix itself quickly; back off hard
+            self._stop_event.wait(self.MAX_BACKOFF)
+            raise WebSocketError(f"Authentication failed: {msg.get('message', msg) if msg else 'timeout'}")
+
+        # Subscribe before snapshotting so no change can fall between the two
+        subscribe_id = self._next_id()
+        client.send_json({"id": subscribe_id, "type": "subscribe_events", "event_type": "state_changed"})
+        states_id = self._next_id()
+        sync_start = time.time()
+        client.send_json({"id": states_id, "type": "get_states"})
+
+        pending_events = []
+        ping_id = None
+        last_rx = time.time()
+
+        while not self._stop_event.is_set():
+            msg = client.recv_json(1.0)
+            now = time.time()
+
+            if msg is None:
+                if ping_id is not None and now - last_rx > self.HEARTBEAT_INTERVAL + self.HEARTBEAT_TIMEOUT:
+                    raise WebSocketError("Heartbeat timed out")
+                if ping_id is None and now - last_rx > self.HEARTBEAT_INTERVAL:
+                    ping_id = self._next_id()
+                    client.send_json({"id": ping_id, "type": "ping"})
+                continue
+
+            last_rx = now
+            msg_type = msg.get("type")
+
+            if msg_type == "event" and msg.get("id") == subscribe_id:
+                data = msg.get("event", {}).get("data", {})
+                if self.synced.is_set():
+                    self._apply_event(data)
+                else:
+                    pending_events.append(data)
+
+            elif msg_type == "result" and msg.get("id") == states_id:
+                if not msg.get("success"):
+                    raise WebSocketError(f"get_states failed: {msg.get('error')}")
+                self._load_snapshot(msg.get("result") or [], pending_events)
+                pending_events = []
+                self.last_sync_ms = int((time.time() - sync_start) * 1000)
+                self.logger.debug(
+                    f"HA WebSocket synced {len(self._entities)} entities ({self.last_sync_ms}ms)"
+                )
+
+            elif msg_type == "result" and msg.get("id") == subscribe_id:
+                if not msg.get("success"):
+                    raise WebSocketError(f"subscribe_events failed: {msg.get('error')}")
+
+            elif msg_type == "pong" and msg.get("id") == ping_id:
+                ping_id = None
+
+    def _load_snapshot(self, states, pending_events):
+        table = {s["entity_id"]: project_state(s) for s in states if "entity_id" in s}
+        # Replay events that raced the snapshot, keeping whichever is newer
+        for data in pending_events:
+            entity_id = data.get("entity_id")
+            new_state = data.get("new_state")
+            if new_state is None:
+                table.pop(entity_id, None)
+                continue
+            current = table.get(entity_id)
+            if current is None or new_state.get("last_updated", "") >= current["last_updated"]:
+                table[entity_id] = project_state(new_state)
+        with self._lock:
+            self._entities = table
+            self.entity_set_version += 1
+        self.synced.set()
+        self._signal_change()
+
+    def _apply_event(self, data):
+        entity_id = data.get("entity_id")
+        if not entity_id:
+            return
+        new_state = data.get("new_state")
+        with self._lock:
+            old = self._entities.get(entity_id)
+            if new_state is None:
+                self._entities.pop(entity_id, None)
+            else:
+                self._entities[entity_id] = project_state(new_state)
+            if (old is None) != (new_state is None):
+                self.entity_set_version += 1
+        self.events_applied += 1
+
+        if old is None or new_state is None or entity_id in self._watched:
+            self._signal_change()
+            return
+        was_down = old["state"] in UNAVAILABLE_STATES
+        is_down = new_state.get("state", "") in UNAVAILABLE_STATES
+        if was_down != is_down or (is_down and old["state"] != new_state.get("state", "")):
+            self._signal_change()
+
+    def _signal_change(self):
+        self.changed.set()
+        if self.on_change is not None:
+            self.on_change()
@@ -0,0 +1,153 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - OpenMetrics endpoint
+# Optional HTTP listener on 127.0.0.1 serving monitor and HA health metrics
+# in OpenMetrics text format for Prometheus. The check cycle publishes a
+# pre-rendered snapshot at the end of each cycle; a scrape only reads that
+# reference, so it never fetches from HA or waits on the check cycle.
+####################
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# API response time buckets (seconds)
+RESPONSE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative histogram for one label set (updated by the check thread only)."""
+
+    def __init__(self, buckets=RESPONSE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class MetricsWriter:
+    """Builds OpenMetrics text one metric family at a time.
+
+    Usage:
+        out = MetricsWriter()
+        out.gauge("ha_monitor_problems", "Current problems", [({"category": "stale"}, 3)])
+        out.counter("ha_monitor_cycles", "Check cycles run", [({"result": "ok"}, 120)])
+        out.histogram("ha_monitor_api_response_seconds", "...", [({"instance": "main"}, hist)])
+        text = out.text()       # without the closing "# EOF"
+    """
+
+    def __init__(self):
+        self._lines = []
+
+    def _family(self, name, kind, help_text):
+        self._lines.append(f"# TYPE {name} {kind}")
+        self._lines.append(f"# HELP {name} {help_text}")
+
+    def gauge(self, name, help_text, samples):
+        self._family(name, "gauge", help_text)
+        for labels, value in samples:
+            if value is not None:
+                self._lines.append(f"{name}{_labels(labels)} {_value(value)}")
+
+    def counter(self, name, help_text, samples):
+        self._family(name, "counter", help_text)
+        for labels, value in samples:
+            self._lines.append(f"{name}_total{_labels(labels)} {_value(value)}")
+
+    def histogram(self, name, help_text, samples):
+        self._family(name, "histogram", help_text)
+        for labels, hist in samples:
+            for bound, count in zip(hist.buckets, hist.counts):
+                self._lines.append(f"{name}_bucket{_labels({**labels, 'le': repr(float(bound))})} {count}")
+            self._lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {hist.count}")
+            self._lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+            self._lines.append(f"{name}_sum{_labels(labels)} {_value(hist.sum)}")
+
+    def text(self):
+        return "\n".join(self._lines) + "\n" if self._lines else ""
+
+
+class MetricsEndpoint:
+    """Serves the latest published snapshot at http://127.0.0.1:<port>/metrics.
+
+    `publish(text, last_success)` swaps in a new snapshot: the metrics text
+    (from MetricsWriter) and the epoch time of the last successful cycle,
+    from which the age gauge is computed per scrape. The swap is a single
+    reference assignment, so scrapes never take a lock.
+    """
+
+    def __init__(self, port, logger):
+        self.port = port
+        self.logger = logger
+        self.scrapes = 0
+        self._snapshot = ("", None)
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Bind and start serving; raises OSError if the port is unavailable."""
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = endpoint.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                endpoint.scrapes += 1
+
+            def log_message(self, fmt, *args):
+                endpoint.logger.debug(f"Metrics request: {fmt % args}")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics_endpoint", daemon=True)
+        self._thread.start()
+
+    def publish(self, text, last_success):
+        self._snapshot = (text, last_success)
+
+    def render(self):
+        text, last_success = self._snapshot
+        out = MetricsWriter()
+        out.gauge("ha_monitor_last_success_age_seconds",
+                  "Seconds since the last check cycle that fetched HA entities",
+                  [({}, round(time.time() - last_success, 3) if last_success else None)])
+        return text + out.text() + "# EOF\n"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,260 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - cycle metrics store
+# Bounded SQLite time series of per-cycle performance samples. Raw samples
+# are kept for a day, then survive as hourly rollups (30 days) and daily
+# rollups (a year). Rollups carry log-bucket histograms of API latency and
+# cycle time so percentiles can still be estimated after downsampling.
+####################
+
+import json
+import math
+import sqlite3
+import threading
+import time
+
+
+RAW_RETENTION_SECONDS = 86400
+HOURLY_RETENTION_SECONDS = 30 * 86400
+DAILY_RETENTION_SECONDS = 400 * 86400
+
+# Histogram buckets grow by 10% per step: percentile estimates from rollups
+# are within ~5% of the true value
+HISTOGRAM_BASE = 1.1
+
+# Per-sample columns (in insert order); fetch_ms and payload_bytes are NULL
+# when the cycle used the WebSocket snapshot instead of a REST fetch
+SAMPLE_COLUMNS = (
+    "ok", "fetch_ms", "payload_bytes", "entity_total", "monitored",
+    "problems", "missing", "unavailable", "domain_mismatch", "stale", "cycle_ms",
+)
+
+# Columns averaged into rollups (latency columns get histograms instead)
+_AVERAGED_COLUMNS = ("payload_bytes", "entity_total", "monitored", "problems",
+                     "missing", "unavailable", "domain_mismatch", "stale")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS samples (
+    ts REAL NOT NULL,
+    {", ".join(f"{c} REAL" for c in SAMPLE_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution INTEGER NOT NULL,    -- 3600 or 86400
+    ts REAL NOT NULL,               -- period start (epoch, UTC-aligned)
+    cycles INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    averages TEXT NOT NULL,         -- JSON {{column: mean}}
+    fetch_hist TEXT NOT NULL,       -- JSON {{bucket: count}}
+    cycle_hist TEXT NOT NULL,
+    PRIMARY KEY (resolution, ts)
+);
+"""
+
+
+def _bucket(ms):
+    return int(math.log(max(ms, 1.0), HISTOGRAM_BASE))
+
+
+def _bucket_value(bucket):
+    """Geometric midpoint of a histogram bucket, in ms."""
+    return HISTOGRAM_BASE ** (bucket + 0.5)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already-sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def histogram_percentile(hist, pct):
+    """Estimate a percentile from a {bucket: count} histogram (None if empty)."""
+    total = sum(hist.values())
+    if not total:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * total))
+    seen = 0
+    for bucket in sorted(hist):
+        seen += hist[bucket]
+        if seen >= rank:
+            return _bucket_value(bucket)
+    return None
+
+
+class MetricsStore:
+    """Per-cycle performance samples with automatic hourly/daily rollups.
+
+    `record()` is called once per check cycle and costs a single INSERT;
+    rolling completed hours/days up and pruning expired rows happens at most
+    once per hour inside the same call. Safe to query from the menu thread
+    while the check thread records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._next_maintenance = 0.0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- writing -------------------------------------------------------------
+
+    def record(self, sample, now=None):
+        """Store one cycle sample (dict keyed by SAMPLE_COLUMNS; missing keys are NULL)."""
+        now = time.time() if now is None else now
+        row = [now] + [sample.get(c) for c in SAMPLE_COLUMNS]
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO samples (ts, {', '.join(SAMPLE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(row))})", row
+            )
+            if now >= self._next_maintenance:
+                self._maintain(now)
+                self._next_maintenance = (now // 3600 + 1) * 3600
+
+    def _maintain(self, now):
+        """Roll up completed hours and days, then prune expired rows."""
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            # Hourly rollups from raw samples
+            last = db.execute("SELECT MAX(ts) FROM rollups WHERE resolution = 3600").fetchone()[0]
+            start = last + 3600 if last is not None else None
+            current_hour = now // 3600 * 3600
+            query = "SELECT ts, " + ", ".join(SAMPLE_COLUMNS) + " FROM samples WHERE ts < ?"
+            args = [current_hour]
+            if start is not None:
+                query += " AND ts >= ?"
+                args.append(start)
+            periods = {}
+            for row in db.execute(query + " ORDER BY ts", args):
+                periods.setdefault(row[0] // 3600 * 3600, []).append(dict(zip(SAMPLE_COLUMNS, row[1:])))
+            for period, samples in periods.items():
+                self._insert_rollup(3600, period, self._rollup_samples(samples))
+
+            # Daily rollups from hourly rollups
+            last = db.execute("SELECT MAX(ts) FROM rollups WHERE resolution = 86400").fetchone()[0]
+            current_day = now // 86400 * 86400
+            args = [current_day] + ([last + 86400] if last is not None else [])
+            days = {}
+            for row in db.execute(
+                "SELECT ts, cycles, failures, averages, fetch_hist, cycle_hist FROM rollups "
+                "WHERE resolution = 3600 AND ts < ?" + (" AND ts >= ?" if last is not None else "")
+                + " ORDER BY ts", args
+            ):
+                days.setdefault(row[0] // 86400 * 86400, []).append(row[1:])
+            for period, hours in days.items():
+                self._insert_rollup(86400, period, self._merge_rollups(hours))
+
+            db.execute("DELETE FROM samples WHERE ts < ?", (now - RAW_RETENTION_SECONDS,))
+            db.execute("DELETE FROM rollups WHERE resolution = 3600 AND ts < ?", (now - HOURLY_RETENTION_SECONDS,))
+            db.execute("DELETE FROM rollups WHERE resolution = 86400 AND ts < ?", (now - DAILY_RETENTION_SECONDS,))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _rollup_samples(samples):
+        fetch_hist, cycle_hist, sums, counts = {}, {}, {}, {}
+        failures = 0
+        for s in samples:
+            if not s["ok"]:
+                failures += 1
+            if s["fetch_ms"] is not None:
+                b = _bucket(s["fetch_ms"])
+                fetch_hist[b] = fetch_hist.get(b, 0) + 1
+            if s["cycle_ms"] is not None:
+                b = _bucket(s["cycle_ms"])
+                cycle_hist[b] = cycle_hist.get(b, 0) + 1
+            for c in _AVERAGED_COLUMNS:
+                if s[c] is not None:
+                    sums[c] = sums.get(c, 0) + s[c]
+                    counts[c] = counts.get(c, 0) + 1
+        averages = {c: sums[c] / counts[c] for c in sums}
+        return len(samples), failures, averages, fetch_hist, cycle_hist
+
+    @staticmethod
+    def _merge_rollups(rows):
+        cycles = failures = 0
+        fetch_hist, cycle_hist, sums = {}, {}, {}
+        for n, f, averages, fh, ch in rows:
+            cycles += n
+            failures += f
+            for c, v in json.loads(averages).items():
+                sums[c] = sums.get(c, 0) + v * n
+            for target, source in ((fetch_hist, fh), (cycle_hist, ch)):
+                for b, count in json.loads(source).items():
+                    target[int(b)] = target.get(int(b), 0) + count
+        averages = {c: v / cycles for c, v in sums.items()} if cycles else {}
+        return cycles, failures, averages, fetch_hist, cycle_hist
+
+    def _insert_rollup(self, resolution, period, rollup):
+        cycles, failures, averages, fetch_hist, cycle_hist = rollup
+        self._db.execute(
+            "INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (resolution, period, cycles, failures, json.dumps(averages),
+             json.dumps(fetch_hist), json.dumps(cycle_hist)),
+        )
+
+    # --- querying ------------------------------------------------------------
+
+    def summary(self, window_seconds, now=None):
+        """Percentiles and averages over the last `window_seconds`.
+
+        Uses raw samples when the window is within raw retention (exact
+        percentiles), otherwise hourly rollups plus the not-yet-rolled-up raw
+        samples (percentiles estimated from histograms). Returns a dict with
+        cycles, failures, fetch/cycle p50/p95/p99 (ms), avg payload_bytes,
+        entity_total and problems, and "estimated".
+        """
+        now = time.time() if now is None else now
+        since = now - window_seconds
+        with self._lock:
+            if window_seconds <= RAW_RETENTION_SECONDS:
+                rows = self._db.execute(
+                    "SELECT " + ", ".join(SAMPLE_COLUMNS) + " FROM samples WHERE ts >= ?", (since,)
+                ).fetchall()
+                samples = [dict(zip(SAMPLE_COLUMNS, r)) for r in rows]
+                fetch = sorted(s["fetch_ms"] for s in samples if s["fetch_ms"] is not None)
+                cycle = sorted(s["cycle_ms"] for s in samples if s["cycle_ms"] is not None)
+                result = {
+                    "cycles": len(samples),
+                    "failures": sum(1 for s in samples if not s["ok"]),
+                    "estimated": False,
+                    "averages": self._rollup_samples(samples)[2] if samples else {},
+                }
+                for pct in (50, 95, 99):
+                    result[f"fetch_p{pct}"] = percentile(fetch, pct)
+                    result[f"cycle_p{pct}"] = percentile(cycle, pct)
+                return result
+
+            hours = self._db.execute(
+                "SELECT cycles, failures, averages, fetch_hist, cycle_hist FROM rollups "
+                "WHERE resolution = 3600 AND ts >= ?", (since // 3600 * 3600,)
+            ).fetchall()
+            last = self._db.execute("SELECT MAX(ts) FROM rollups WHERE resolution = 3600").fetchone()[0]
+            tail = self._db.execute(
+                "SELECT " + ", ".join(SAMPLE_COLUMNS) + " FROM samples WHERE ts >= ?",
+                (last + 3600 if last is not None else since,)
+            ).fetchall()
+        if tail:
+            cycles, failures, averages, fh, ch = self._rollup_samples(
+                [dict(zip(SAMPLE_COLUMNS, r)) for r in tail]
+            )
+            hours.append((cycles, failures, json.dumps(averages), json.dumps(fh), json.dumps(ch)))
+        cycles, failures, averages, fetch_hist, cycle_hist = self._merge_rollups(hours)
+        result = {"cycles": cycles, "failures": failures, "estimated": True, "averages": averages}
+        for pct in (50, 95, 99):
+            result[f"fetch_p{pct}"] = histogram_percentile(fetch_hist, pct)
+            result[f"cycle_p{pct}"] = histogram_percentile(cycle_hist, pct)
+        return result
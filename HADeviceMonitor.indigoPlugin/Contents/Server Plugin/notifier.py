@@ -0,0 +1,173 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - notification dispatcher
+# Delivers alerts on per-channel background threads so a slow or hung
+# Pushover/Email+ plugin never delays the check loop. New-problem lines
+# are merged over a digest window and failed sends are retried with
+# exponential backoff.
+####################
+
+import threading
+import time
+
+
+RETRY_DELAYS = (5, 15, 45)     # seconds before the 2nd, 3rd and 4th attempt
+
+
+class NotificationChannel(threading.Thread):
+    """One delivery channel (e.g. Pushover) with its own worker thread.
+
+    `send(title, message)` is called on the worker thread and should raise on
+    failure. Lines added with `add()` are buffered until the digest window
+    (started by the first buffered line) closes, then sent as one message.
+    Messages added with `add_message()` are sent as-is, without waiting.
+    """
+
+    def __init__(self, name, title, send, logger, digest_seconds=0.0):
+        super().__init__(name=f"notify_{name}", daemon=True)
+        self.channel = name
+        self.title = title
+        self.send = send
+        self.logger = logger
+        self.digest_seconds = digest_seconds
+        self.sent = 0
+        self.failed = 0
+        self._cond = threading.Condition()
+        self._lines = []
+        self._messages = []
+        self._window_ends = None
+        self._stopping = False
+
+    def add(self, lines):
+        with self._cond:
+            if not self._lines:
+                self._window_ends = time.monotonic() + self.digest_seconds
+            self._lines.extend(lines)
+            self._cond.notify()
+
+    def add_message(self, message):
+        with self._cond:
+            self._messages.append(message)
+            self._cond.notify()
+
+    def stop(self):
+        """Flush anything buffered (one attempt, no retries) and end the worker."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._messages:
+                        lines, messages = [], self._messages
+                        self._messages = []
+                        break
+                    if self._lines and (self._stopping or time.monotonic() >= self._window_ends):
+                        lines, messages = self._lines, []
+                        self._lines = []
+                        break
+                    if self._stopping:
+                        return
+                    timeout = self._window_ends - time.monotonic() if self._lines else None
+                    self._cond.wait(timeout)
+                stopping = self._stopping
+            attempts = 1 if stopping else len(RETRY_DELAYS) + 1
+            for message in messages:
+                self._deliver(message, "message", attempts)
+            if lines:
+                message = f"{len(lines)} new problem(s):\n" + "\n".join(f"- {line}" for line in lines)
+                self._deliver(message, f"{len(lines)} problem(s)", attempts)
+
+    def _deliver(self, message, description, attempts):
+        for attempt in range(1, attempts + 1):
+            try:
+                self.send(self.title, message)
+                self.sent += 1
+                return
+            except Exception as e:
+                if attempt == attempts:
+                    self.failed += 1
+                    self.logger.error(
+                        f"{self.channel} notification failed after {attempt} attempt(s), "
+                        f"{description} not sent: {e}"
+                    )
+                    return
+                delay = RETRY_DELAYS[attempt - 1]
+                self.logger.warning(f"{self.channel} notification failed ({e}) - retrying in {delay}s")
+                with self._cond:
+                    # A shutdown request cuts the backoff short and makes this the last attempt
+                    if not self._stopping:
+                        self._cond.wait(delay)
+                    if self._stopping:
+                        attempts = attempt + 1
+
+
+class NotificationDispatcher:
+    """Fans new-problem lines out to every enabled channel."""
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.channels = {}
+        self._lock = threading.Lock()
+        self._retiring = []     # channels replaced by configure() that are still flushing
+        self._retired = {}      # channel name -> [sent, failed] of replaced channels that have exited
+
+    def configure(self, channels, digest_seconds):
+        """(Re)create channels from {name: (title, send_func)}.
+
+        Doesn't wait for the old channels: they flush what they have buffered
+        on their own threads and their counts are folded in once they exit.
+        """
+        new_channels = {}
+        for name, (title, send) in channels.items():
+            channel = NotificationChannel(name, title, send, self.logger, digest_seconds)
+            channel.start()
+            new_channels[name] = channel
+        # Swapped in as one assignment, so notify() on the check thread sees either set whole
+        old_channels, self.channels = self.channels, new_channels
+        for channel in old_channels.values():
+            channel.stop()
+        with self._lock:
+            self._retiring.extend(old_channels.values())
+            self._reap()
+
+    def _reap(self):
+        """Fold the counts of retiring channels that have exited into _retired (call with _lock held)."""
+        for channel in [c for c in self._retiring if not c.is_alive()]:
+            totals = self._retired.setdefault(channel.channel, [0, 0])
+            totals[0] += channel.sent
+            totals[1] += channel.failed
+            self._retiring.remove(channel)
+
+    def notify(self, lines):
+        for channel in self.channels.values():
+            channel.add(lines)
+
+    def notify_message(self, message):
+        """Send a standalone message (not merged into the new-problem digest)."""
+        for channel in self.channels.values():
+            channel.add_message(message)
+
+    def counts(self):
+        """{channel name: (sent, failed)} since startup, including channels since reconfigured."""
+        with self._lock:
+            self._reap()
+            counts = {name: tuple(totals) for name, totals in self._retired.items()}
+            live = self._retiring + list(self.channels.values())
+        for channel in live:
+            sent, failed = counts.get(channel.channel, (0, 0))
+            counts[channel.channel] = (sent + channel.sent, failed + channel.failed)
+        return counts
+
+    def stop(self, timeout=5.0):
+        """Stop every channel, waiting up to `timeout` seconds in total for them to flush."""
+        with self._lock:
+            channels = self._retiring + list(self.channels.values())
+        for channel in channels:
+            channel.stop()
+        deadline = time.monotonic() + timeout
+        for channel in channels:
+            channel.join(max(0.0, deadline - time.monotonic()))
@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - check cycle phase timers
+# Lap timers between the stages of a check cycle, with a rolling window of
+# recent durations per phase for percentile reporting.
+####################
+
+import threading
+import time
+from collections import deque
+
+
+WINDOW_SIZE = 500   # cycles kept per phase (~4 hours of continuous mode)
+
+
+class PhaseTimer:
+    """Per-phase durations for the check cycle.
+
+    Usage (check thread only):
+        timer.start_cycle()
+        ...                      # work
+        timer.lap("fetch")       # time since the previous lap goes to "fetch"
+        ...
+        timer.lap("checks")
+        timer.end_cycle()
+
+    A lap costs one perf_counter() call and a dict update. `add()` records a
+    sub-phase measured separately (e.g. parser CPU time inside the fetch).
+    `snapshot()` may be called from the menu thread.
+    """
+
+    def __init__(self, window=WINDOW_SIZE):
+        self.window = window
+        self._samples = {}      # name -> deque of seconds
+        self._totals = {}       # name -> [count, max_seconds]
+        self._current = {}      # name -> seconds accumulated in the current cycle
+        self._cycle_start = 0.0
+        self._last = 0.0
+        self._lock = threading.Lock()
+        self.cycles = 0
+        self.overhead_us = self._calibrate()
+
+    def start_cycle(self):
+        self._current = {}
+        self._cycle_start = self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self._current[name] = self._current.get(name, 0.0) + (now - self._last)
+        self._last = now
+
+    def add(self, name, seconds):
+        self._current[name] = self._current.get(name, 0.0) + seconds
+
+    def end_cycle(self):
+        """Commit the current cycle's phases (plus "total") to the rolling window."""
+        current, self._current = self._current, {}
+        current["total"] = time.perf_counter() - self._cycle_start
+        with self._lock:
+            self.cycles += 1
+            for name, seconds in current.items():
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self.window)
+                    self._totals[name] = [0, 0.0]
+                samples.append(seconds)
+                totals = self._totals[name]
+                totals[0] += 1
+                if seconds > totals[1]:
+                    totals[1] = seconds
+        return current["total"]
+
+    def snapshot(self):
+        """Return {phase: {"count", "last_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms"}}.
+
+        Percentiles and mean cover the rolling window; count and max cover the
+        whole session.
+        """
+        with self._lock:
+            items = [(name, list(samples), list(self._totals[name])) for name, samples in self._samples.items()]
+        result = {}
+        for name, samples, (count, max_seconds) in items:
+            ordered = sorted(samples)
+            result[name] = {
+                "count": count,
+                "last_ms": samples[-1] * 1000,
+                "mean_ms": sum(samples) / len(samples) * 1000,
+                "p50_ms": ordered[(len(ordered) - 1) // 2] * 1000,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                "max_ms": max_seconds * 1000,
+            }
+        return result
+
+    def _calibrate(self, rounds=2000):
+        """Cost of one lap in µs, so the profile dump can report instrumentation overhead."""
+        saved = self._current
+        self._current = {}
+        self._last = time.perf_counter()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            self.lap("_calibrate")
+        elapsed = time.perf_counter() - start
+        self._current = saved
+        return elapsed / rounds * 1e6
@@ -3,28 +3,46 @@
 ####################
 # HA Device Monitor - Validates Home Assistant Agent devices against HA entities
 # Author: CliveS and Claude Opus 4
-# Version: 1.3.2
+# Version: 1.4.0
 ####################
 
 import indigo
 import locale
 import logging
-import json
 import os
 import platform
-import ssl
+import pstats
+import concurrent.futures
+import cProfile
+import http.client
 import subprocess
 import sys
+import threading
 import time
-import urllib.request
 import xml.etree.ElementTree as ET
-from datetime import datetime, timezone
+from collections import deque
+from datetime import datetime, timedelta
+
+from availability import AvailabilityHistory
+from exclude_rules import ExcludeRules, split_entity_ids, split_rules
+from freshness import FreshnessTracker, StaleThresholds
+from ha_api import BREAKER_MAX_SECONDS, HAHTTPError, HAInstance, parse_states_stream, shared_ssl_context
+from ha_websocket import HAEventStream
+from metrics_endpoint import Histogram, MetricsEndpoint, MetricsWriter
+from metrics_store import MetricsStore
+from notifier import NotificationDispatcher
+from phase_timer import PhaseTimer
+from problem_journal import ProblemJournal
+from report_export import REPORT_FORMATS, ReportExporter
+from stuck_values import STUCK_DOMAINS, StuckValueTracker
 
 
 HA_AGENT_PLUGIN_ID = "no.homeassistant.plugin"
 EMAIL_PLUGIN_ID = "com.indigodomo.email"
 VARIABLE_FOLDER_NAME = "HA_Device_Monitor"
 STATE_FILE_NAME = "known_problems.json"
+METRICS_FILE_NAME = "metrics.sqlite"
+HISTORY_FILE_NAME = "history.sqlite"
 
 # Maps HA Agent deviceTypeId to expected HA entity domain
 DEVICE_TYPE_TO_DOMAIN = {
@@ -40,6 +58,65 @@ DEVICE_TYPE_TO_DOMAIN = {
     # ha_generic intentionally omitted - any domain is valid
 }
 
+# Continuous mode interval; realtime mode also runs a cycle this often as a
+# safety net. Scheduled checks wait STARTUP_GRACE_SECONDS after startup.
+CHECK_INTERVAL_SECONDS = 30
+STARTUP_GRACE_SECONDS = 30
+
+# Scheduled cycles (including wake-ups for stale deadlines) never start less
+# than this long after the previous one
+MIN_CHECK_GAP_SECONDS = 5
+
+# Adaptive interval: poll every FAST_CHECK_INTERVAL_SECONDS for up to
+# FAST_POLL_WINDOW_SECONDS after problems change, while any problem is still
+# active (and throughout a mass outage);
+# when the p95 of the last LATENCY_WINDOW REST fetches exceeds SLOW_FETCH_MS
+# the interval stretches in proportion, up to MAX_CHECK_INTERVAL_SECONDS
+FAST_CHECK_INTERVAL_SECONDS = 15
+FAST_POLL_WINDOW_SECONDS = 600
+SLOW_FETCH_MS = 2000
+MAX_CHECK_INTERVAL_SECONDS = 300
+LATENCY_WINDOW = 20
+
+# A check cycle still running after this long is abandoned and its HA
+# requests are aborted, so it can't hold up the scheduler
+CYCLE_DEADLINE_SECONDS = 120
+
+# Realtime mode: pause after a relevant event so bursts are checked together
+REALTIME_DEBOUNCE_SECONDS = 0.5
+
+# Adaptive fetch: below this monitored/total ratio (percent) entities are
+# queried individually; the bulk /api/states is re-run periodically (also in
+# template mode) to re-measure the total entity count and refresh the entity
+# ID set used for rename suggestions
+DEFAULT_TARGETED_FETCH_PERCENT = 5
+TARGETED_FETCH_WORKERS = 8
+BULK_RECALIBRATE_SECONDS = 3600
+
+# ha_monitor_last_check changes every cycle; scheduled cycles write it at most
+# this often so triggers on it aren't re-evaluated every 30 seconds
+LAST_CHECK_VARIABLE_INTERVAL_SECONDS = 300
+
+# Mass-outage (storm) detection: when more than stormThresholdPercent of
+# monitored devices (and at least STORM_MIN_DEVICES) change state within
+# STORM_WINDOW_SECONDS, per-device transitions are held until the set of
+# problem devices has been stable for STORM_SETTLE_SECONDS. Only new problems
+# open an outage; as many recoveries are summarised as one "mass recovery"
+DEFAULT_STORM_THRESHOLD_PERCENT = 20
+STORM_MIN_DEVICES = 10
+STORM_WINDOW_SECONDS = 60
+STORM_SETTLE_SECONDS = 90
+STORM_DETAIL_LINES = 20  # residual problems listed individually when an outage ends
+
+# Rows per report section shown in the log when the full report is exported to a file
+REPORT_LOG_ROWS = 25
+
+# Exclude dialog: most devices listed in the "Add device" menu at once
+PICKER_MAX_ITEMS = 500
+
+# Availability report: devices listed per window
+AVAILABILITY_REPORT_ROWS = 20
+
 DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
 
@@ -60,114 +137,317 @@ class Plugin(indigo.PluginBase):
 
         self.pluginPrefs = pluginPrefs
         self.known_problems = {}   # entity_id -> {"type": str, "since": str}
+        self.exclude_rules = ExcludeRules()  # Compiled from excludeEntities + excludePatterns
+        self.exclude_counts = {}  # rule -> devices it excluded in the last cycle
         self.ha_base_url = None
         self.ha_token = None
         self.run_check_requested = False
         self.last_scheduled_run = None  # Track when we last ran to avoid double-firing
-        self.last_api_response_ms = None  # Track HA API response time
+        self.last_cycle_time = 0.0  # Epoch time of the last scheduled cycle
+        self.startup_grace_until = 0.0
+        self.wake_event = threading.Event()  # Set to wake the scheduler early
+        self.cycle_lock = threading.Lock()  # Prevents overlapping check cycles
+        self.scheduler_wakeups = 0
+        self.recent_fetch_ms = deque(maxlen=LATENCY_WINDOW)  # Latest REST fetch times, for the adaptive interval
+        self.poll_interval = CHECK_INTERVAL_SECONDS
+        self.last_problem_change = 0.0  # When problems were last added or recovered
+        self.hung_cycle = None  # Worker thread of a cycle abandoned at its deadline
+        self.hung_since = None  # When that cycle was abandoned
+        self.cycle_blocked_until = 0.0  # No scheduled cycle before this while an abandoned one holds cycle_lock
+        self.cycle_fetch_ms = None  # Slowest REST fetch of the current cycle (None = WebSocket snapshot)
+        self.cycle_payload_bytes = None
+        self.metrics = None  # MetricsStore, opened in startup()
+        self.history = None  # AvailabilityHistory, opened in startup()
+        self.metrics_endpoint = None  # MetricsEndpoint when metricsPort is set
+        self.response_histograms = {}  # HA instance name -> Histogram of REST fetch times
+        self.fetch_failures = {}  # HA instance name -> failed fetches since startup
+        self.cycle_results = {"ok": 0, "failed": 0}  # Check cycles since startup
+        self.last_good_sample = {}  # Metrics sample of the last cycle that fetched HA entities
+        self.last_success_time = None  # Epoch time of that cycle
+        self.last_cycle_seconds = None
+        self.phase_timer = PhaseTimer()  # Per-phase durations of recent check cycles
+        self.profile_next_cycle = False  # Run the next cycle under cProfile
+        self.notifier = NotificationDispatcher(self.logger)  # Background Pushover/Email+ delivery
+        self.notifier_config = None  # (channels, digest) the notifier was last configured with
+        self.pending_problems = {}  # New problems found this cycle, committed after storm detection
+        self.recent_transitions = deque()  # (time, problems, recoveries) committed, for storm detection
+        self.storm = None  # Active mass outage: {"started", "last_ids", "quiet_since", "affected"}
+        self.ha_prefs_mtime = None  # mtime of the HA Agent .indiPref last parsed
+        self.primary_instance = HAInstance("main")  # The HA Agent's server (ha_base_url / ha_token)
+        self.extra_instances = []  # Additional HAInstance objects from the haInstances setting
+        self.instance_for_entity = {}  # entity_id -> HAInstance (cache, reset when instances change)
+        self.pending_extra_instances = None  # Reloaded instance list, swapped in between check cycles
+        self.pending_instances_lock = threading.Lock()
+        self.fetch_executor = None  # ThreadPoolExecutor for targeted fetches
+        self.instance_executor = None  # ThreadPoolExecutor fetching several HA instances in parallel
+        self.freshness = FreshnessTracker()  # Stale deadlines (min-heap) for monitored entities
+        self.stale_thresholds = StaleThresholds(2880)  # Default + per-domain/type/entity overrides
+        self.stuck_values = StuckValueTracker()  # Recent numeric samples of sensor/climate entities
+        self.event_stream = None  # HAEventStream when scheduleMode == "realtime"
+
+        # Device index: HA Agent devices (plus Email+ SMTP accounts) kept current
+        # from deviceCreated/Updated/Deleted so nothing walks indigo.devices per cycle
+        self.device_index = {}      # dev.id -> {"id", "name", "deviceTypeId", "enabled", "address"}
+        self.entity_index = {}      # entity_id -> set of dev.id
+        self.device_list = None     # device_index records sorted by name (None = rebuild)
+        self.picker_entries = None  # [(entity_id, label, search_key)] for the exclude dialog (None = rebuild)
+        self.smtp_device_ids = set()
+        self.device_index_lock = threading.Lock()
         self.date_fmt = self._detect_date_format()
         self.state_file_path = self._get_state_file_path()
+        self.problem_journal = ProblemJournal(self.state_file_path)
+        self.variable_folder_id = None
+        self.variable_ids = {}      # variable name -> Indigo variable id
+        self.variable_values = {}   # variable name -> last value written
+        self.last_check_published = 0.0
+        self.variable_writes = 0
+        self.variable_writes_skipped = 0
 
     # -------------------------------------------------------------------------
     # State persistence
     # -------------------------------------------------------------------------
 
-    def _get_state_file_path(self):
-        """Get path for the state persistence file in the plugin's preferences directory."""
+    def _get_state_file_path(self, file_name=STATE_FILE_NAME):
+        """Get path for a persistence file in the plugin's preferences directory."""
         prefs_dir = os.path.join(
             indigo.server.getInstallFolderPath(),
             "Preferences", "Plugins"
         )
-        return os.path.join(prefs_dir, f"com.clives.indigoplugin.hadevicemonitor.{STATE_FILE_NAME}")
+        return os.path.join(prefs_dir, f"com.clives.indigoplugin.hadevicemonitor.{file_name}")
+
+    def _save_known_problems(self, compact=False):
+        """Persist problem transitions recorded this cycle.
 
-    def _save_known_problems(self):
-        """Save known problems to disk for persistence across restarts."""
+        Transitions are appended to the journal with one fsync per call; the
+        full snapshot is only rewritten (atomically) when the journal has grown
+        large, or when `compact` is set at shutdown.
+        """
+        journal = self.problem_journal
         try:
-            with open(self.state_file_path, "w") as f:
-                json.dump(self.known_problems, f, indent=2)
-            self.logger.debug(f"Saved {len(self.known_problems)} known problem(s) to disk")
+            written = journal.flush()
+            if compact or journal.needs_compaction(len(self.known_problems)):
+                journal.compact(self.known_problems)
+                self.logger.debug(f"Compacted {len(self.known_problems)} known problem(s) to disk")
+            elif written:
+                self.logger.debug(f"Journalled {written} problem transition(s) to disk")
         except Exception:
             self.logger.exception("Failed to save known problems to disk")
+        if self.history is not None:
+            try:
+                self.history.flush()
+            except Exception:
+                self.logger.exception("Failed to save availability history")
 
     def _load_known_problems(self):
-        """Load known problems from disk (if any exist from a previous session)."""
-        if not os.path.exists(self.state_file_path):
+        """Load known problems from disk (snapshot plus journal from a previous session)."""
+        journal = self.problem_journal
+        if not os.path.exists(self.state_file_path) and not os.path.exists(journal.journal_path):
             self.logger.debug("No previous state file found - starting fresh")
             return
 
         try:
-            with open(self.state_file_path, "r") as f:
-                self.known_problems = json.load(f)
+            self.known_problems, replayed = journal.load()
             count = len(self.known_problems)
             if count > 0:
                 self.logger.info(f"Restored {count} known problem(s) from previous session (no false re-alerts)")
             else:
                 self.logger.debug("Previous state file was empty")
+            if replayed:
+                self.logger.debug(f"Replayed {replayed} journal record(s)")
+            if journal.needs_compaction(count):
+                journal.compact(self.known_problems)
         except Exception:
             self.logger.exception("Failed to load previous state - starting fresh")
             self.known_problems = {}
 
+    # -------------------------------------------------------------------------
+    # Device index
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _device_record(dev):
+        """Snapshot the fields the checks and dialogs need from an Indigo device."""
+        return {
+            "id": dev.id,
+            "name": dev.name,
+            "deviceTypeId": dev.deviceTypeId,
+            "enabled": dev.enabled,
+            "address": dev.address,
+        }
+
+    def _build_device_index(self):
+        """Build the device index once at startup, then subscribe to device changes."""
+        with self.device_index_lock:
+            self.device_index = {}
+            self.entity_index = {}
+            self.device_list = None
+            self.picker_entries = None
+            self.smtp_device_ids = set()
+            for dev in indigo.devices.iter(HA_AGENT_PLUGIN_ID):
+                self._index_add(dev)
+            for dev in indigo.devices.iter(EMAIL_PLUGIN_ID):
+                if dev.deviceTypeId == "smtpAccount":
+                    self.smtp_device_ids.add(dev.id)
+        indigo.devices.subscribeToChanges()
+        self.logger.debug(f"Device index built: {len(self.device_index)} HA Agent device(s)")
+
+    def _index_add(self, dev):
+        record = self._device_record(dev)
+        self.device_index[dev.id] = record
+        self.device_list = None
+        self.picker_entries = None
+        if record["address"]:
+            self.entity_index.setdefault(record["address"], set()).add(dev.id)
+
+    def _index_remove(self, dev_id):
+        record = self.device_index.pop(dev_id, None)
+        self.device_list = None
+        self.picker_entries = None
+        if record and record["address"]:
+            ids = self.entity_index.get(record["address"])
+            if ids:
+                ids.discard(dev_id)
+                if not ids:
+                    del self.entity_index[record["address"]]
+
+    def _indexed_ha_devices(self):
+        """Return a stable list of indexed HA Agent device records, sorted by name.
+
+        The list is only rebuilt after the index changes, and because the
+        check cycle walks devices in this order its report sections come out
+        sorted without sorting them per report. Callers must not modify it.
+        """
+        with self.device_index_lock:
+            if self.device_list is None:
+                self.device_list = sorted(self.device_index.values(), key=lambda d: d["name"])
+            return self.device_list
+
+    def deviceCreated(self, dev):
+        super().deviceCreated(dev)
+        if dev.pluginId == HA_AGENT_PLUGIN_ID:
+            with self.device_index_lock:
+                self._index_add(dev)
+        elif dev.pluginId == EMAIL_PLUGIN_ID and dev.deviceTypeId == "smtpAccount":
+            self.smtp_device_ids.add(dev.id)
+
+    def deviceUpdated(self, origDev, newDev):
+        super().deviceUpdated(origDev, newDev)
+        # Fires for every state change of every device - keep the fast path cheap
+        if newDev.pluginId != HA_AGENT_PLUGIN_ID:
+            return
+        if (origDev.name == newDev.name and origDev.address == newDev.address
+                and origDev.enabled == newDev.enabled and origDev.deviceTypeId == newDev.deviceTypeId
+                and newDev.id in self.device_index):
+            return
+        with self.device_index_lock:
+            self._index_remove(newDev.id)
+            self._index_add(newDev)
+
+    def deviceDeleted(self, dev):
+        super().deviceDeleted(dev)
+        if dev.pluginId == HA_AGENT_PLUGIN_ID:
+            with self.device_index_lock:
+                self._index_remove(dev.id)
+        else:
+            self.smtp_device_ids.discard(dev.id)
+
     # -------------------------------------------------------------------------
     # Indigo variable management
     # -------------------------------------------------------------------------
 
     def _get_or_create_variable_folder(self):
-        """Get or create the HA_Device_Monitor variable folder."""
+        """Get or create the HA_Device_Monitor variable folder (id cached after the first lookup)."""
+        if self.variable_folder_id is not None:
+            return self.variable_folder_id
         try:
             for folder in indigo.variables.folders:
                 if folder.name == VARIABLE_FOLDER_NAME:
+                    self.variable_folder_id = folder.id
                     return folder.id
             new_folder = indigo.variables.folder.create(VARIABLE_FOLDER_NAME)
             self.logger.info(f"Created variable folder: {VARIABLE_FOLDER_NAME}")
+            self.variable_folder_id = new_folder.id
             return new_folder.id
         except Exception:
             self.logger.exception("Failed to create variable folder")
             return None
 
     def _update_variable(self, name, value):
-        """Create or update an Indigo variable in the HA_Device_Monitor folder."""
+        """Create or update an Indigo variable in the HA_Device_Monitor folder.
+
+        Only writes when the value differs from the last one this plugin wrote.
+        The variable id is cached, so a write is a single updateValue() call; if
+        the variable was deleted or renamed the cache is dropped and it is
+        looked up (or recreated) by name.
+        """
+        str_value = str(value)
+        if self.variable_values.get(name) == str_value:
+            self.variable_writes_skipped += 1
+            return
+
         try:
-            str_value = str(value)
-            if name in indigo.variables:
-                indigo.variable.updateValue(name, str_value)
-            else:
-                folder_id = self._get_or_create_variable_folder()
-                if folder_id is not None:
-                    indigo.variable.create(name, str_value, folder=folder_id)
-                    self.logger.info(f"Created variable: {name} = {str_value}")
+            var_id = self.variable_ids.get(name)
+            if var_id is not None:
+                try:
+                    indigo.variable.updateValue(var_id, str_value)
+                except Exception:
+                    self.variable_ids.pop(name, None)
+                    var_id = None
+            if var_id is None:
+                if name in indigo.variables:
+                    var = indigo.variables[name]
+                    indigo.variable.updateValue(var.id, str_value)
                 else:
-                    indigo.variable.create(name, str_value)
-                    self.logger.info(f"Created variable: {name} = {str_value} (no folder)")
+                    folder_id = self._get_or_create_variable_folder()
+                    if folder_id is not None:
+                        var = indigo.variable.create(name, str_value, folder=folder_id)
+                        self.logger.info(f"Created variable: {name} = {str_value}")
+                    else:
+                        var = indigo.variable.create(name, str_value)
+                        self.logger.info(f"Created variable: {name} = {str_value} (no folder)")
+                self.variable_ids[name] = var.id
+            self.variable_values[name] = str_value
+            self.variable_writes += 1
         except Exception:
+            self.variable_values.pop(name, None)
             self.logger.exception(f"Failed to update variable {name}")
 
-    def _update_status_variables(self, total, problems):
-        """Update Indigo variables with current status."""
+    def _update_status_variables(self, total, problems, category_counts, force_last_check=False):
+        """Publish current status to Indigo variables (changed values only).
+
+        `category_counts` maps problem category (missing, unavailable,
+        domain_mismatch, stale, stuck) to its device count; each gets its own
+        ha_monitor_<category>_count variable for triggers.
+        """
         self._update_variable("ha_monitor_problem_count", problems)
         self._update_variable("ha_monitor_device_count", total)
-        self._update_variable("ha_monitor_last_check", self._format_timestamp())
+        for category, count in category_counts.items():
+            self._update_variable(f"ha_monitor_{category}_count", count)
+
+        now = time.time()
+        if force_last_check or now - self.last_check_published >= LAST_CHECK_VARIABLE_INTERVAL_SECONDS:
+            self._update_variable("ha_monitor_last_check", self._format_timestamp())
+            self.last_check_published = now
 
     # -------------------------------------------------------------------------
     # Exclude list
     # -------------------------------------------------------------------------
 
-    def _get_exclude_list(self):
-        """Parse the exclude list from plugin preferences.
+    def _compile_exclude_rules(self):
+        """Compile the exclude list into one matcher; called at startup and when config is saved.
 
-        Returns a set of entity_id strings to skip during checks.
-        The user can enter entity IDs separated by commas, semicolons, or newlines.
+        excludeEntities holds exact entity IDs (managed by the device picker);
+        excludePatterns holds glob, "re:" regex and "domain:" rules.
         """
-        raw = self.pluginPrefs.get("excludeEntities", "").strip()
-        if not raw:
-            return set()
-
-        excludes = set()
-        # Split on commas, semicolons, or newlines
-        for item in raw.replace(";", ",").replace("\n", ",").split(","):
-            entity_id = item.strip()
-            if entity_id:
-                excludes.add(entity_id)
-        return excludes
+        try:
+            self.exclude_rules = ExcludeRules(
+                split_entity_ids(self.pluginPrefs.get("excludeEntities", "")),
+                split_rules(self.pluginPrefs.get("excludePatterns", "")),
+            )
+        except ValueError as e:
+            self.logger.error(f"Ignoring exclude patterns - {e}")
+            self.exclude_rules = ExcludeRules(split_entity_ids(self.pluginPrefs.get("excludeEntities", "")))
+        self.exclude_counts = {}
 
     # -------------------------------------------------------------------------
     # Locale-aware date/time formatting
@@ -248,86 +528,272 @@ class Plugin(indigo.PluginBase):
     def startup(self):
         self.logger.debug("startup called")
         self.logger.info(f"Date format: {self._format_timestamp()} (locale detected)")
-        self._read_ha_agent_config()
+        self._read_ha_agent_config(force=True)
+        self._load_extra_instances()
+        self._compile_exclude_rules()
+        self._compile_stale_thresholds()
+        self._build_device_index()
         self._load_known_problems()
+        self._open_history()
+        self._open_metrics_store()
+        self._configure_notifier()
+        self._configure_metrics_endpoint()
         self._log_schedule_info()
 
     def shutdown(self):
         self.logger.debug("shutdown called")
-        self._save_known_problems()
+        self._stop_event_stream()
+        self._close_ha_clients()
+        for executor in (self.fetch_executor, self.instance_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self.notifier.stop()
+        if self.metrics_endpoint is not None:
+            self.metrics_endpoint.stop()
+        self._save_known_problems(compact=True)
+        self.problem_journal.close()
+        if self.history is not None:
+            self.history.close()
+        if self.metrics is not None:
+            self.metrics.close()
 
     def runConcurrentThread(self):
         try:
-            # Brief pause on startup to let HA Agent connect first
-            self.sleep(30)
+            # Scheduled checks wait STARTUP_GRACE_SECONDS to let the HA Agent
+            # connect first; a manual "Run Check Now" still runs immediately
+            self.startup_grace_until = time.time() + STARTUP_GRACE_SECONDS
 
             while True:
-                # Check for manual trigger (always show full report)
+                # Manual trigger (always show full report)
                 if self.run_check_requested:
                     self.run_check_requested = False
                     self.logger.info("Running manual check...")
-                    try:
-                        self._run_check_cycle(manual=True)
-                    except Exception:
-                        self.logger.exception("Error during manual check cycle")
+                    self._run_cycle_guarded(manual=True)
+                    continue
+
+                now = time.time()
+                if self._realtime_mode() and now >= self.startup_grace_until:
+                    self._start_event_stream()
+                    stream = self.event_stream
+                    if stream is not None and stream.changed.is_set():
+                        # Let a burst of related events land before checking
+                        self.sleep(REALTIME_DEBOUNCE_SECONDS)
+                        stream.changed.clear()
+                        self._run_scheduled_cycle()
+                        continue
+
+                due = self._next_due_time(now)
+                if due is not None and due <= now:
+                    self._run_scheduled_cycle()
+                    continue
+
+                # Sleep until the next due time; menu actions, config changes
+                # and realtime events wake us early
+                self._wait_for_wake(None if due is None else due - now)
+
+        except self.StopThread:
+            self._stop_event_stream()
+            self._save_known_problems(compact=True)
+
+    def stopConcurrentThread(self):
+        super().stopConcurrentThread()
+        self.wake_event.set()
+
+    def _wake_scheduler(self):
+        """Wake the concurrent thread so it re-evaluates what to do now."""
+        self.wake_event.set()
+
+    def _wait_for_wake(self, timeout):
+        """Block until timeout (None = indefinitely) or _wake_scheduler()."""
+        self.wake_event.wait(timeout)
+        self.wake_event.clear()
+        self.scheduler_wakeups += 1
+        if self.stopThread:
+            raise self.StopThread()
+
+    def _run_cycle_guarded(self, manual):
+        """Run one check cycle unless another is still in progress.
+
+        The cycle runs on a worker thread. If it is still running after
+        CYCLE_DEADLINE_SECONDS it is abandoned: its HA requests are aborted
+        and the scheduler carries on; no new cycle starts until it has ended.
+        """
+        if not self.cycle_lock.acquire(blocking=False):
+            # Only an abandoned cycle can still hold the lock; retrying before
+            # a normal interval has passed would just spin
+            self.cycle_blocked_until = time.time() + max(self.poll_interval, CHECK_INTERVAL_SECONDS)
+            hung = ""
+            if self.hung_since is not None:
+                hung = f" (abandoned {self._format_age((time.time() - self.hung_since) / 60)} ago)"
+            if manual:
+                self.logger.warning(f"Check skipped - a previous check cycle is still hung{hung}. "
+                                    f"Try again once it has finished")
+            else:
+                self.logger.debug(f"Check cycle skipped - previous cycle still hung{hung}")
+            return
+        worker = threading.Thread(target=self._cycle_worker, args=(manual,), name="check_cycle", daemon=True)
+        worker.start()
+        deadline = time.time() + CYCLE_DEADLINE_SECONDS
+        while worker.is_alive() and time.time() < deadline and not self.stopThread:
+            worker.join(1.0)
+        if worker.is_alive() and not self.stopThread:
+            self.hung_cycle = worker
+            self.hung_since = time.time()
+            self.logger.error(
+                f"Check cycle still running after {CYCLE_DEADLINE_SECONDS}s - abandoned, aborting HA requests"
+            )
+            for instance in self._ha_instances():
+                instance.abort()
+
+    def _cycle_worker(self, manual):
+        try:
+            if self.profile_next_cycle:
+                self.profile_next_cycle = False
+                self._run_profiled_cycle(manual)
+            else:
+                self._run_check_cycle(manual=manual)
+        except Exception:
+            self.logger.exception(f"Error during {'manual' if manual else 'scheduled'} check cycle")
+        finally:
+            self.cycle_lock.release()
+            if self.hung_cycle is threading.current_thread():
+                # Re-evaluate the due time now rather than waiting out cycle_blocked_until
+                self.hung_cycle = None
+                self.hung_since = None
+                self.cycle_blocked_until = 0.0
+                self.logger.info("Abandoned check cycle has finished")
+                self._wake_scheduler()
+            if self.event_stream is not None:
+                watched = set(self.known_problems)
+                if self.storm is not None:
+                    watched.update(self.storm["last_ids"])
+                self.event_stream.set_watched(watched)
+
+    def _run_profiled_cycle(self, manual):
+        """Run one check cycle under cProfile and write the sorted stats to the plugin log folder."""
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(self._run_check_cycle, manual=manual)
+        finally:
+            path = os.path.join(
+                self._get_log_folder(), f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            )
+            try:
+                with open(path, "w") as f:
+                    stats = pstats.Stats(profiler, stream=f)
+                    stats.sort_stats("cumulative").print_stats(60)
+                    stats.sort_stats("tottime").print_stats(30)
+                self.logger.info(f"Check cycle profile written to {path}")
+            except Exception:
+                self.logger.exception("Failed to write cycle profile")
 
-                # Check if scheduled run is due (respects silent mode)
-                elif self._is_check_due():
-                    try:
-                        self._run_check_cycle(manual=False)
-                    except Exception:
-                        self.logger.exception("Error during scheduled check cycle")
+    def _get_log_folder(self):
+        try:
+            folder = indigo.server.getLogsFolderPath(pluginId=self.pluginId)
+        except Exception:
+            folder = os.path.join(indigo.server.getInstallFolderPath(), "Logs", self.pluginId)
+        os.makedirs(folder, exist_ok=True)
+        return folder
 
-                # Sleep 30 seconds between schedule checks (lightweight)
-                self.sleep(30)
+    def _run_scheduled_cycle(self):
+        mode = self.pluginPrefs.get("scheduleMode", "continuous")
+        slot_key = self._current_slot(datetime.now())
+        if slot_key is not None:
+            self.last_scheduled_run = slot_key
+            self.logger.info(f"Scheduled check triggered ({mode})")
+        self.last_cycle_time = time.time()
+        self._run_cycle_guarded(manual=False)
 
-        except self.StopThread:
-            self._save_known_problems()
+    def _realtime_mode(self):
+        return self.pluginPrefs.get("scheduleMode", "continuous") == "realtime"
 
     # -------------------------------------------------------------------------
-    # Schedule Logic
+    # Realtime (WebSocket) mode
     # -------------------------------------------------------------------------
 
-    def _is_check_due(self):
-        """Determine if a scheduled check should run now."""
-        mode = self.pluginPrefs.get("scheduleMode", "continuous")
-
-        if mode == "manual":
+    def _start_event_stream(self):
+        """Start the HA WebSocket event stream if it is not already running."""
+        if self.event_stream is not None and self.event_stream.is_alive():
+            return True
+        if not self._read_ha_agent_config():
             return False
+        self.event_stream = HAEventStream(
+            self.ha_base_url, self.ha_token, self.logger,
+            ssl_context=self._ssl_context(), on_change=self._wake_scheduler
+        )
+        self.event_stream.set_watched(self.known_problems.keys())
+        self.event_stream.start()
+        self.logger.info(f"Realtime monitoring: connecting to {self.event_stream.url}")
+        return True
 
-        # Continuous mode: run every loop cycle (every 30 seconds)
-        if mode == "continuous":
-            return True
+    def _stop_event_stream(self):
+        if self.event_stream is not None:
+            self.event_stream.stop()
+            self.event_stream = None
 
-        now = datetime.now()
-        current_hour = now.hour
-        current_day = now.weekday()  # 0=Monday, 6=Sunday
+    # -------------------------------------------------------------------------
+    # Schedule Logic
+    # -------------------------------------------------------------------------
 
-        # Create a key for "this time slot" to avoid running multiple times
-        # within the same eligible period
+    def _current_slot(self, now):
+        """Key of the hourly/daily/weekly slot `now` falls in, or None outside one.
+
+        A slot runs at most once; hourly, daily and weekly modes use this to
+        avoid double-firing within the same eligible hour.
+        """
+        mode = self.pluginPrefs.get("scheduleMode", "continuous")
         if mode == "hourly":
-            slot_key = f"{now.date()}-{current_hour}"
-        elif mode == "daily":
-            target_hour = int(self.pluginPrefs.get("scheduleHour", "06"))
-            if current_hour != target_hour:
-                return False
-            slot_key = f"{now.date()}-{target_hour}"
-        elif mode == "weekly":
-            target_hour = int(self.pluginPrefs.get("scheduleHour", "06"))
+            return f"{now.date()}-{now.hour}"
+        target_hour = int(self.pluginPrefs.get("scheduleHour", "06"))
+        if mode == "daily" and now.hour == target_hour:
+            return f"{now.date()}-{target_hour}"
+        if mode == "weekly":
             target_day = int(self.pluginPrefs.get("scheduleDay", "0"))
-            if current_day != target_day or current_hour != target_hour:
-                return False
-            slot_key = f"{now.date()}-{target_hour}"
-        else:
-            return False
+            if now.weekday() == target_day and now.hour == target_hour:
+                return f"{now.date()}-{target_hour}"
+        return None
 
-        # Only run once per slot
-        if self.last_scheduled_run == slot_key:
-            return False
+    def _next_due_time(self, now_ts):
+        """Epoch time the next scheduled check is due, or None if nothing is scheduled."""
+        mode = self.pluginPrefs.get("scheduleMode", "continuous")
+        if mode == "manual":
+            return None
 
-        self.last_scheduled_run = slot_key
-        self.logger.info(f"Scheduled check triggered ({mode})")
-        return True
+        if mode in ("continuous", "realtime"):
+            due = self.last_cycle_time + self.poll_interval
+            # Wake exactly when the next entity goes stale
+            next_stale = self.freshness.next_deadline()
+            if next_stale is not None:
+                due = min(due, next_stale)
+            # Nothing to fetch from until an instance's circuit breaker closes
+            retry_at = self._breaker_retry_time(now_ts)
+            if retry_at is not None:
+                due = max(due, retry_at)
+            return max(due, self.last_cycle_time + MIN_CHECK_GAP_SECONDS, self.cycle_blocked_until,
+                       self.startup_grace_until)
+
+        now = datetime.fromtimestamp(now_ts)
+        slot_key = self._current_slot(now)
+        if slot_key is not None and slot_key != self.last_scheduled_run:
+            return max(now_ts, self.startup_grace_until)
+
+        hour_start = now.replace(minute=0, second=0, microsecond=0)
+        if mode == "hourly":
+            return (hour_start + timedelta(hours=1)).timestamp()
+
+        target_hour = int(self.pluginPrefs.get("scheduleHour", "06"))
+        candidate = hour_start.replace(hour=target_hour)
+        if mode == "daily":
+            if candidate <= now:
+                candidate += timedelta(days=1)
+            return candidate.timestamp()
+        if mode == "weekly":
+            target_day = int(self.pluginPrefs.get("scheduleDay", "0"))
+            candidate += timedelta(days=(target_day - now.weekday()) % 7)
+            if candidate <= now:
+                candidate += timedelta(days=7)
+            return candidate.timestamp()
+        return None
 
     def _log_schedule_info(self):
         """Log the current schedule configuration."""
@@ -335,6 +801,8 @@ class Plugin(indigo.PluginBase):
 
         if mode == "continuous":
             self.logger.info("Schedule: Continuous (every 30 seconds, silent unless problems found)")
+        elif mode == "realtime":
+            self.logger.info("Schedule: Realtime (Home Assistant WebSocket events, silent unless problems found)")
         elif mode == "manual":
             self.logger.info("Schedule: Manual only - use Plugins > HA Device Monitor > Run Check Now")
         elif mode == "hourly":
@@ -356,6 +824,142 @@ class Plugin(indigo.PluginBase):
         """Triggered from Plugins > HA Device Monitor > Run Check Now."""
         self.logger.info("Check requested from menu")
         self.run_check_requested = True
+        self._wake_scheduler()
+
+    def show_performance_trends(self):
+        """Log API latency and cycle time percentiles for the last hour, day and week."""
+        if self.metrics is None:
+            self.logger.warning("Performance metrics are not available (metrics store could not be opened)")
+            return
+
+        def ms(value):
+            return f"{value:,.0f}" if value is not None else "-"
+
+        lines = [
+            "",
+            f"{'=' * 88}",
+            f"{'HA DEVICE MONITOR PERFORMANCE TRENDS':^88}",
+            f"{'=' * 88}",
+            f"{'Window':<8}{'Cycles':>8}{'Failed':>8}   "
+            f"{'API ms p50 / p95 / p99':<24}{'Cycle ms p50 / p95 / p99':<26}{'Avg KB':>8}",
+            f"{'-' * 88}",
+        ]
+        try:
+            for label, seconds in (("Hour", 3600), ("Day", 86400), ("Week", 7 * 86400)):
+                summary = self.metrics.summary(seconds)
+                payload = summary["averages"].get("payload_bytes")
+                api = " / ".join(ms(summary[f"fetch_p{p}"]) for p in (50, 95, 99))
+                cycle = " / ".join(ms(summary[f"cycle_p{p}"]) for p in (50, 95, 99))
+                lines.append(
+                    f"{label + ('*' if summary['estimated'] else ''):<8}{summary['cycles']:>8}"
+                    f"{summary['failures']:>8}   {api:<24}{cycle:<26}"
+                    f"{(f'{payload / 1024:,.1f}' if payload is not None else '-'):>8}"
+                )
+        except Exception:
+            self.logger.exception("Failed to read performance metrics")
+            return
+        lines.append(f"{'-' * 88}")
+        lines.append("* estimated from hourly rollups (within ~5%). API latency excludes WebSocket cycles.")
+        lines.append(f"{'=' * 88}")
+        self.logger.info("\n".join(lines))
+
+    def show_availability_report(self):
+        """Log the least available devices over the last 7 and 30 days."""
+        if self.history is None:
+            self.logger.warning("Availability history is not available (history file could not be opened)")
+            return
+
+        def duration(seconds):
+            return self._format_age(seconds / 60) if seconds is not None else "-"
+
+        with self.device_index_lock:
+            monitored = set(self.entity_index)
+        now_ts = time.time()
+        lines = [
+            "",
+            f"{'=' * 88}",
+            f"{'HA DEVICE MONITOR AVAILABILITY':^88}",
+            f"{'=' * 88}",
+        ]
+        try:
+            for days in (7, 30):
+                window = days * 86400
+                worst = self.history.worst(window, AVAILABILITY_REPORT_ROWS, now_ts, monitored)
+                lines.append(f"Worst {AVAILABILITY_REPORT_ROWS} devices, last {days} days")
+                lines.append(f"{'-' * 88}")
+                if not worst:
+                    lines.append("No problems recorded")
+                    lines.append(f"{'-' * 88}")
+                    continue
+                lines.append(f"{'Device':<32}{'Avail %':>8}{'Fails':>6}{'MTBF':>7}{'MTTR':>7}   Problems")
+                for row in worst:
+                    name = self._device_name_for_entity(row["entity"]) or row["entity"]
+                    types = {}
+                    for _, problem in self.history.transitions(row["entity"], now_ts - window):
+                        if problem is not None:
+                            types[problem] = types.get(problem, 0) + 1
+                    problems = ", ".join(f"{t} {n}" for t, n in sorted(types.items(), key=lambda x: -x[1]))
+                    if row["problem"]:
+                        problems = f"NOW {row['problem']}" + (f"; {problems}" if problems else "")
+                    lines.append(
+                        f"{name[:31]:<32}{row['availability']:>8.2f}{row['failures']:>6}"
+                        f"{duration(row['mtbf']):>7}{duration(row['mttr']):>7}   {problems}"
+                    )
+                lines.append(f"{'-' * 88}")
+        except Exception:
+            self.logger.exception("Failed to read availability history")
+            return
+        started = datetime.fromtimestamp(self.history.started)
+        lines.append(f"MTBF = mean time between failures, MTTR = mean time to recovery. "
+                     f"Tracking since {self._format_timestamp(started)}.")
+        lines.append(f"{'=' * 88}")
+        self.logger.info("\n".join(lines))
+
+    def dump_performance_profile(self):
+        """Log per-phase timings of recent check cycles."""
+        timer = self.phase_timer
+        phases = timer.snapshot()
+        if not phases:
+            self.logger.info("No check cycles timed yet")
+            return
+
+        order = ["prepare", "fetch", "decode", "freshness", "stuck", "checks", "variables",
+                 "persist", "report", "notify", "total"]
+        total_mean = phases.get("total", {}).get("mean_ms") or 0
+        lines = [
+            "",
+            f"{'=' * 88}",
+            f"{'HA DEVICE MONITOR PERFORMANCE PROFILE':^88}",
+            f"{f'{min(timer.cycles, timer.window)} most recent of {timer.cycles} cycle(s) this session':^88}",
+            f"{'=' * 88}",
+            f"{'Phase':<14}{'Last ms':>10}{'Mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'Max ms':>10}{'% cycle':>10}",
+            f"{'-' * 88}",
+        ]
+        for name in order + sorted(set(phases) - set(order)):
+            stats = phases.get(name)
+            if stats is None:
+                continue
+            share = f"{100 * stats['mean_ms'] / total_mean:.1f}" if total_mean and name != "total" else ""
+            label = f"  {name}" if name == "decode" else name
+            lines.append(
+                f"{label:<14}{stats['last_ms']:>10.1f}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}"
+                f"{stats['p95_ms']:>10.1f}{stats['max_ms']:>10.1f}{share:>10}"
+            )
+        lines.append(f"{'-' * 88}")
+        lines.append("decode = parser CPU time, already included in fetch")
+        overhead_ms = timer.overhead_us * len(order) / 1000
+        if total_mean:
+            lines.append(f"Instrumentation overhead: {overhead_ms * 1000:.1f}\u00b5s per cycle "
+                         f"({100 * overhead_ms / total_mean:.3f}% of mean cycle time)")
+        lines.append(f"{'=' * 88}")
+        self.logger.info("\n".join(lines))
+
+    def profile_check_cycle(self):
+        """Run one check cycle under cProfile; stats are written to the plugin log folder."""
+        self.profile_next_cycle = True
+        self.run_check_requested = True
+        self.logger.info("Profiling the next check cycle...")
+        self._wake_scheduler()
 
     def toggle_debug(self):
         """Toggle log level between INFO and DEBUG from the plugin menu."""
@@ -409,51 +1013,80 @@ class Plugin(indigo.PluginBase):
     # Exclude List UI (dynamic config dialog callbacks)
     # -------------------------------------------------------------------------
 
+    def _device_picker_entries(self):
+        """Return [(entity_id, label, search_key, enabled)] for HA Agent devices, sorted by label.
+
+        Built once and cached until the device index changes, so the dialog's
+        dynamicReload callbacks don't rebuild and re-sort on every click.
+        `search_key` is the lowercased name and entity ID for the filter field.
+        """
+        with self.device_index_lock:
+            if self.picker_entries is None:
+                entries = []
+                for dev in self.device_index.values():
+                    entity_id = dev["address"]
+                    if not entity_id:
+                        continue
+                    label = f"{dev['name']}  \u2014  {entity_id}"
+                    entries.append((entity_id, label, f"{dev['name']}\n{entity_id}".lower(), dev["enabled"]))
+                entries.sort(key=lambda e: e[1].lower())
+                self.picker_entries = entries
+            return self.picker_entries
+
     def available_ha_devices(self, filter="", valuesDict=None, typeId="", targetId=0):
-        """Return HA Agent devices NOT already in the exclude list, for the dropdown."""
+        """Return HA Agent devices NOT already in the exclude list, for the dropdown.
+
+        The "Filter" field narrows the menu to devices whose name or entity ID
+        contains the text; at most PICKER_MAX_ITEMS are listed.
+        """
         excluded = set()
+        text = ""
         if valuesDict:
-            raw = valuesDict.get("excludeEntities", "")
-            if raw:
-                excluded = {e.strip() for e in raw.split(",") if e.strip()}
+            excluded = set(split_entity_ids(valuesDict.get("excludeEntities", "")))
+            text = valuesDict.get("excludeFilter", "").strip().lower()
 
         device_list = [("", "\u2014 Select a device \u2014")]
-        for dev in indigo.devices:
-            if dev.pluginId != HA_AGENT_PLUGIN_ID:
+        matched = 0
+        for entity_id, label, search_key, enabled in self._device_picker_entries():
+            if not enabled or entity_id in excluded or (text and text not in search_key):
                 continue
-            if not dev.enabled:
-                continue
-            entity_id = dev.address
-            if not entity_id or entity_id in excluded:
-                continue
-            device_list.append((entity_id, f"{dev.name}  \u2014  {entity_id}"))
-
-        return sorted(device_list, key=lambda x: x[1].lower())
+            matched += 1
+            if matched <= PICKER_MAX_ITEMS:
+                device_list.append((entity_id, label))
+        if matched > PICKER_MAX_ITEMS:
+            device_list.append(("", f"\u2014 {matched - PICKER_MAX_ITEMS} more - type in Filter to narrow \u2014"))
+        elif text and not matched:
+            device_list.append(("", f"\u2014 No devices match '{text}' \u2014"))
+        return device_list
 
     def excluded_ha_devices(self, filter="", valuesDict=None, typeId="", targetId=0):
         """Return devices currently in the exclude list, for the list display."""
         if not valuesDict:
             return []
 
-        raw = valuesDict.get("excludeEntities", "")
-        if not raw:
+        excluded = set(split_entity_ids(valuesDict.get("excludeEntities", "")))
+        if not excluded:
             return []
 
-        # Build a lookup of entity_id -> device name
-        entity_to_name = {}
-        for dev in indigo.devices:
-            if dev.pluginId == HA_AGENT_PLUGIN_ID and dev.address:
-                entity_to_name[dev.address] = dev.name
-
         result = []
-        for entity_id in raw.split(","):
-            entity_id = entity_id.strip()
-            if not entity_id:
-                continue
-            name = entity_to_name.get(entity_id, "(unknown device)")
-            result.append((entity_id, f"{name}  \u2014  {entity_id}"))
+        for entity_id, label, _, _ in self._device_picker_entries():
+            if entity_id in excluded:
+                result.append((entity_id, label))
+                excluded.discard(entity_id)
+        # Entity IDs no device points at any more, after the known ones
+        result.extend((entity_id, f"(unknown device)  \u2014  {entity_id}") for entity_id in sorted(excluded))
+        return result
+
+    def filter_exclude_devices(self, valuesDict, typeId, devId):
+        """Filter button: returning valuesDict makes Indigo reload the device menu."""
+        return valuesDict
 
-        return sorted(result, key=lambda x: x[1].lower())
+    def _device_name_for_entity(self, entity_id):
+        """Look up the name of the (first) HA Agent device bound to entity_id."""
+        with self.device_index_lock:
+            for dev_id in self.entity_index.get(entity_id, ()):
+                return self.device_index[dev_id]["name"]
+        return None
 
     def add_exclude(self, valuesDict, typeId, devId):
         """Add the selected device to the exclude list."""
@@ -506,6 +1139,54 @@ class Plugin(indigo.PluginBase):
         except ValueError:
             errorMsgDict["staleThreshold"] = "Must be a number"
 
+        try:
+            StaleThresholds(0, valuesDict.get("staleOverrides", ""))
+        except ValueError as e:
+            errorMsgDict["staleOverrides"] = str(e)
+
+        try:
+            if int(valuesDict.get("stuckWindow", 0) or 0) < 0:
+                errorMsgDict["stuckWindow"] = "Cannot be negative"
+        except ValueError:
+            errorMsgDict["stuckWindow"] = "Must be a number"
+
+        try:
+            percent = float(valuesDict.get("stormThresholdPercent", DEFAULT_STORM_THRESHOLD_PERCENT))
+            if not 0 <= percent <= 100:
+                errorMsgDict["stormThresholdPercent"] = "Must be between 0 and 100"
+        except ValueError:
+            errorMsgDict["stormThresholdPercent"] = "Must be a number"
+
+        try:
+            if float(valuesDict.get("notifyDigestSeconds", 0) or 0) < 0:
+                errorMsgDict["notifyDigestSeconds"] = "Cannot be negative"
+        except ValueError:
+            errorMsgDict["notifyDigestSeconds"] = "Must be a number"
+
+        try:
+            percent = float(valuesDict.get("targetedFetchPercent", DEFAULT_TARGETED_FETCH_PERCENT))
+            if not 0 <= percent <= 100:
+                errorMsgDict["targetedFetchPercent"] = "Must be between 0 and 100"
+        except ValueError:
+            errorMsgDict["targetedFetchPercent"] = "Must be a number"
+
+        try:
+            self._parse_instance_specs(valuesDict.get("haInstances", ""))
+        except ValueError as e:
+            errorMsgDict["haInstances"] = str(e)
+
+        try:
+            ExcludeRules(patterns=split_rules(valuesDict.get("excludePatterns", "")))
+        except ValueError as e:
+            errorMsgDict["excludePatterns"] = str(e)
+
+        try:
+            port = int(valuesDict.get("metricsPort", "") or 0)
+            if port and not 1024 <= port <= 65535:
+                errorMsgDict["metricsPort"] = "Must be between 1024 and 65535 (blank = off)"
+        except ValueError:
+            errorMsgDict["metricsPort"] = "Must be a port number"
+
         if len(errorMsgDict) > 0:
             return False, valuesDict, errorMsgDict
         return True, valuesDict
@@ -516,41 +1197,81 @@ class Plugin(indigo.PluginBase):
             self.indigo_log_handler.setLevel(self.logLevel)
             self.plugin_file_handler.setLevel(self.logLevel)
             self.pluginPrefs = valuesDict
-            self._read_ha_agent_config()
+            self._read_ha_agent_config(force=True)
+            self._load_extra_instances()
+            self._compile_exclude_rules()
+            self._compile_stale_thresholds()
+            self._configure_notifier()
+            self._configure_metrics_endpoint()
+
+            # Drop any existing WebSocket session: the mode or HA connection
+            # may have changed. The concurrent thread restarts it if needed.
+            self._stop_event_stream()
 
             stale_mins = int(valuesDict.get("staleThreshold", 2880))
             stale_display = f"{stale_mins}m ({stale_mins // 60}h)" if stale_mins > 0 else "disabled"
+            overrides = self.stale_thresholds.override_count
+            if overrides:
+                stale_display += f", {overrides} override(s)"
             self.logger.info(f"Config updated - stale threshold: {stale_display}")
 
-            exclude_count = len(self._get_exclude_list())
-            if exclude_count > 0:
-                self.logger.info(f"Exclude list: {exclude_count} entity/entities will be skipped")
+            rules = self.exclude_rules
+            if len(rules) > 0:
+                self.logger.info(
+                    f"Exclude list: {len(rules.exact)} entity/entities and {len(rules.patterns)} pattern(s) will be skipped"
+                )
 
             # Reset schedule tracking so next eligible slot fires
             self.last_scheduled_run = None
             self._log_schedule_info()
+            self._wake_scheduler()
 
     # -------------------------------------------------------------------------
     # HA Agent Config Reader
     # -------------------------------------------------------------------------
 
-    def _read_ha_agent_config(self):
+    def _read_ha_agent_config(self, force=False):
+        """Read HA connection settings from the HA Agent's .indiPref file.
+
+        Called before every fetch; unless `force` is set the file is only
+        re-parsed when its mtime changes, so token or address changes in the
+        HA Agent are picked up without restarting this plugin. Whether the HA
+        Agent is still enabled is checked every time, so a disabled agent's
+        cached token isn't used.
+        """
+        prefs_path = os.path.join(
+            indigo.server.getInstallFolderPath(),
+            "Preferences", "Plugins",
+            f"{HA_AGENT_PLUGIN_ID}.indiPref"
+        )
+        try:
+            mtime = os.stat(prefs_path).st_mtime
+        except OSError:
+            mtime = None
+        if (not force and self.ha_base_url and mtime is not None and mtime == self.ha_prefs_mtime
+                and self._ha_agent_enabled()):
+            return True
+
+        ok = self._parse_ha_agent_config(prefs_path)
+        self.ha_prefs_mtime = mtime if ok else None
+        self.primary_instance.reconfigure(self.ha_base_url, self.ha_token)
+        return ok
+
+    @staticmethod
+    def _ha_agent_enabled():
+        ha_plugin = indigo.server.getPlugin(HA_AGENT_PLUGIN_ID)
+        return bool(ha_plugin) and ha_plugin.isEnabled()
+
+    def _parse_ha_agent_config(self, prefs_path):
         try:
             # Check the HA Agent plugin is installed and enabled
-            ha_plugin = indigo.server.getPlugin(HA_AGENT_PLUGIN_ID)
-            if not ha_plugin or not ha_plugin.isEnabled():
+            if not self._ha_agent_enabled():
                 self.logger.error("Home Assistant Agent plugin is not installed or not enabled")
                 self.ha_base_url = None
                 self.ha_token = None
                 return False
 
             # Read HA Agent preferences from its .indiPref file on disk
-            prefs_path = os.path.join(
-                indigo.server.getInstallFolderPath(),
-                "Preferences", "Plugins",
-                f"{HA_AGENT_PLUGIN_ID}.indiPref"
-            )
-
             if not os.path.exists(prefs_path):
                 self.logger.error(f"HA Agent preferences file not found: {prefs_path}")
                 self.ha_base_url = None
@@ -592,94 +1313,460 @@ class Plugin(indigo.PluginBase):
     # HA REST API
     # -------------------------------------------------------------------------
 
-    def _fetch_ha_entities(self):
-        if not self.ha_base_url or not self.ha_token:
-            if not self._read_ha_agent_config():
-                return None
+    @staticmethod
+    def _ssl_context():
+        """Shared SSL context that allows HA's common self-signed certificates."""
+        return shared_ssl_context()
+
+    def _ha_instances(self):
+        return [self.primary_instance] + self.extra_instances
 
-        url = f"{self.ha_base_url}/api/states"
-        req = urllib.request.Request(url, headers={
-            "Authorization": f"Bearer {self.ha_token}",
-            "Content-Type": "application/json"
-        })
+    def _close_ha_clients(self):
+        with self.pending_instances_lock:
+            pending = self.pending_extra_instances or []
+        for instance in self._ha_instances() + pending:
+            instance.close()
+
+    def _load_extra_instances(self):
+        """Parse the haInstances setting into additional HAInstance objects.
+
+        One instance per line (or separated by semicolons):
+            name|base_url|token|pattern[,pattern...]
+        Patterns are entity ID globs, e.g. "*.barn_*,sensor.barn*". Devices
+        whose entity ID matches no pattern belong to the HA Agent's server.
 
-        # Allow self-signed certs
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
+        The new list is applied right away when no check cycle is running,
+        otherwise by the next cycle (see _apply_extra_instances).
+        """
+        try:
+            specs = self._parse_instance_specs(self.pluginPrefs.get("haInstances", ""))
+        except ValueError as e:
+            self.logger.error(f"Ignoring additional HA instances - {e}")
+            specs = []
+        instances = []
+        for name, base_url, token, patterns in specs:
+            instances.append(HAInstance(name, base_url, token, patterns))
+            self.logger.info(f"Additional HA instance '{name}': {base_url} ({', '.join(patterns)})")
+        with self.pending_instances_lock:
+            replaced, self.pending_extra_instances = self.pending_extra_instances, instances
+        for instance in replaced or []:
+            instance.close()
+        if self.cycle_lock.acquire(blocking=False):
+            try:
+                self._apply_extra_instances()
+            finally:
+                self.cycle_lock.release()
+
+    def _apply_extra_instances(self):
+        """Swap in instances reloaded by _load_extra_instances, if any.
+
+        Called with cycle_lock held (or from the cycle itself), so a cycle
+        never sees its partitions or clients change under it. The old
+        instances are closed here, once the cycle that used them has ended.
+        """
+        with self.pending_instances_lock:
+            instances, self.pending_extra_instances = self.pending_extra_instances, None
+        if instances is None:
+            return
+        old, self.extra_instances = self.extra_instances, instances
+        self.instance_for_entity = {}
+        for instance in old:
+            instance.close()
+
+    @staticmethod
+    def _parse_instance_specs(raw):
+        """Return [(name, base_url, token, patterns)]; raises ValueError on a malformed entry."""
+        specs = []
+        names = {"main"}
+        for entry in raw.replace(";", "\n").split("\n"):
+            entry = entry.strip()
+            if not entry:
+                continue
+            parts = [p.strip() for p in entry.split("|")]
+            if len(parts) != 4 or not all(parts):
+                raise ValueError(f"Entry '{entry[:40]}' is not name|url|token|patterns")
+            name, base_url, token, patterns = parts
+            if name in names:
+                raise ValueError(f"Duplicate instance name '{name}'")
+            if not base_url.startswith(("http://", "https://")):
+                raise ValueError(f"Instance '{name}': URL must start with http:// or https://")
+            names.add(name)
+            specs.append((name, base_url.rstrip("/"), token,
+                          [p.strip() for p in patterns.split(",") if p.strip()]))
+        return specs
+
+    def _instance_for(self, entity_id):
+        """The HA instance an entity ID belongs to (first matching extra instance, else the primary)."""
+        instance = self.instance_for_entity.get(entity_id)
+        if instance is None:
+            instance = next((i for i in self.extra_instances if i.matches(entity_id)), self.primary_instance)
+            self.instance_for_entity[entity_id] = instance
+        return instance
+
+    def _get_ha_entities(self, wanted=None, force=False):
+        """Return (entities, failed_instances) across all HA instances.
+
+        Each instance is asked only for the monitored entities routed to it;
+        the primary instance uses the WebSocket snapshot when realtime mode is
+        synced. With several instances the REST fetches run in parallel, so the
+        cycle waits for the slowest instance rather than the sum. An instance
+        that can't be reached, or whose circuit breaker is open (unless
+        `force`), is listed in failed_instances (a set of names) and simply
+        contributes no entities. An instance with no monitored entities routed
+        to it is only fetched every BULK_RECALIBRATE_SECONDS, to keep its
+        entity total and ID set (for rename suggestions) current.
+        """
+        wanted = wanted or set()
+        now_ts = time.time()
+        if not self.extra_instances:
+            partitions = {self.primary_instance: wanted}
+        else:
+            partitions = {instance: set() for instance in self._ha_instances()}
+            for entity_id in wanted:
+                partitions[self._instance_for(entity_id)].add(entity_id)
+
+        results = {}
+        rest = []
+        stream = self.event_stream
+        for instance, ids in partitions.items():
+            instance.monitored = len(ids)
+            if instance is self.primary_instance and stream is not None:
+                snapshot = stream.snapshot()
+                if snapshot is not None:
+                    if instance.entity_ids_version != stream.entity_set_version:
+                        instance.set_entity_ids(list(snapshot), stream.entity_set_version)
+                    instance.last_response_ms = stream.last_sync_ms
+                    instance.last_fetch_strategy = "websocket"
+                    self._instance_recovered(instance)
+                    self.logger.debug(
+                        f"Using {len(snapshot)} entities from WebSocket stream "
+                        f"({stream.events_applied} event(s) applied)"
+                    )
+                    results[instance] = snapshot
+                    continue
+            if not ids and now_ts - instance.last_bulk_fetch <= BULK_RECALIBRATE_SECONDS:
+                results[instance] = {}
+                continue
+            if not force and instance.breaker_open(now_ts):
+                self.logger.debug(f"{self._instance_label(instance)}HA still in backoff - not fetching")
+                results[instance] = None
+                continue
+            rest.append(instance)
+
+        if len(rest) > 1:
+            if self.instance_executor is None:
+                self.instance_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=4, thread_name_prefix="ha_instance"
+                )
+            futures = {i: self.instance_executor.submit(self._fetch_ha_entities, i, partitions[i]) for i in rest}
+            for instance, future in futures.items():
+                results[instance] = future.result()
+        else:
+            for instance in rest:
+                results[instance] = self._fetch_ha_entities(instance, partitions[instance])
+
+        for instance in rest:
+            if results[instance] is not None and instance.last_response_ms is not None:
+                hist = self.response_histograms.get(instance.name)
+                if hist is None:
+                    hist = self.response_histograms[instance.name] = Histogram()
+                hist.observe(instance.last_response_ms / 1000)
+        fetch_times = [i.last_response_ms for i in rest if results[i] is not None]
+        self.cycle_fetch_ms = max(fetch_times) if fetch_times else None
+        payloads = [i.payload_bytes for i in rest if results[i] is not None]
+        self.cycle_payload_bytes = sum(payloads) if payloads else None
+        for instance in rest:
+            if results[instance] is not None and instance.last_timing:
+                self.phase_timer.add("decode", instance.last_timing["parse_cpu_ms"] / 1000)
+
+        failed = {instance.name for instance, entities in results.items() if entities is None}
+        if len(partitions) == 1:
+            return results[self.primary_instance], failed
+
+        # Only keep each instance's own entities, so an ID that exists on two
+        # servers is always judged by the instance it's routed to
+        entities = {}
+        for instance, ids in partitions.items():
+            fetched = results[instance]
+            if fetched:
+                for entity_id in ids:
+                    state = fetched.get(entity_id)
+                    if state is not None:
+                        entities[entity_id] = state
+        return entities, failed
+
+    def _choose_fetch_strategy(self, instance, wanted):
+        """Pick "targeted" when monitored entities are a small fraction of HA's total."""
+        if not wanted or not instance.entity_total:
+            return "bulk"
+        if time.time() - instance.last_bulk_fetch > BULK_RECALIBRATE_SECONDS:
+            return "bulk"
+        try:
+            threshold = float(self.pluginPrefs.get("targetedFetchPercent", DEFAULT_TARGETED_FETCH_PERCENT))
+        except ValueError:
+            threshold = DEFAULT_TARGETED_FETCH_PERCENT
+        ratio = 100.0 * len(wanted) / instance.entity_total
+        strategy = "targeted" if ratio < threshold else "bulk"
+        self.logger.debug(
+            f"{self._instance_label(instance)}Fetch strategy: {strategy} ({len(wanted)}/{instance.entity_total} "
+            f"entities monitored = {ratio:.1f}%, threshold {threshold:g}%)"
+        )
+        return strategy
+
+    def _instance_label(self, instance):
+        """Log prefix naming the instance, only when more than one is configured."""
+        return f"[{instance.name}] " if self.extra_instances else ""
+
+    def _fetch_ha_entities(self, instance, wanted=None):
+        label = self._instance_label(instance)
+        # Cheap when nothing changed: only stats the HA Agent .indiPref
+        if instance is self.primary_instance and not self._read_ha_agent_config():
+            self._instance_failed(instance, "HA Agent connection not configured")
+            instance.last_response_ms = None
+            instance.last_timing = None
+            return None
 
+        client = instance.get_client()
+        strategy = self._choose_fetch_strategy(instance, wanted)
         try:
             start_time = time.time()
-            with urllib.request.urlopen(req, timeout=15, context=ctx) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
-            self.last_api_response_ms = int((time.time() - start_time) * 1000)
-
-            entities = {}
-            for entity in data:
-                entities[entity["entity_id"]] = entity
-            self.logger.debug(f"Fetched {len(entities)} entities from Home Assistant ({self.last_api_response_ms}ms)")
+            start_bytes = client.bytes_received
+            if strategy == "targeted":
+                entities = self._fetch_targeted(client, wanted)
+            else:
+                entities, strategy = self._fetch_bulk(instance, client, wanted)
+            instance.last_timing = client.last_timing if strategy != "targeted" else None
+            instance.last_response_ms = int((time.time() - start_time) * 1000)
+            instance.last_fetch_strategy = strategy
+            instance.payload_bytes = client.bytes_received - start_bytes
+            self._instance_recovered(instance)
+
+            timing = instance.last_timing
+            if timing:
+                self.logger.debug(
+                    f"{label}{'Template' if strategy == 'template' else 'Bulk'} fetch: "
+                    f"{instance.entity_total} entities, kept {len(entities)} monitored "
+                    f"({instance.last_response_ms}ms: connect {timing['connect_ms']}ms"
+                    f"{' (reused)' if timing['reused'] else ''}, TTFB {timing['ttfb_ms']}ms, "
+                    f"transfer {timing['transfer_ms']}ms)"
+                )
+            else:
+                self.logger.debug(
+                    f"{label}Targeted fetch: {len(wanted)} request(s), {len(entities)} found "
+                    f"({instance.last_response_ms}ms, {TARGETED_FETCH_WORKERS} workers)"
+                )
             return entities
 
-        except urllib.error.HTTPError as e:
-            self.last_api_response_ms = None
-            self.logger.error(f"HA API HTTP error {e.code}: {e.reason}")
-            return None
-        except urllib.error.URLError as e:
-            self.last_api_response_ms = None
-            self.logger.error(f"HA API connection error: {e.reason}")
+        except HAHTTPError as e:
+            self._instance_failed(instance, f"HA API HTTP error {e.code}: {e.reason}")
+        except (OSError, http.client.HTTPException) as e:
+            self._instance_failed(instance, f"HA API connection error: {e}")
+        except Exception as e:
+            self._instance_failed(instance, f"Failed to fetch HA entities: {e}", traceback=True)
+        instance.last_response_ms = None
+        instance.last_timing = None
+        return None
+
+    def _instance_recovered(self, instance):
+        """Close the instance's circuit breaker, logging the end of an outage."""
+        if instance.failures:
+            self.logger.info(
+                f"{self._instance_label(instance)}HA back after "
+                f"{self._format_age((time.time() - instance.down_since) / 60)} "
+                f"({instance.failures} failed attempt(s))"
+            )
+            instance.record_success()
+        instance.last_error = None
+
+    def _instance_failed(self, instance, message, traceback=False):
+        """Trip the instance's circuit breaker; only the first failure in a run is logged as an error."""
+        label = self._instance_label(instance)
+        first = instance.failures == 0
+        instance.last_error = message
+        self.fetch_failures[instance.name] = self.fetch_failures.get(instance.name, 0) + 1
+        backoff = instance.record_failure(time.time())
+        if first:
+            log = self.logger.exception if traceback else self.logger.error
+            log(f"{label}HA unreachable - {message}. Retrying in {backoff}s, backing off up to "
+                f"{BREAKER_MAX_SECONDS // 60}m until it answers")
+        else:
+            self.logger.debug(f"{label}HA still unreachable ({message}) - next attempt in {backoff}s")
+
+    def _breaker_retry_time(self, now_ts):
+        """When the first open circuit breaker allows a retry, if every instance is in backoff (else None)."""
+        instances = self._ha_instances()
+        if self.event_stream is not None and self.event_stream.synced.is_set():
             return None
-        except Exception:
-            self.last_api_response_ms = None
-            self.logger.exception("Failed to fetch HA entities")
+        if not all(i.breaker_open(now_ts) for i in instances):
             return None
+        return min(i.retry_at for i in instances)
+
+    def _update_poll_interval(self, now_ts):
+        """Adapt the continuous-mode interval to HA latency and problem activity."""
+        interval = CHECK_INTERVAL_SECONDS
+        reason = "normal"
+        fetches = sorted(self.recent_fetch_ms)
+        p95 = fetches[min(len(fetches) - 1, int(len(fetches) * 0.95))] if len(fetches) >= 5 else 0
+        if p95 > SLOW_FETCH_MS:
+            interval = min(MAX_CHECK_INTERVAL_SECONDS, int(CHECK_INTERVAL_SECONDS * p95 / SLOW_FETCH_MS))
+            reason = f"HA p95 fetch {p95 / 1000:.1f}s"
+        elif self.storm is not None or (
+                self.known_problems and now_ts - self.last_problem_change < FAST_POLL_WINDOW_SECONDS):
+            # Once everything has recovered there is nothing left to confirm
+            interval = FAST_CHECK_INTERVAL_SECONDS
+            reason = "problems changing"
+        if interval != self.poll_interval:
+            log = self.logger.info if interval > CHECK_INTERVAL_SECONDS else self.logger.debug
+            log(f"Check interval now {interval}s ({reason})")
+            self.poll_interval = interval
+
+    def _fetch_bulk(self, instance, client, wanted):
+        """Fetch all monitored entities in one request. Returns (entities, strategy).
+
+        With fetchMethod "template" HA renders a compact projection of just the
+        monitored IDs via /api/template; if that endpoint errors this falls
+        back to the streaming /api/states fetch. The template doesn't return
+        the full ID set, so /api/states still runs every BULK_RECALIBRATE_SECONDS.
+        """
+        label = self._instance_label(instance)
+        if (wanted and self.pluginPrefs.get("fetchMethod", "states") == "template"
+                and time.time() - instance.last_bulk_fetch <= BULK_RECALIBRATE_SECONDS):
+            try:
+                entities, total = client.render_states_template(wanted)
+                instance.entity_total = total
+                if instance.template_fetch_failed:
+                    self.logger.info(f"{label}HA template fetch working again")
+                    instance.template_fetch_failed = False
+                return entities, "template"
+            except (HAHTTPError, ValueError) as e:
+                if not instance.template_fetch_failed:
+                    self.logger.warning(f"{label}HA template fetch failed ({e}) - falling back to /api/states")
+                    instance.template_fetch_failed = True
+
+        # Parse incrementally, keeping only entity_id/state/last_updated
+        # for monitored entities - never holds the whole body in memory.
+        # Every entity ID is kept for rename suggestions.
+        all_ids = []
+        _, (entities, total) = client.request(
+            "GET", "/api/states", parse=lambda fp: parse_states_stream(fp, wanted, all_ids=all_ids)
+        )
+        instance.set_entity_ids(all_ids)
+        instance.entity_total = total
+        instance.last_bulk_fetch = time.time()
+        return entities, "bulk"
+
+    def _fetch_targeted(self, client, wanted):
+        """Fetch only the monitored entities, concurrently, via /api/states/<entity_id>.
+
+        A 404 leaves the entity out of the result, so the "missing" check sees
+        exactly what it would after a bulk fetch. Any other error fails the fetch.
+        """
+        if self.fetch_executor is None:
+            self.fetch_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=TARGETED_FETCH_WORKERS, thread_name_prefix="ha_fetch"
+            )
+        entities = {}
+        for state in self.fetch_executor.map(client.get_state, sorted(wanted)):
+            if state is not None:
+                entities[state["entity_id"]] = state
+        return entities
 
     # -------------------------------------------------------------------------
     # Main Check Cycle
     # -------------------------------------------------------------------------
 
     def _run_check_cycle(self, manual=False):
-        entities = self._fetch_ha_entities()
-        if entities is None:
-            self.logger.warning("Skipping check cycle - could not fetch HA entities")
+        self._apply_extra_instances()
+        timer = self.phase_timer
+        timer.start_cycle()
+        self.cycle_fetch_ms = None
+        self.cycle_payload_bytes = None
+        self.pending_problems = {}
+        exclude = self.exclude_rules.match
+        stale_policy = self.stale_thresholds
+        devices = self._indexed_ha_devices()
+        thresholds = {}  # entity_id -> stale threshold (seconds) of its (first) device
+        for dev in devices:
+            entity_id = dev["address"]
+            if dev["enabled"] and entity_id and exclude(entity_id) is None and entity_id not in thresholds:
+                thresholds[entity_id] = stale_policy.seconds(entity_id, dev["deviceTypeId"])
+        wanted = set(thresholds)
+        timer.lap("prepare")
+
+        entities, failed_instances = self._get_ha_entities(wanted, force=manual)
+        timer.lap("fetch")
+        if self.cycle_fetch_ms is not None:
+            self.recent_fetch_ms.append(self.cycle_fetch_ms)
+        if entities is None or len(failed_instances) == len(self._ha_instances()):
+            # The circuit breaker has already logged the outage. Deadlines that
+            # have passed are still expired, so the scheduler doesn't keep
+            # waking for them while HA is unreachable
+            self.freshness.pop_expired(time.time())
+            self.logger.debug("Skipping check cycle - could not fetch HA entities")
+            self._record_cycle_metrics({"ok": 0, "monitored": len(wanted)})
             return
 
+        # Devices on an unreachable instance are skipped this cycle; their
+        # known problems are carried over rather than reported as recovered
+        unreachable = set()
+        if failed_instances:
+            unreachable = {e for e in wanted if self._instance_for(e).name in failed_instances}
+            wanted -= unreachable
+
         stale_threshold = int(self.pluginPrefs.get("staleThreshold", 2880))
-        exclude_list = self._get_exclude_list()
-        now = datetime.now(timezone.utc)
+        stale_enabled = stale_policy.enabled
+        now_ts = time.time()
+        if stale_enabled:
+            self._update_freshness(entities, wanted, thresholds, now_ts)
+        elif len(self.freshness):
+            self.freshness.clear()
+        timer.lap("freshness")
+        stuck_window = self._stuck_window_minutes() * 60
+        if stuck_window:
+            self._update_stuck_values(entities, wanted, now_ts)
+        elif len(self.stuck_values):
+            self.stuck_values.clear()
+        timer.lap("stuck")
         total = 0
         problems = 0
         excluded = 0
+        exclude_counts = {}
+        skipped = 0
         new_problems = []
-        current_problem_ids = set()
+        current_problem_ids = {e for e in unreachable if e in self.known_problems}
 
         # Collect results by category for the report
         missing_devices = []
         unavailable_devices = []
         domain_mismatch_devices = []
         stale_devices = []
+        stuck_devices = []
         recovered_devices = []
 
-        for dev in indigo.devices:
-            if dev.pluginId != HA_AGENT_PLUGIN_ID:
-                continue
-            if not dev.enabled:
+        for dev in devices:
+            if not dev["enabled"]:
                 continue
 
-            entity_id = dev.address
+            entity_id = dev["address"]
 
             # Check exclude list before counting
-            if entity_id and entity_id in exclude_list:
+            rule = exclude(entity_id) if entity_id else None
+            if rule is not None:
                 excluded += 1
+                exclude_counts[rule] = exclude_counts.get(rule, 0) + 1
+                continue
+            if entity_id in unreachable:
+                skipped += 1
                 continue
 
             total += 1
 
             if not entity_id:
-                key = f"device:{dev.id}"
+                key = f"device:{dev['id']}"
                 is_new = self._record_problem(key, "no_address")
                 if is_new:
-                    new_problems.append(f"{dev.name}: no entity_id")
-                missing_devices.append({"name": dev.name, "entity": "(none)", "detail": "No entity_id configured"})
+                    new_problems.append(f"{dev['name']}: no entity_id")
+                missing_devices.append({"name": dev["name"], "entity": "(none)", "detail": "No entity_id configured"})
                 problems += 1
                 current_problem_ids.add(key)
                 continue
@@ -687,9 +1774,12 @@ class Plugin(indigo.PluginBase):
             # --- Check 1: Entity exists ---
             if entity_id not in entities:
                 is_new = self._record_problem(entity_id, "missing")
+                suggestion = self._rename_suggestion(entity_id, dev["deviceTypeId"], thresholds)
+                hint = f" - renamed to {suggestion}?" if suggestion else ""
                 if is_new:
-                    new_problems.append(f"{dev.name}: missing in HA")
-                missing_devices.append({"name": dev.name, "entity": entity_id, "detail": "Not found in HA"})
+                    new_problems.append(f"{dev['name']}: missing in HA{hint}")
+                missing_devices.append({"name": dev["name"], "entity": entity_id,
+                                        "detail": f"Not found in HA{hint}", "suggestion": suggestion})
                 problems += 1
                 current_problem_ids.add(entity_id)
                 continue
@@ -701,88 +1791,474 @@ class Plugin(indigo.PluginBase):
             if state in ("unavailable", "unknown"):
                 is_new = self._record_problem(entity_id, "unavailable")
                 if is_new:
-                    new_problems.append(f"{dev.name}: {state}")
-                unavailable_devices.append({"name": dev.name, "entity": entity_id, "detail": state})
+                    new_problems.append(f"{dev['name']}: {state}")
+                unavailable_devices.append({"name": dev["name"], "entity": entity_id, "detail": state})
                 problems += 1
                 current_problem_ids.add(entity_id)
                 continue
 
             # --- Check 3: Domain matches device type ---
+            problems_before = problems
             entity_domain = entity_id.split(".")[0]
-            expected_domain = DEVICE_TYPE_TO_DOMAIN.get(dev.deviceTypeId)
+            expected_domain = DEVICE_TYPE_TO_DOMAIN.get(dev["deviceTypeId"])
             if expected_domain and entity_domain != expected_domain:
                 is_new = self._record_problem(entity_id, "domain_mismatch")
                 if is_new:
-                    new_problems.append(f"{dev.name}: domain mismatch")
+                    new_problems.append(f"{dev['name']}: domain mismatch")
                 domain_mismatch_devices.append({
-                    "name": dev.name, "entity": entity_id,
+                    "name": dev["name"], "entity": entity_id,
                     "detail": f"Expected '{expected_domain}', got '{entity_domain}'"
                 })
                 problems += 1
                 current_problem_ids.add(entity_id)
 
-            # --- Check 4: Freshness ---
-            if stale_threshold > 0:
-                last_updated_str = ha_entity.get("last_updated", "")
-                if last_updated_str:
-                    try:
-                        last_updated = datetime.fromisoformat(last_updated_str.replace("Z", "+00:00"))
-                        age_minutes = (now - last_updated).total_seconds() / 60.0
-                        if age_minutes > stale_threshold:
-                            is_new = self._record_problem(entity_id, "stale")
-                            if is_new:
-                                new_problems.append(f"{dev.name}: stale ({int(age_minutes)}m)")
-                            stale_devices.append({
-                                "name": dev.name, "entity": entity_id,
-                                "detail": self._format_age(age_minutes)
-                            })
-                            problems += 1
-                            current_problem_ids.add(entity_id)
-                    except (ValueError, TypeError):
-                        self.logger.debug(f"Could not parse last_updated for {entity_id}: {last_updated_str}")
+            # --- Check 4: Freshness (deadlines kept by the freshness engine) ---
+            if stale_enabled and entity_id in self.freshness.stale:
+                age_minutes = self.freshness.age_minutes(entity_id, now_ts)
+                is_new = self._record_problem(entity_id, "stale")
+                if is_new:
+                    new_problems.append(f"{dev['name']}: stale ({int(age_minutes)}m)")
+                detail = self._format_age(age_minutes)
+                if stale_policy.override_count:
+                    detail += f" (limit {self._format_age(self.freshness.threshold_minutes(entity_id))})"
+                stale_devices.append({"name": dev["name"], "entity": entity_id, "detail": detail})
+                problems += 1
+                current_problem_ids.add(entity_id)
 
-        # Check for recoveries
-        recovered = set(self.known_problems.keys()) - current_problem_ids
-        for entity_id in recovered:
-            info = self.known_problems.pop(entity_id)
-            recovered_devices.append({"entity": entity_id, "type": info["type"]})
+            # --- Check 5: Stuck value (same reading despite fresh updates) ---
+            if stuck_window and problems == problems_before:
+                stuck_seconds = self.stuck_values.stuck_seconds(entity_id, now_ts)
+                if stuck_seconds is not None and stuck_seconds >= stuck_window:
+                    value = self.stuck_values.value(entity_id)
+                    age = self._format_age(stuck_seconds / 60)
+                    is_new = self._record_problem(entity_id, "stuck")
+                    if is_new:
+                        new_problems.append(f"{dev['name']}: stuck at {value:g} ({age})")
+                    stuck_devices.append({"name": dev["name"], "entity": entity_id, "detail": f"{value:g} for {age}"})
+                    problems += 1
+                    current_problem_ids.add(entity_id)
+
+        self.exclude_counts = exclude_counts
 
-        # Update Indigo variables
-        self._update_status_variables(total, problems)
+        # Check for recoveries
+        recovered = [e for e in self.known_problems if e not in current_problem_ids]
+
+        # Mass outage: hold per-device transitions instead of committing them
+        storm_state = self._check_storm(recovered, new_problems, current_problem_ids, total, now_ts)
+        if storm_state in ("normal", "recovery"):
+            for entity_id, info in self.pending_problems.items():
+                self.known_problems[entity_id] = info
+                self.problem_journal.set(entity_id, info)
+                self._record_transition(entity_id, info["type"], now_ts)
+            for entity_id in recovered:
+                info = self.known_problems.pop(entity_id)
+                self.problem_journal.delete(entity_id)
+                self._record_transition(entity_id, None, now_ts)
+                recovered_devices.append({"entity": entity_id, "type": info["type"]})
+        else:
+            new_problems = []
+        timer.lap("checks")
+
+        # Update Indigo variables; the heartbeat is refreshed straight away
+        # whenever something changed or the user asked for a check
+        category_counts = {
+            "missing": len(missing_devices),
+            "unavailable": len(unavailable_devices),
+            "domain_mismatch": len(domain_mismatch_devices),
+            "stale": len(stale_devices),
+            "stuck": len(stuck_devices),
+        }
+        has_news = len(new_problems) > 0 or len(recovered_devices) > 0 or storm_state == "settled"
+        if has_news:
+            self.last_problem_change = now_ts
+        self._update_poll_interval(now_ts)
+        if skipped:
+            self.logger.debug(
+                f"Skipped {skipped} device(s) on unreachable HA instance(s): {', '.join(sorted(failed_instances))}"
+            )
+        self._update_status_variables(total, problems, category_counts,
+                                      force_last_check=manual or has_news)
+        self._update_variable("ha_monitor_outage", "true" if self.storm is not None else "false")
+        timer.lap("variables")
 
         # Save state to disk whenever problems change
-        has_news = len(new_problems) > 0 or len(recovered_devices) > 0
         if has_news:
             self._save_known_problems()
+        timer.lap("persist")
 
         if manual:
             # Manual check: always show the full report
             self._log_report(
                 total, problems,
                 missing_devices, unavailable_devices,
-                domain_mismatch_devices, stale_devices,
-                recovered_devices, stale_threshold, excluded
+                domain_mismatch_devices, stale_devices, stuck_devices,
+                recovered_devices, stale_threshold, excluded, skipped
             )
-        elif has_news:
+        elif has_news and storm_state in ("normal", "recovery"):
             # Scheduled/continuous: only log the specific changes, not the full report
             for p in new_problems:
                 self.logger.warning(f"NEW PROBLEM: {p}")
-            for item in recovered_devices:
-                self.logger.info(f"RECOVERED: {item['entity']} (was: {item['type']})")
+            if storm_state == "recovery":
+                self.logger.info(f"MASS RECOVERY: {len(recovered_devices)} device(s) back to normal in one check")
+            if storm_state == "normal" or len(recovered_devices) <= STORM_DETAIL_LINES:
+                for item in recovered_devices:
+                    self.logger.info(f"RECOVERED: {item['entity']} (was: {item['type']})")
         else:
             # Nothing new: stay silent
             self.logger.debug(
                 f"Silent check complete: {total - problems}/{total} OK, "
                 f"{problems} known issue(s), nothing new"
             )
+        timer.lap("report")
 
-        # Send notifications only for NEW problems (not repeated on subsequent checks)
+        # Send notifications only for NEW problems (not repeated on subsequent
+        # checks). Queued for the notifier threads - delivery never blocks the cycle.
         if new_problems:
-            summary = f"{len(new_problems)} new problem(s):\n" + "\n".join(f"- {p}" for p in new_problems)
-            if self.pluginPrefs.get("enablePushover", False):
-                self._send_pushover("HA Device Monitor", summary)
-            if self.pluginPrefs.get("enableEmail", False):
-                self._send_email("HA Device Monitor Alert", summary)
+            self.notifier.notify(new_problems)
+        if storm_state == "recovery":
+            self.notifier.notify_message(
+                f"Mass recovery: {len(recovered_devices)} of {total} devices back to normal at once"
+            )
+        timer.lap("notify")
+
+        self._record_cycle_metrics({
+            "ok": 1,
+            "entity_total": sum(i.entity_total or 0 for i in self._ha_instances()) or None,
+            "monitored": len(wanted),
+            "problems": problems,
+            "checked": total,
+            "excluded": excluded,
+            "skipped": skipped,
+            **category_counts,
+        })
+
+    def _rename_suggestion(self, entity_id, device_type_id, taken):
+        """Existing entity a missing one was probably renamed to, or None.
+
+        Looked up in the trigram index of the instance the entity routes to,
+        restricted to the domain the device type expects (the entity's own
+        domain for generic devices). Entities in `taken` are already monitored
+        by another device and never suggested.
+        """
+        index = self._instance_for(entity_id).rename_index()
+        if index is None:
+            return None
+        return index.suggest(entity_id, DEVICE_TYPE_TO_DOMAIN.get(device_type_id), taken)
+
+    def _storm_limit(self, total):
+        """Transitions within STORM_WINDOW_SECONDS that count as a mass outage (None = disabled)."""
+        try:
+            percent = float(self.pluginPrefs.get("stormThresholdPercent", DEFAULT_STORM_THRESHOLD_PERCENT))
+        except ValueError:
+            percent = DEFAULT_STORM_THRESHOLD_PERCENT
+        if percent <= 0:
+            return None
+        return max(STORM_MIN_DEVICES, percent / 100.0 * total)
+
+    def _check_storm(self, recovered, new_problems, current_problem_ids, total, now_ts):
+        """Decide what to do with this cycle's transitions.
+
+        Returns "normal" (commit and report per device), "recovery" (commit,
+        report new problems per device but the recoveries as one summary),
+        "held" (mass outage in progress - commit nothing, log nothing) or
+        "settled" (outage over - transitions committed here and summarised in
+        one message). Only new problems can open an outage.
+        """
+        new_count = len(self.pending_problems)
+        storm = self.storm
+
+        if storm is None:
+            window = self.recent_transitions
+            while window and window[0][0] < now_ts - STORM_WINDOW_SECONDS:
+                window.popleft()
+            if not new_count and not recovered:
+                return "normal"
+            limit = self._storm_limit(total)
+            if limit is None or new_count + sum(p for _, p, _ in window) < limit:
+                if limit is not None and len(recovered) + sum(r for _, _, r in window) >= limit:
+                    # Typically the end of an outage that settled with devices
+                    # still failing; later recoveries start counting afresh
+                    self.recent_transitions = deque((t, p, 0) for t, p, _ in window)
+                    self.recent_transitions.append((now_ts, new_count, 0))
+                    return "recovery"
+                window.append((now_ts, new_count, len(recovered)))
+                return "normal"
+
+            window.clear()
+            self.storm = {
+                "started": now_ts,
+                "last_ids": frozenset(current_problem_ids),
+                "quiet_since": now_ts,
+                "affected": set(self.pending_problems) | set(recovered),
+            }
+            self.logger.warning(
+                f"MASS OUTAGE: {len(self.pending_problems)} new problem(s) and {len(recovered)} "
+                f"recovery(ies) in one check ({total} devices monitored) - holding per-device "
+                f"alerts until things settle"
+            )
+            examples = "\n".join(f"- {line}" for line in new_problems[:5])
+            more = f"\n...and {len(new_problems) - 5} more" if len(new_problems) > 5 else ""
+            self.notifier.notify_message(
+                f"Mass outage: {len(self.pending_problems)} of {total} devices went into a problem "
+                f"state at once (HA restart or coordinator dropout?)\n{examples}{more}"
+            )
+            return "held"
+
+        storm["affected"].update(self.pending_problems)
+        storm["affected"].update(recovered)
+        ids = frozenset(current_problem_ids)
+        if ids != storm["last_ids"]:
+            storm["last_ids"] = ids
+            storm["quiet_since"] = now_ts
+            return "held"
+        if now_ts - storm["quiet_since"] < STORM_SETTLE_SECONDS:
+            return "held"
+
+        self._end_storm(recovered, new_problems, now_ts)
+        return "settled"
+
+    def _end_storm(self, recovered, new_problems, now_ts):
+        """Commit the net transitions of a settled outage and send one summary."""
+        storm, self.storm = self.storm, None
+        # Devices still failing are counted as down from the start of the outage
+        for entity_id, info in self.pending_problems.items():
+            self.known_problems[entity_id] = info
+            self.problem_journal.set(entity_id, info)
+            self._record_transition(entity_id, info["type"], storm["started"])
+        cleared = []
+        for entity_id in recovered:
+            info = self.known_problems.pop(entity_id)
+            self.problem_journal.delete(entity_id)
+            self._record_transition(entity_id, None, now_ts)
+            cleared.append(f"{entity_id} (was: {info['type']})")
+
+        minutes = max(1, round((now_ts - storm["started"]) / 60))
+        still_failing = len(self.pending_problems)
+        back = len(storm["affected"] - set(self.pending_problems))
+        summary = f"after {minutes}m: {back} device(s) back to normal, {still_failing} still failing"
+        self.logger.info(f"MASS OUTAGE OVER {summary}")
+        if still_failing <= STORM_DETAIL_LINES:
+            for line in new_problems:
+                self.logger.warning(f"NEW PROBLEM: {line}")
+        else:
+            self.logger.warning(f"{still_failing} devices still failing - use Run Check Now for the full list")
+        if len(cleared) <= STORM_DETAIL_LINES:
+            for line in cleared:
+                self.logger.info(f"RECOVERED: {line}")
+
+        details = "".join(f"\n- {line}" for line in new_problems[:STORM_DETAIL_LINES])
+        if still_failing > STORM_DETAIL_LINES:
+            details += f"\n...and {still_failing - STORM_DETAIL_LINES} more"
+        self.notifier.notify_message(f"Mass outage over {summary}{details}")
+
+    def _record_cycle_metrics(self, sample):
+        """Close the cycle's phase timings, add it to the metrics store and publish the metrics snapshot."""
+        cycle_seconds = self.phase_timer.end_cycle()
+        self.last_cycle_seconds = cycle_seconds
+        if sample["ok"]:
+            self.cycle_results["ok"] += 1
+            self.last_good_sample = sample
+            self.last_success_time = time.time()
+        else:
+            self.cycle_results["failed"] += 1
+        self._publish_metrics()
+        if self.metrics is None:
+            return
+        sample["fetch_ms"] = self.cycle_fetch_ms
+        sample["payload_bytes"] = self.cycle_payload_bytes
+        sample["cycle_ms"] = cycle_seconds * 1000
+        try:
+            self.metrics.record(sample)
+        except Exception:
+            self.logger.exception("Failed to record cycle metrics")
+
+    def _configure_metrics_endpoint(self):
+        """Start, restart or stop the OpenMetrics listener to match the metricsPort setting."""
+        try:
+            port = int(self.pluginPrefs.get("metricsPort", "") or 0)
+        except ValueError:
+            port = 0
+        endpoint = self.metrics_endpoint
+        if endpoint is not None:
+            if endpoint.port == port:
+                return
+            endpoint.stop()
+            self.metrics_endpoint = None
+        if not port:
+            return
+        endpoint = MetricsEndpoint(port, self.logger)
+        try:
+            endpoint.start()
+        except OSError as e:
+            self.logger.error(f"Could not start the metrics endpoint on port {port}: {e}")
+            return
+        self.metrics_endpoint = endpoint
+        self._publish_metrics()
+        self.logger.info(f"OpenMetrics endpoint: http://127.0.0.1:{port}/metrics")
+
+    def _publish_metrics(self):
+        """Render the current metrics and hand them to the endpoint (a no-op when it is off).
+
+        Runs at the end of each check cycle, so scrapes are served from this
+        snapshot and never reach HA or the check cycle's state.
+        """
+        endpoint = self.metrics_endpoint
+        if endpoint is None:
+            return
+        good = self.last_good_sample
+        instances = self._ha_instances()
+        out = MetricsWriter()
+        out.gauge("ha_monitor_problems", "Devices with a problem in the last successful cycle, by category",
+                  [({"category": c}, good.get(c))
+                   for c in ("missing", "unavailable", "domain_mismatch", "stale", "stuck")])
+        out.gauge("ha_monitor_known_problems", "Problems alerted on and awaiting recovery",
+                  [({}, len(self.known_problems))])
+        out.gauge("ha_monitor_devices", "HA Agent devices in the last successful cycle, by outcome",
+                  [({"state": s}, good.get(s)) for s in ("checked", "excluded", "skipped")])
+        out.gauge("ha_monitor_monitored_entities", "Entity IDs requested from HA in the last successful cycle",
+                  [({}, good.get("monitored"))])
+        out.gauge("ha_monitor_ha_entities", "Entities reported by each HA instance",
+                  [({"instance": i.name}, i.entity_total) for i in instances])
+        out.gauge("ha_monitor_ha_up", "1 if the HA instance answered its last fetch",
+                  [({"instance": i.name}, i.failures == 0) for i in instances])
+        out.gauge("ha_monitor_outage", "1 while a mass outage is in progress", [({}, self.storm is not None)])
+        out.gauge("ha_monitor_cycle_duration_seconds", "Duration of the last check cycle",
+                  [({}, self.last_cycle_seconds)])
+        out.gauge("ha_monitor_check_interval_seconds", "Current continuous-mode check interval",
+                  [({}, self.poll_interval)])
+        out.gauge("ha_monitor_last_success_timestamp_seconds", "Time of the last cycle that fetched HA entities",
+                  [({}, self.last_success_time)])
+        out.counter("ha_monitor_cycles", "Check cycles since startup, by result",
+                    [({"result": r}, n) for r, n in self.cycle_results.items()])
+        failures = {i.name: 0 for i in instances}
+        failures.update(self.fetch_failures)
+        out.counter("ha_monitor_fetch_failures", "Failed HA fetches since startup, by instance",
+                    [({"instance": name}, n) for name, n in sorted(failures.items())])
+        notifications = []
+        for channel, (sent, failed) in sorted(self.notifier.counts().items()):
+            notifications.append(({"channel": channel, "result": "sent"}, sent))
+            notifications.append(({"channel": channel, "result": "failed"}, failed))
+        out.counter("ha_monitor_notifications", "Notifications since startup, by channel and result", notifications)
+        out.histogram("ha_monitor_api_response_seconds", "HA REST fetch time per cycle (the report's API response)",
+                      [({"instance": name}, hist) for name, hist in sorted(self.response_histograms.items())])
+        endpoint.publish(out.text(), self.last_success_time)
+
+    def _open_history(self):
+        """Open the availability history; known problems from a previous session count as down from now."""
+        try:
+            self.history = AvailabilityHistory(self._get_state_file_path(HISTORY_FILE_NAME))
+            now_ts = time.time()
+            for entity_id, info in self.known_problems.items():
+                self._record_transition(entity_id, info["type"], now_ts)
+            self.history.flush()
+        except Exception:
+            self.logger.exception("Failed to open availability history - availability report disabled")
+            self.history = None
+
+    def _record_transition(self, entity_id, problem_type, ts):
+        """Queue a problem (or, with problem_type None, a recovery) for the availability history."""
+        if self.history is not None and not entity_id.startswith("device:"):
+            if problem_type is None:
+                self.history.recovered(entity_id, ts)
+            else:
+                self.history.problem(entity_id, problem_type, ts)
+
+    def _open_metrics_store(self):
+        path = self._get_state_file_path(METRICS_FILE_NAME)
+        try:
+            self.metrics = MetricsStore(path)
+        except Exception:
+            self.logger.exception(f"Failed to open metrics store {path} - performance trends disabled")
+            self.metrics = None
+
+    def _update_freshness(self, entities, wanted, thresholds, now_ts):
+        """Feed current last_updated values to the freshness engine and expire deadlines.
+
+        `thresholds` maps each monitored entity to its resolved stale
+        threshold in seconds (0 = not checked). Timestamps are only parsed
+        when an entity's last_updated changes, so on a quiet system this is
+        one dict lookup per monitored entity.
+        """
+        freshness = self.freshness
+        for entity_id in wanted:
+            threshold = thresholds[entity_id]
+            if not threshold:
+                freshness.remove(entity_id)
+                continue
+            ha_entity = entities.get(entity_id)
+            if ha_entity is None:
+                continue
+            last_updated = ha_entity.get("last_updated", "")
+            if last_updated and not freshness.update(entity_id, last_updated, now_ts, threshold):
+                self.logger.debug(f"Could not parse last_updated for {entity_id}: {last_updated}")
+        if len(freshness) > len(wanted):
+            freshness.retain(wanted)
+        freshness.pop_expired(now_ts)
+
+    def _stuck_window_minutes(self):
+        """The stuckWindow setting in minutes (0 = stuck-value check off)."""
+        try:
+            return max(0, int(self.pluginPrefs.get("stuckWindow", 0) or 0))
+        except ValueError:
+            return 0
+
+    def _update_stuck_values(self, entities, wanted, now_ts):
+        """Feed new readings of monitored sensor/climate entities to the stuck-value rings.
+
+        Climate entities are sampled on current_temperature ("value"), sensors
+        on their state. A reading is only parsed when last_updated changed, so
+        this is O(1) per entity per cycle.
+        """
+        tracker = self.stuck_values
+        for entity_id in wanted:
+            if not entity_id.startswith(STUCK_DOMAINS):
+                continue
+            ha_entity = entities.get(entity_id)
+            if ha_entity is None:
+                continue
+            value = ha_entity["value"] if "value" in ha_entity else ha_entity.get("state")
+            tracker.update(entity_id, value, ha_entity.get("last_updated", ""), now_ts)
+        if len(tracker) > len(wanted):
+            tracker.retain(wanted)
+
+    def _compile_stale_thresholds(self):
+        """Build the stale threshold resolver; called at startup and when config is saved."""
+        try:
+            default = int(self.pluginPrefs.get("staleThreshold", 2880))
+        except ValueError:
+            default = 2880
+        try:
+            self.stale_thresholds = StaleThresholds(default, self.pluginPrefs.get("staleOverrides", ""))
+        except ValueError as e:
+            self.logger.error(f"Ignoring stale threshold overrides - {e}")
+            self.stale_thresholds = StaleThresholds(default)
+
+    def _stale_override_lines(self):
+        """Report lines listing each stale threshold override."""
+        policy = self.stale_thresholds
+        lines = []
+        for prefix, table in (("domain:", policy.domains), ("type:", policy.types), ("", policy.entities)):
+            for key, seconds in sorted(table.items()):
+                limit = self._format_age(seconds / 60) if seconds else "disabled"
+                lines.append(f"    {prefix}{key}: {limit}")
+        return lines
+
+    def _exclude_rule_lines(self):
+        """Report lines with the number of devices each exclude rule matched in the last cycle."""
+        rules = self.exclude_rules
+        counts = self.exclude_counts
+        lines = []
+        for rule in rules.patterns:
+            count = counts.get(rule, 0)
+            lines.append(f"    {rule}: {count} device(s)" if count else f"    {rule}: unused")
+        if rules.exact:
+            unused = sorted(e for e in rules.exact if e not in counts)
+            lines.append(f"    Listed entity IDs: {len(rules.exact) - len(unused)} of {len(rules.exact)} in use")
+            for entity_id in unused[:10]:
+                lines.append(f"      unused: {entity_id}")
+            if len(unused) > 10:
+                lines.append(f"      ...and {len(unused) - 10} more")
+        return lines
 
     @staticmethod
     def _format_age(minutes):
@@ -794,7 +2270,8 @@ class Plugin(indigo.PluginBase):
         else:
             return f"{minutes / 1440:.1f}d"
 
-    def _log_report(self, total, problems, missing, unavailable, domain_mismatch, stale, recovered, stale_threshold, excluded=0):
+    def _log_report(self, total, problems, missing, unavailable, domain_mismatch, stale, stuck, recovered,
+                    stale_threshold, excluded=0, skipped=0):
         """Output a formatted report to the Indigo log using Unicode box-drawing characters."""
         ok_count = total - problems
         timestamp = self._format_timestamp()
@@ -838,13 +2315,39 @@ class Plugin(indigo.PluginBase):
         lines.append(f"{VD}{timestamp:^{W + 2}}{VD}")
         lines.append(f"{LS}{HD * (W + 2)}{RS}")
 
-        # Connection health
-        if self.ha_base_url:
-            conn_info = f"HA: {self.ha_base_url}"
-            if self.last_api_response_ms is not None:
-                conn_info += f"  (API response: {self.last_api_response_ms}ms)"
+        # Connection health, one entry per HA instance
+        for instance in self._ha_instances():
+            if not instance.base_url:
+                continue
+            realtime = (instance is self.primary_instance and self.event_stream is not None
+                        and self.event_stream.synced.is_set())
+            conn_info = f"HA: {instance.base_url}"
+            if self.extra_instances:
+                conn_info = f"HA [{instance.name}, {instance.monitored} device(s)]: {instance.base_url}"
+            if instance.last_error is not None:
+                conn_info += f"  (UNREACHABLE: {instance.last_error})"
+            elif realtime:
+                conn_info += "  (WebSocket realtime"
+                if instance.last_response_ms is not None:
+                    conn_info += f", last sync: {instance.last_response_ms}ms"
+                conn_info += ")"
+            elif instance.last_response_ms is not None:
+                conn_info += f"  (API response: {instance.last_response_ms}ms"
+                if instance.last_fetch_strategy == "targeted":
+                    conn_info += ", targeted per-entity fetch"
+                elif instance.last_fetch_strategy == "template":
+                    conn_info += ", template projection"
+                conn_info += ")"
             lines.append(pad_row(conn_info))
 
+            timing = instance.last_timing
+            if timing and not realtime and instance.last_error is None:
+                reuse_note = " (keep-alive reused)" if timing["reused"] else ""
+                lines.append(pad_row(
+                    f"    connect {timing['connect_ms']}ms{reuse_note}, "
+                    f"TTFB {timing['ttfb_ms']}ms, transfer {timing['transfer_ms']}ms"
+                ))
+
         # Summary
         if problems == 0:
             status = f"[OK] ALL OK: {ok_count}/{total} devices healthy"
@@ -853,8 +2356,16 @@ class Plugin(indigo.PluginBase):
         lines.append(pad_row(status))
         stale_display = f"{stale_threshold}m ({stale_threshold // 60}h)" if stale_threshold > 0 else "disabled"
         lines.append(pad_row(f"Stale threshold: {stale_display}"))
-        if excluded > 0:
+        lines.extend(pad_row(line) for line in self._stale_override_lines())
+        stuck_window = self._stuck_window_minutes()
+        if stuck_window:
+            lines.append(pad_row(f"Stuck value window: {self._format_age(stuck_window)} "
+                                 f"({len(self.stuck_values)} sensor/climate entities sampled)"))
+        if excluded > 0 or len(self.exclude_rules) > 0:
             lines.append(pad_row(f"Excluded: {excluded} entity/entities skipped"))
+            lines.extend(pad_row(line) for line in self._exclude_rule_lines())
+        if skipped > 0:
+            lines.append(pad_row(f"Not checked: {skipped} device(s) on unreachable HA instance(s)"))
 
         if problems == 0 and not recovered:
             lines.append(pad_row(""))
@@ -863,35 +2374,62 @@ class Plugin(indigo.PluginBase):
             self.logger.info("\n".join(lines))
             return
 
-        # Missing entities
-        if missing:
-            lines.append(section_hdr(f"[X] MISSING ENTITIES ({len(missing)})"))
-            for item in sorted(missing, key=lambda x: x["name"]):
-                lines.append(data_row(item["name"], item["entity"]))
-
-        # Unavailable
-        if unavailable:
-            lines.append(section_hdr(f"[!] UNAVAILABLE ({len(unavailable)})"))
-            for item in sorted(unavailable, key=lambda x: x["name"]):
-                lines.append(data_row(item["name"], item["detail"]))
-
-        # Domain mismatch
-        if domain_mismatch:
-            lines.append(section_hdr(f"[?] DOMAIN MISMATCH ({len(domain_mismatch)})"))
-            for item in sorted(domain_mismatch, key=lambda x: x["name"]):
-                lines.append(data_row(item["name"], item["detail"]))
-
-        # Stale
-        if stale:
-            lines.append(section_hdr(f"[~] STALE ({len(stale)})"))
-            for item in sorted(stale, key=lambda x: x["name"]):
-                lines.append(data_row(item["name"], f"Last: {item['detail']}"))
-
-        # Recovered
-        if recovered:
-            lines.append(section_hdr(f"[+] RECOVERED ({len(recovered)})"))
-            for item in sorted(recovered, key=lambda x: x["entity"]):
-                lines.append(data_row(item["entity"], f"was: {item['type']}"))
+        # Detail sections. Rows arrive in device-name order from the check
+        # loop; with an export format they stream to the report file and the
+        # log only shows the first REPORT_LOG_ROWS of each section.
+        sections = [
+            ("missing", "[X] MISSING ENTITIES", "Missing entities", missing),
+            ("unavailable", "[!] UNAVAILABLE", "Unavailable", unavailable),
+            ("domain_mismatch", "[?] DOMAIN MISMATCH", "Domain mismatch", domain_mismatch),
+            ("stale", "[~] STALE", "Stale", stale),
+            ("stuck", "[=] STUCK VALUES", "Stuck values", stuck),
+            ("recovered", "[+] RECOVERED", "Recovered", sorted(recovered, key=lambda x: x["entity"])),
+        ]
+        export = self._open_report_export({
+            "Devices checked": total, "OK": ok_count, "Problems": problems,
+            "Recovered": len(recovered), "Excluded": excluded, "Not checked": skipped,
+        })
+
+        def row_fields(category, item):
+            """(device name, file detail, log columns) of one report row."""
+            if category == "recovered":
+                return (self._device_name_for_entity(item["entity"]) or "", item["type"],
+                        (item["entity"], f"was: {item['type']}"))
+            detail = item["detail"]
+            return (item["name"], detail, (item["name"], item["entity"] if category == "missing"
+                                           else f"Last: {detail}" if category == "stale" else detail))
+
+        # The file is written first, so if it fails part-way the log still
+        # gets every row rather than a summary pointing at a missing file
+        if export is not None:
+            try:
+                for category, _, file_title, items in sections:
+                    if items:
+                        export.section(category, file_title, len(items))
+                        for item in items:
+                            name, detail, _ = row_fields(category, item)
+                            export.row(category, name, item["entity"], detail)
+                export.close()
+            except OSError as e:
+                export.abort()
+                export = None
+                self.logger.warning(f"Could not write report file - showing the full report in the log: {e}")
+
+        limit = REPORT_LOG_ROWS if export is not None else None
+        for category, title, _, items in sections:
+            if not items:
+                continue
+            lines.append(section_hdr(f"{title} ({len(items)})"))
+            for item in items[:limit]:
+                lines.append(data_row(*row_fields(category, item)[2]))
+                if item.get("suggestion"):
+                    lines.append(data_row("", f"renamed to {item['suggestion']}?"))
+            if limit is not None and len(items) > limit:
+                lines.append(pad_row(f"... and {len(items) - limit} more in the report file"))
+        if export is not None:
+            lines.append(f"{LS}{HD * (W + 2)}{RS}")
+            lines.append(pad_row(f"Full report ({export.rows} rows): {os.path.basename(export.path)}"))
+            lines.append(pad_row(f"  in {os.path.dirname(export.path)}"))
 
         # Footer
         lines.append(f"{BL}{HD * (W + 2)}{BR}")
@@ -902,68 +2440,92 @@ class Plugin(indigo.PluginBase):
         else:
             self.logger.info(report)
 
+    def _open_report_export(self, summary):
+        """Start a report file in the configured format, or return None (log only / error)."""
+        fmt = self.pluginPrefs.get("reportExportFormat", "html")
+        if fmt not in REPORT_FORMATS:
+            return None
+        try:
+            return ReportExporter(self._get_log_folder(), fmt, summary)
+        except OSError as e:
+            self.logger.error(f"Could not create report file - showing the full report in the log: {e}")
+            return None
+
     # -------------------------------------------------------------------------
     # Problem Tracking & Alerting
     # -------------------------------------------------------------------------
 
     def _record_problem(self, entity_id, problem_type):
-        """Record a problem. Returns True if this is a NEW problem, False if already known."""
-        if entity_id in self.known_problems:
+        """Record a problem. Returns True if this is a NEW problem, False if already known.
+
+        New problems are staged in pending_problems and committed to
+        known_problems at the end of the cycle (unless a mass outage holds them).
+        """
+        if entity_id in self.known_problems or entity_id in self.pending_problems:
             return False
 
-        self.known_problems[entity_id] = {
+        self.pending_problems[entity_id] = {
             "type": problem_type,
             "since": self._format_timestamp(),
         }
         return True
 
-    def _send_pushover(self, title, message):
+    def _configure_notifier(self):
+        """Start a notifier channel per enabled notification method (only when settings changed)."""
+        channels = {}
+        if self.pluginPrefs.get("enablePushover", False):
+            channels["Pushover"] = ("HA Device Monitor", self._send_pushover)
+        if self.pluginPrefs.get("enableEmail", False):
+            channels["Email+"] = ("HA Device Monitor Alert", self._send_email)
         try:
-            pushover = indigo.server.getPlugin("io.thechad.indigoplugin.pushover")
-            if pushover and pushover.isEnabled():
-                pushover.executeAction("send", props={
-                    "msgTitle": title,
-                    "msgBody": message,
-                    "msgPriority": 0,
-                    "msgSound": "pushover"
-                })
-                self.logger.debug(f"Pushover sent: {message}")
-            else:
-                self.logger.debug("Pushover plugin not available")
-        except Exception:
-            self.logger.exception("Failed to send Pushover notification")
+            digest = float(self.pluginPrefs.get("notifyDigestSeconds", 0) or 0)
+        except ValueError:
+            digest = 0.0
+
+        config = (tuple(channels), digest)
+        if config != self.notifier_config:
+            self.notifier.configure(channels, digest)
+            self.notifier_config = config
+
+    # The senders below run on notifier threads; exceptions propagate so the
+    # notifier can retry. A missing plugin or setting is not retried.
+
+    def _send_pushover(self, title, message):
+        pushover = indigo.server.getPlugin("io.thechad.indigoplugin.pushover")
+        if pushover and pushover.isEnabled():
+            pushover.executeAction("send", props={
+                "msgTitle": title,
+                "msgBody": message,
+                "msgPriority": 0,
+                "msgSound": "pushover"
+            })
+            self.logger.debug(f"Pushover sent: {message}")
+        else:
+            self.logger.debug("Pushover plugin not available")
 
     def _send_email(self, subject, message):
         """Send an email notification via the Email+ plugin."""
-        try:
-            email_plugin = indigo.server.getPlugin(EMAIL_PLUGIN_ID)
-            if not email_plugin or not email_plugin.isEnabled():
-                self.logger.debug("Email+ plugin not available")
-                return
-
-            email_to = self.pluginPrefs.get("emailTo", "").strip()
-            if not email_to:
-                self.logger.warning("Email notifications enabled but no recipient address configured")
-                return
+        email_plugin = indigo.server.getPlugin(EMAIL_PLUGIN_ID)
+        if not email_plugin or not email_plugin.isEnabled():
+            self.logger.debug("Email+ plugin not available")
+            return
 
-            # Find the first SMTP device in the Email+ plugin
-            smtp_device_id = None
-            for dev in indigo.devices:
-                if dev.pluginId == EMAIL_PLUGIN_ID and dev.deviceTypeId == "smtpAccount":
-                    smtp_device_id = dev.id
-                    break
+        email_to = self.pluginPrefs.get("emailTo", "").strip()
+        if not email_to:
+            self.logger.warning("Email notifications enabled but no recipient address configured")
+            return
 
-            if smtp_device_id is None:
-                self.logger.warning("Email notifications enabled but no SMTP account found in Email+ plugin")
-                return
+        # First SMTP device in the Email+ plugin (cached by the device index)
+        smtp_device_id = min(self.smtp_device_ids) if self.smtp_device_ids else None
 
-            email_plugin.executeAction("sendEmail", deviceId=smtp_device_id, props={
-                "emailTo": email_to,
-                "emailSubject": subject,
-                "emailMessage": message,
-                "emailFormat": "plain"
-            })
-            self.logger.debug(f"Email sent to {email_to}: {subject}")
+        if smtp_device_id is None:
+            self.logger.warning("Email notifications enabled but no SMTP account found in Email+ plugin")
+            return
 
-        except Exception:
-            self.logger.exception("Failed to send email notification")
+        email_plugin.executeAction("sendEmail", deviceId=smtp_device_id, props={
+            "emailTo": email_to,
+            "emailSubject": subject,
+            "emailMessage": message,
+            "emailFormat": "plain"
+        })
+        self.logger.debug(f"Email sent to {email_to}: {subject}")
@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - known problems persistence
+# Snapshot + append-only journal: each problem/recovery transition is one
+# JSON line appended to the journal (fsynced once per batch), and the
+# snapshot is periodically rewritten with an atomic rename.
+####################
+
+import json
+import os
+
+
+class ProblemJournal:
+    """Crash-safe persistence for the known_problems dict.
+
+    The snapshot file keeps the plain {entity_id: info} JSON format used by
+    earlier versions, so existing state files load unchanged. Transitions
+    since the last snapshot live in `<snapshot>.journal`, one line each:
+        {"op": "set", "id": entity_id, "v": info}
+        {"op": "del", "id": entity_id}
+    Replaying the journal over the snapshot is idempotent, so a crash at any
+    point (including mid-compaction) loses at most the unflushed batch.
+    """
+
+    def __init__(self, snapshot_path, compact_min_records=1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = os.path.splitext(snapshot_path)[0] + ".journal"
+        self.compact_min_records = compact_min_records
+        self.journal_records = 0    # records in the journal file (incl. pending)
+        self._pending = []
+        self._fh = None
+
+    # --- loading -------------------------------------------------------------
+
+    def load(self):
+        """Return (state, replayed_record_count) from snapshot plus journal."""
+        state = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                state = json.load(f)
+
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue    # torn line from a crash mid-append
+                    if record.get("op") == "set":
+                        state[record["id"]] = record["v"]
+                    elif record.get("op") == "del":
+                        state.pop(record["id"], None)
+                    replayed += 1
+        self.journal_records = replayed
+        return state, replayed
+
+    # --- appending -----------------------------------------------------------
+
+    def set(self, entity_id, info):
+        self._pending.append(json.dumps({"op": "set", "id": entity_id, "v": info}, separators=(",", ":")))
+
+    def delete(self, entity_id):
+        self._pending.append(json.dumps({"op": "del", "id": entity_id}, separators=(",", ":")))
+
+    def flush(self):
+        """Append pending records with a single write and fsync. Returns records written."""
+        if not self._pending:
+            return 0
+        if self._fh is None:
+            self._fh = open(self.journal_path, "a+")
+            # Terminate a torn final line so it can't swallow the next record
+            if self._fh.tell() > 0:
+                self._fh.seek(self._fh.tell() - 1)
+                if self._fh.read(1) != "\n":
+                    self._fh.write("\n")
+        count = len(self._pending)
+        self._fh.write("\n".join(self._pending) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._pending = []
+        self.journal_records += count
+        return count
+
+    # --- compaction ----------------------------------------------------------
+
+    def needs_compaction(self, state_size):
+        return self.journal_records > max(self.compact_min_records, 2 * state_size)
+
+    def compact(self, state):
+        """Write `state` as the new snapshot (atomic rename) and empty the journal."""
+        self._pending = []
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._fsync_dir()
+
+        # Journal records are now all reflected in the snapshot
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        with open(self.journal_path, "w"):
+            pass
+        self.journal_records = 0
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(os.path.dirname(self.snapshot_path) or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
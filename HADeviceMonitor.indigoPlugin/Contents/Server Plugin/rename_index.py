@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - rename suggestions
+# Trigram index over HA entity IDs, used to suggest what a missing entity
+# was probably renamed to (a "_2" suffix, a changed integration prefix).
+# Lookups only touch entities that share a trigram with the missing ID, so
+# hundreds of missing devices against 10k+ entities need no pairwise
+# string comparison.
+####################
+
+import heapq
+
+
+MIN_SCORE = 0.5     # Dice similarity below which no suggestion is made
+MAX_CANDIDATES = 5  # kept per missing entity, so devices already using the best match can be skipped
+
+
+def trigrams(text):
+    """Set of character trigrams of text, padded so short IDs and the ends count."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class RenameIndex:
+    """Trigram index of entity IDs, partitioned by domain.
+
+    Usage:
+        index = RenameIndex(entity_ids)
+        index.suggest("light.kitchen", "light")     # -> "light.kitchen_2" or None
+
+    Only the object ID (the part after the domain) is indexed, since a rename
+    keeps the domain. Results are cached per (entity_id, domain); build a new
+    index when the entity set changes.
+    """
+
+    def __init__(self, entity_ids):
+        self._domains = {}      # domain -> (names, sizes, {trigram: [name index, ...]})
+        self._cache = {}
+        self.size = 0
+        for entity_id in entity_ids:
+            domain, _, object_id = entity_id.partition(".")
+            if not object_id:
+                continue
+            names, sizes, postings = self._domains.setdefault(domain, ([], [], {}))
+            grams = trigrams(object_id)
+            n = len(names)
+            names.append(entity_id)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(n)
+            self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def suggest(self, entity_id, domain=None, taken=()):
+        """Most similar existing entity ID in `domain` (default: entity_id's own), or None.
+
+        Entities in `taken` (already used by another device) are never suggested.
+        """
+        key = (entity_id, domain)
+        candidates = self._cache.get(key)
+        if candidates is None:
+            candidates = self._cache[key] = self._candidates(entity_id, domain)
+        for name in candidates:
+            if name not in taken:
+                return name
+        return None
+
+    def _candidates(self, entity_id, domain):
+        """Up to MAX_CANDIDATES similar entity IDs, best first."""
+        own_domain, _, object_id = entity_id.partition(".")
+        partition = self._domains.get(domain or own_domain)
+        if partition is None or not object_id:
+            return []
+        names, sizes, postings = partition
+        grams = trigrams(object_id)
+        shared = {}
+        for gram in grams:
+            for n in postings.get(gram, ()):
+                shared[n] = shared.get(n, 0) + 1
+        ranked = []
+        for n, common in shared.items():
+            score = 2.0 * common / (len(grams) + sizes[n])
+            name = names[n]
+            if score < MIN_SCORE or name == entity_id:
+                continue
+            # A name that contains the old one (or vice versa) is the typical
+            # rename ("_2" suffix, dropped prefix); then highest score, closest
+            # length, alphabetical
+            other = name.partition(".")[2]
+            contained = object_id in other or other in object_id
+            ranked.append((not contained, -score, abs(len(other) - len(object_id)), name))
+        return [rank[-1] for rank in heapq.nsmallest(MAX_CANDIDATES, ranked)]
@@ -0,0 +1,152 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - report export
+# Streams the full manual-check report to a JSON, CSV or HTML file one row
+# at a time, so the Indigo log only needs a short summary. The newest
+# KEEP_REPORTS files are kept.
+####################
+
+import csv
+import html
+import json
+import os
+import time
+
+
+REPORT_FORMATS = ("json", "csv", "html")
+KEEP_REPORTS = 10
+FILE_PREFIX = "report_"
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>HA Device Monitor report {generated}</title>
+<style>
+body {{ font-family: -apple-system, Helvetica, sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; }}
+th, td {{ border: 1px solid #ccc; padding: 0.3em 0.8em; text-align: left; }}
+th {{ background: #eee; }}
+</style></head><body>
+<h1>HA Device Monitor report</h1>
+<p>{generated}</p>
+<ul>{summary}</ul>
+"""
+
+
+class ReportExporter:
+    """Writes one report file incrementally.
+
+    Usage:
+        export = ReportExporter(folder, "csv", summary)
+        export.section("missing", "Missing entities", 12)
+        export.row("missing", "Kitchen Light", "light.kitchen", "Not found in HA")
+        export.close()      # or export.abort() on error
+        export.path         # final file name
+
+    Rows go to a temporary file that `close()` renames into place, so a
+    half-written report never appears under the final name.
+    """
+
+    def __init__(self, folder, fmt, summary):
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format '{fmt}'")
+        self.folder = folder
+        self.fmt = fmt
+        self.summary = summary      # {label: value}, written at the top of the file
+        self.rows = 0
+        self._csv = None
+        self._in_table = False
+        self._file = self._open_unique(time.strftime("%Y%m%d_%H%M%S"))
+        generated = time.strftime("%Y-%m-%d %H:%M:%S")
+        if self.fmt == "json":
+            self._file.write('{"generated": %s,\n"summary": %s,\n"rows": [' % (
+                json.dumps(generated), json.dumps(self.summary)))
+        elif self.fmt == "csv":
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(["category", "name", "entity", "detail"])
+        else:
+            self._file.write(_HTML_HEAD.format(
+                generated=html.escape(generated),
+                summary="".join(f"<li>{html.escape(str(k))}: {html.escape(str(v))}</li>"
+                                for k, v in self.summary.items()),
+            ))
+
+    def _open_unique(self, stamp):
+        """Open the temporary file under a name no other report uses.
+
+        Reports started in the same second get a counter suffix
+        (report_20240101_120000_2.csv); the temporary file is created
+        exclusively, so two exporters can't both claim a name.
+        """
+        n = 1
+        while True:
+            suffix = f"_{n}" if n > 1 else ""
+            self.path = os.path.join(self.folder, f"{FILE_PREFIX}{stamp}{suffix}.{self.fmt}")
+            self._tmp_path = self.path + ".tmp"
+            if not os.path.exists(self.path):
+                try:
+                    return open(self._tmp_path, "x", encoding="utf-8", newline="")
+                except FileExistsError:
+                    pass
+            n += 1
+
+    def section(self, category, title, count):
+        if self.fmt == "html":
+            self._end_table()
+            self._file.write(f"<h2>{html.escape(title)} ({count})</h2>\n"
+                             "<table><tr><th>Device</th><th>Entity</th><th>Detail</th></tr>\n")
+            self._in_table = True
+
+    def row(self, category, name, entity, detail):
+        if self.fmt == "json":
+            record = {"category": category, "name": name, "entity": entity, "detail": detail}
+            self._file.write(("\n" if not self.rows else ",\n") + json.dumps(record))
+        elif self.fmt == "csv":
+            self._csv.writerow([category, name, entity, detail])
+        else:
+            self._file.write(f"<tr><td>{html.escape(name)}</td><td>{html.escape(entity)}</td>"
+                             f"<td>{html.escape(detail)}</td></tr>\n")
+        self.rows += 1
+
+    def _end_table(self):
+        if self._in_table:
+            self._file.write("</table>\n")
+            self._in_table = False
+
+    def close(self):
+        """Finish the file, move it into place and prune old reports."""
+        try:
+            if self.fmt == "json":
+                self._file.write("\n]}\n")
+            elif self.fmt == "html":
+                self._end_table()
+                self._file.write("</body></html>\n")
+        except Exception:
+            self.abort()
+            raise
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        prune_reports(self.folder)
+
+    def abort(self):
+        """Discard a partly written report."""
+        try:
+            self._file.close()
+        except OSError:
+            pass    # the flush on close fails too when the disk is full
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+def prune_reports(folder, keep=KEEP_REPORTS):
+    """Delete all but the newest `keep` report files in folder."""
+    reports = sorted(
+        name for name in os.listdir(folder)
+        if name.startswith(FILE_PREFIX) and name.rsplit(".", 1)[-1] in REPORT_FORMATS
+    )
+    for name in reports[:-keep] if keep else reports:
+        try:
+            os.remove(os.path.join(folder, name))
+        except OSError:
+            pass
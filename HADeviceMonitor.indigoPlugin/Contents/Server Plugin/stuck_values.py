@@ -0,0 +1,134 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - stuck value detection
+# Keeps a small ring of recent numeric samples per sensor/climate entity in
+# flat arrays (no per-entity Python objects), and flags entities whose
+# samples have all been identical for longer than a configured window even
+# though HA keeps refreshing last_updated. Each update is O(1).
+####################
+
+from array import array
+
+
+RING_SIZE = 8       # samples kept per entity; all must be equal to count as stuck
+STUCK_DOMAINS = ("sensor.", "climate.")
+
+
+class StuckValueTracker:
+    """Per-entity sample rings packed into typed arrays.
+
+    Each tracked entity owns slot `s`: samples s*RING_SIZE .. (s+1)*RING_SIZE-1
+    of one array('d'), plus one element of each per-entity array. Alongside the
+    ring the tracker keeps the number of unequal neighbouring samples in it,
+    adjusted as a sample is written and the oldest one drops out, so "zero
+    variance" is a comparison with 0 rather than a scan of the ring.
+
+    A sample is only taken when HA's last_updated changes, so a sensor that
+    simply stops reporting is left to the freshness check.
+    """
+
+    def __init__(self, ring_size=RING_SIZE):
+        self.ring_size = ring_size
+        self._empty_ring = array("d", [0.0] * ring_size)
+        self.clear()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def clear(self):
+        self._slots = {}                # entity_id -> slot
+        self._free = []                 # slots released by remove()/retain()
+        self._samples = array("d")      # ring_size values per slot
+        self._stamp = array("q")        # hash of the last_updated of the newest sample
+        self._changed = array("d")      # when a sample last differed from its predecessor
+        self._count = array("B")        # samples in the ring (<= ring_size)
+        self._head = array("B")         # ring position of the next write
+        self._diffs = array("B")        # unequal neighbouring samples within the ring
+
+    def _slot(self, entity_id):
+        slot = self._slots.get(entity_id)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+            self._count[slot] = self._head[slot] = self._diffs[slot] = 0
+        else:
+            slot = len(self._count)
+            self._samples.extend(self._empty_ring)
+            self._stamp.append(0)
+            self._changed.append(0.0)
+            self._count.append(0)
+            self._head.append(0)
+            self._diffs.append(0)
+        self._slots[entity_id] = slot
+        return slot
+
+    def update(self, entity_id, value, last_updated, now):
+        """Add a sample if last_updated changed since the entity's previous one.
+
+        `value` is the entity's reading as HA reports it; it is only converted
+        to a float for a new sample, and non-numeric values are ignored.
+        """
+        stamp = hash(last_updated)
+        slot = self._slots.get(entity_id)
+        if slot is not None and self._count[slot] and self._stamp[slot] == stamp:
+            return
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        if value != value:      # NaN
+            return
+        if slot is None:
+            slot = self._slot(entity_id)
+        count = self._count[slot]
+        self._stamp[slot] = stamp
+        size = self.ring_size
+        base = slot * size
+        head = self._head[slot]
+        samples = self._samples
+        diffs = self._diffs[slot]
+        if count == size:
+            # The oldest sample (at head) drops out along with its pair
+            if samples[base + head] != samples[base + (head + 1) % size]:
+                diffs -= 1
+        else:
+            count += 1
+        if count == 1 or samples[base + (head - 1) % size] != value:
+            self._changed[slot] = now
+            if count > 1:
+                diffs += 1
+        samples[base + head] = value
+        self._head[slot] = (head + 1) % size
+        self._count[slot] = count
+        self._diffs[slot] = diffs
+
+    def stuck_seconds(self, entity_id, now):
+        """Seconds the entity's full ring has held one value, or None if it isn't stuck."""
+        slot = self._slots.get(entity_id)
+        if slot is None or self._count[slot] < self.ring_size or self._diffs[slot]:
+            return None
+        return now - self._changed[slot]
+
+    def value(self, entity_id):
+        """The entity's newest sample (None if it has none)."""
+        slot = self._slots.get(entity_id)
+        if slot is None or not self._count[slot]:
+            return None
+        return self._samples[slot * self.ring_size + (self._head[slot] - 1) % self.ring_size]
+
+    def remove(self, entity_id):
+        slot = self._slots.pop(entity_id, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def retain(self, entity_ids):
+        """Drop every tracked entity not in entity_ids."""
+        for entity_id in [e for e in self._slots if e not in entity_ids]:
+            self.remove(entity_id)
+
+    def memory_bytes(self):
+        """Bytes held by the sample and per-entity arrays."""
+        arrays = (self._samples, self._stamp, self._changed, self._count, self._head, self._diffs)
+        return sum(a.itemsize * len(a) for a in arrays)
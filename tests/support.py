@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - shared test setup
+# Puts the plugin, tools/fake_indigo and tools/ on sys.path and builds a
+# Plugin (optionally against an in-process fake HA server), the same way
+# tools/bench_check_cycle.py drives the real plugin.py outside Indigo.
+####################
+
+import logging
+import os
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PLUGIN_DIR = os.path.join(ROOT, "HADeviceMonitor.indigoPlugin", "Contents", "Server Plugin")
+TOOLS_DIR = os.path.join(ROOT, "tools")
+for path in (os.path.join(TOOLS_DIR, "fake_indigo"), TOOLS_DIR, PLUGIN_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import indigo  # noqa: E402
+
+HA_AGENT_PLUGIN_ID = "no.homeassistant.plugin"
+TOKEN = "test"
+
+
+def temp_dir(test):
+    """A temporary directory, removed when `test` (a TestCase) finishes."""
+    tmp = tempfile.TemporaryDirectory(prefix="ha_monitor_test_")
+    test.addCleanup(tmp.cleanup)
+    return tmp.name
+
+
+def start_fake_ha(entity_count, template=True):
+    """Serve a FakeHA on a free localhost port; returns (server, fake_ha). Call server.shutdown() after.
+
+    server.requests records (method, path) of each request.
+    """
+    from fake_ha_server import FakeHA, Handler
+
+    class TestHandler(Handler):
+        def do_GET(self):
+            self.server.requests.append(("GET", self.path))
+            super().do_GET()
+
+        def do_POST(self):
+            self.server.requests.append(("POST", self.path))
+            super().do_POST()
+
+    TestHandler.ha = FakeHA(entity_count, TOKEN)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TestHandler)
+    server.requests = []    # (method, path) of every request, in order
+    server.daemon_threads = True
+    server.no_template = not template
+    server.latency = 0
+    server.failure_rate = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, TestHandler.ha
+
+
+def make_plugin(prefs=None, port=None, devices=()):
+    """A fresh Plugin over a reset fake Indigo.
+
+    `devices` are (name, deviceTypeId, entity_id); with `port` the HA Agent
+    config points at a fake HA server there.
+    """
+    indigo.reset()
+    if port is not None:
+        prefs_path = os.path.join(indigo.server.getInstallFolderPath(), "Preferences", "Plugins",
+                                  f"{HA_AGENT_PLUGIN_ID}.indiPref")
+        with open(prefs_path, "w") as f:
+            f.write(f'<?xml version="1.0"?><Prefs><address>127.0.0.1</address><port>{port}</port>'
+                    f'<use_ssl type="bool">false</use_ssl><haToken>{TOKEN}</haToken></Prefs>')
+    for n, (name, device_type, entity_id) in enumerate(devices, 1):
+        indigo.add_device(n, name, HA_AGENT_PLUGIN_ID, device_type, entity_id)
+
+    import plugin
+    p = plugin.Plugin("com.clives.indigoplugin.hadevicemonitor", "HA Device Monitor", "test",
+                      indigo.Dict(prefs or {}))
+    p.logger.setLevel(logging.CRITICAL)
+    return p
@@ -0,0 +1,134 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - availability history tests
+####################
+
+import os
+import unittest
+
+import support
+from availability import DAILY_RETENTION_DAYS, DAY_SECONDS, HISTORY_LENGTH, AvailabilityHistory
+
+HOUR = 3600
+START = 20_740 * DAY_SECONDS    # a UTC midnight; tracking starts here
+
+
+class AvailabilityHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(support.temp_dir(self), "history.sqlite")
+        self.history = self.open()
+
+    def open(self):
+        history = AvailabilityHistory(self.path, now=START)
+        self.addCleanup(history.close)
+        return history
+
+    def worst(self, window_days, now, **kwargs):
+        return self.history.worst(window_days * DAY_SECONDS, now=now, **kwargs)
+
+    def test_outage_and_recovery(self):
+        h = self.history
+        h.problem("light.a", "unavailable", START + 1 * HOUR)
+        h.problem("light.a", "missing", START + 2 * HOUR)      # already down: ignored
+        h.recovered("light.a", START + 3 * HOUR)
+        h.recovered("light.a", START + 4 * HOUR)               # already up: ignored
+        h.recovered("light.b", START + 4 * HOUR)               # never down: ignored
+        self.assertEqual(h.flush(), 2)
+        self.assertEqual(h.flush(), 0)
+        self.assertEqual(h.transitions("light.a"), [(START + 1 * HOUR, "unavailable"), (START + 3 * HOUR, None)])
+
+        [row] = self.worst(1, START + 10 * HOUR)
+        self.assertEqual(row["entity"], "light.a")
+        self.assertEqual(row["failures"], 1)
+        self.assertEqual(row["down_seconds"], 2 * HOUR)
+        self.assertAlmostEqual(row["availability"], 80.0)
+        self.assertEqual(row["mtbf"], 8 * HOUR)
+        self.assertEqual(row["mttr"], 2 * HOUR)
+        self.assertIsNone(row["problem"])
+
+    def test_ring_keeps_latest_transitions(self):
+        h = self.history
+        for n in range(2 * HISTORY_LENGTH + 10):
+            if n % 2:
+                h.recovered("light.a", START + n)
+            else:
+                h.problem("light.a", "unavailable", START + n)
+        h.flush()
+        kept = h.transitions("light.a")
+        self.assertEqual(len(kept), HISTORY_LENGTH)
+        self.assertEqual(kept[0][0], START + HISTORY_LENGTH + 10)
+        self.assertEqual(kept[-1], (START + 2 * HISTORY_LENGTH + 9, None))
+        self.assertEqual(h.transitions("light.a", since=START + 2 * HISTORY_LENGTH + 8),
+                         [(START + 2 * HISTORY_LENGTH + 8, "unavailable"), (START + 2 * HISTORY_LENGTH + 9, None)])
+        # The ring position survives a reopen
+        reopened = self.open()
+        reopened.problem("light.a", "missing", START + 1000)
+        reopened.flush()
+        kept = reopened.transitions("light.a")
+        self.assertEqual(len(kept), HISTORY_LENGTH)
+        self.assertEqual(kept[-1], (START + 1000, "missing"))
+
+    def test_window_starts_while_down(self):
+        self.history.problem("sensor.a", "stale", START + 12 * HOUR)
+        self.history.flush()
+        # Still down: the whole window is downtime, not the whole outage
+        [row] = self.worst(1, START + 3 * DAY_SECONDS)
+        self.assertEqual(row["down_seconds"], DAY_SECONDS)
+        self.assertEqual(row["availability"], 0.0)
+        self.assertEqual(row["problem"], "stale")
+        self.assertEqual(row["failures"], 0)    # the failure was before the window
+
+        # Recovered: only the days inside the window count
+        self.history.recovered("sensor.a", START + 2 * DAY_SECONDS + 12 * HOUR)
+        self.history.flush()
+        [row] = self.worst(2, START + 3 * DAY_SECONDS)
+        self.assertEqual(row["down_seconds"], DAY_SECONDS + 12 * HOUR)
+        self.assertAlmostEqual(row["availability"], 25.0)
+        self.assertEqual(row["mttr"], 2 * DAY_SECONDS)
+        self.assertIsNone(row["problem"])
+
+    def test_downtime_before_tracking_started_not_counted(self):
+        self.history.problem("switch.a", "unavailable", START - DAY_SECONDS)
+        self.history.recovered("switch.a", START + 6 * HOUR)
+        self.history.flush()
+        [row] = self.worst(7, START + 12 * HOUR)
+        self.assertEqual(row["down_seconds"], 6 * HOUR)
+        self.assertAlmostEqual(row["availability"], 50.0)
+
+    def test_daily_totals_pruned_at_retention_boundary(self):
+        h = self.history
+        h.problem("light.a", "unavailable", START + HOUR)
+        h.recovered("light.a", START + 2 * HOUR)
+        h.flush()
+
+        def kept_days():
+            return [day for (day,) in h._db.execute("SELECT day FROM daily WHERE entity_id = 'light.a'")]
+
+        first_day = START // DAY_SECONDS
+        h.problem("light.b", "unavailable", START + DAILY_RETENTION_DAYS * DAY_SECONDS)
+        h.flush()
+        self.assertEqual(kept_days(), [first_day])
+        h.recovered("light.b", START + (DAILY_RETENTION_DAYS + 1) * DAY_SECONDS)
+        h.flush()
+        self.assertEqual(kept_days(), [])
+        # The transition ring is not pruned with the daily totals
+        self.assertEqual(len(h.transitions("light.a")), 2)
+
+    def test_worst_order_and_filter(self):
+        h = self.history
+        for entity_id, hours in (("light.a", 1), ("light.b", 3), ("light.c", 2)):
+            h.problem(entity_id, "unavailable", START)
+            h.recovered(entity_id, START + hours * HOUR)
+        h.problem("light.d", "missing", START + 5 * HOUR)
+        h.flush()
+        now = START + 10 * HOUR
+        self.assertEqual([r["entity"] for r in self.worst(1, now)], ["light.d", "light.b", "light.c", "light.a"])
+        self.assertEqual([r["entity"] for r in self.worst(1, now, limit=2)], ["light.d", "light.b"])
+        self.assertEqual([r["entity"] for r in self.worst(1, now, entity_ids={"light.a", "light.c"})],
+                         ["light.c", "light.a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
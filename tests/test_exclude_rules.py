@@ -0,0 +1,52 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - exclude rule tests
+#
+# Usage:
+#     python3 -m unittest discover tests
+####################
+
+import unittest
+
+import support  # noqa: F401  (sys.path)
+from exclude_rules import ExcludeRules, split_rules
+
+
+class ExcludeRulesTest(unittest.TestCase):
+
+    def test_rule_kinds(self):
+        rules = ExcludeRules(["light.porch"], split_rules("domain:update; button.*_identify; re:sensor\\..*_(rssi|lqi)"))
+        self.assertEqual(rules.match("light.porch"), "light.porch")
+        self.assertEqual(rules.match("update.hacs"), "domain:update")
+        self.assertEqual(rules.match("button.hue_identify"), "button.*_identify")
+        self.assertEqual(rules.match("sensor.plug_rssi"), "re:sensor\\..*_(rssi|lqi)")
+        self.assertIsNone(rules.match("sensor.plug_rssi_2"))
+        self.assertIsNone(rules.match("light.kitchen"))
+
+    def test_first_matching_rule_wins(self):
+        rules = ExcludeRules(patterns=["re:sensor\\..*", "sensor.*", "re:sensor\\.a.*"])
+        self.assertEqual(rules.match("sensor.abc"), "re:sensor\\..*")
+        rules = ExcludeRules(patterns=["sensor.*", "re:sensor\\..*"])
+        self.assertEqual(rules.match("sensor.abc"), "sensor.*")
+
+    def test_inline_global_flags(self):
+        # Valid on its own; must not break the matcher built from the other rules
+        rules = ExcludeRules(patterns=["button.*", "re:(?i)sensor\\.FOO_.*"])
+        self.assertEqual(rules.match("sensor.foo_rssi"), "re:(?i)sensor\\.FOO_.*")
+        self.assertEqual(rules.match("button.x"), "button.*")
+        self.assertIsNone(rules.match("switch.foo_rssi"))
+
+    def test_numbered_backreference(self):
+        rules = ExcludeRules(patterns=["domain:update", "re:sensor\\.(\\w+)_\\1"])
+        self.assertEqual(rules.match("sensor.plug_plug"), "re:sensor\\.(\\w+)_\\1")
+        self.assertIsNone(rules.match("sensor.plug_lamp"))
+
+    def test_invalid_rules_raise_value_error(self):
+        for rule in ("re:(", "re:foo(?i)", "domain:", "domain:a.b"):
+            with self.assertRaises(ValueError, msg=rule):
+                ExcludeRules(patterns=["button.*", rule])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - freshness engine tests
+####################
+
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+import support  # noqa: F401  (sys.path)
+import freshness
+from freshness import FreshnessTracker, StaleThresholds
+
+NOW = 1_800_000_000.0
+HOUR = 3600
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+class FreshnessTrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = FreshnessTracker()
+
+    def test_deadline_expires(self):
+        t = self.tracker
+        self.assertTrue(t.update("sensor.a", iso(NOW - 10), NOW, HOUR))
+        self.assertTrue(t.update("sensor.b", iso(NOW - 20), NOW, 2 * HOUR))
+        self.assertEqual(t.next_deadline(), NOW - 10 + HOUR)
+        self.assertEqual(t.pop_expired(NOW + HOUR - 11), [])
+        self.assertEqual(t.pop_expired(NOW + HOUR), ["sensor.a"])
+        self.assertEqual(t.stale, {"sensor.a"})
+        self.assertEqual(t.next_deadline(), NOW - 20 + 2 * HOUR)
+        self.assertAlmostEqual(t.age_minutes("sensor.a", NOW + HOUR), 60 + 10 / 60)
+        self.assertEqual(t.threshold_minutes("sensor.b"), 120)
+
+    def test_already_stale_and_fresh_again(self):
+        t = self.tracker
+        t.update("sensor.a", iso(NOW - 2 * HOUR), NOW, HOUR)
+        self.assertEqual(t.stale, {"sensor.a"})
+        self.assertIsNone(t.next_deadline())
+        t.update("sensor.a", iso(NOW), NOW, HOUR)
+        self.assertEqual(t.stale, set())
+        self.assertEqual(t.next_deadline(), NOW + HOUR)
+
+    def test_superseded_entry_is_skipped(self):
+        t = self.tracker
+        t.update("sensor.a", iso(NOW - 10), NOW, HOUR)
+        t.update("sensor.a", iso(NOW), NOW, HOUR)
+        # The first deadline is still in the heap but no longer live
+        self.assertEqual(len(t._heap), 2)
+        self.assertEqual(t.next_deadline(), NOW + HOUR)
+        self.assertEqual(len(t._heap), 1)
+        self.assertEqual(t.pop_expired(NOW + HOUR - 5), [])
+        self.assertEqual(t.stale, set())
+
+    def test_threshold_change_without_reparse(self):
+        t = self.tracker
+        stamp = iso(NOW - 10)
+        with mock.patch.object(freshness, "parse_ha_timestamp", wraps=freshness.parse_ha_timestamp) as parse:
+            t.update("sensor.a", stamp, NOW, HOUR)
+            t.update("sensor.a", stamp, NOW, HOUR)
+            t.update("sensor.a", stamp, NOW, 2 * HOUR)
+            self.assertEqual(parse.call_count, 1)
+        self.assertEqual(t.next_deadline(), NOW - 10 + 2 * HOUR)
+        self.assertEqual(t.pop_expired(NOW - 10 + HOUR), [])
+        t.update("sensor.a", stamp, NOW, 5)
+        self.assertEqual(t.stale, {"sensor.a"})
+
+    def test_unparseable_timestamp(self):
+        t = self.tracker
+        self.assertFalse(t.update("sensor.a", "yesterday", NOW, HOUR))
+        self.assertFalse(t.update("sensor.a", "yesterday", NOW, HOUR))
+        self.assertIsNone(t.next_deadline())
+        self.assertIsNone(t.age_minutes("sensor.a", NOW))
+
+    def test_compaction_bounds_heap(self):
+        t = self.tracker
+        for n in range(1000):
+            t.update("sensor.a", iso(NOW + n), NOW, HOUR)
+        self.assertLessEqual(len(t._heap), 2 * len(t) + 64 + 1)
+        self.assertEqual(t.next_deadline(), NOW + 999 + HOUR)
+
+    def test_retain(self):
+        t = self.tracker
+        t.update("sensor.a", iso(NOW), NOW, HOUR)
+        t.update("sensor.b", iso(NOW - 2 * HOUR), NOW, HOUR)
+        t.update("sensor.c", iso(NOW + 10), NOW, HOUR)
+        t.retain({"sensor.c"})
+        self.assertEqual(len(t), 1)
+        self.assertEqual(t.stale, set())
+        self.assertEqual(t.next_deadline(), NOW + 10 + HOUR)
+        self.assertEqual(t.pop_expired(NOW + 2 * HOUR), ["sensor.c"])
+
+
+class StaleThresholdsTest(unittest.TestCase):
+
+    def test_precedence(self):
+        rules = StaleThresholds(2880, "domain:sensor=60; type:HAsensor=30; sensor.garden=10")
+        self.assertEqual(rules.seconds("sensor.garden", "HAsensor"), 10 * 60)
+        self.assertEqual(rules.seconds("sensor.garden", "ha_generic"), 10 * 60)
+        self.assertEqual(rules.seconds("sensor.kitchen", "HAsensor"), 30 * 60)
+        self.assertEqual(rules.seconds("sensor.kitchen", "ha_generic"), 60 * 60)
+        self.assertEqual(rules.seconds("light.kitchen", "HAdimmerType"), 2880 * 60)
+        self.assertEqual(rules.override_count, 3)
+
+    def test_zero_disables(self):
+        rules = StaleThresholds(2880, "domain:button=0\nsensor.static=0")
+        self.assertEqual(rules.seconds("button.identify", "ha_generic"), 0)
+        self.assertEqual(rules.seconds("sensor.static", "HAsensor"), 0)
+        self.assertTrue(rules.enabled)
+        self.assertFalse(StaleThresholds(0).enabled)
+        self.assertTrue(StaleThresholds(0, "domain:climate=30").enabled)
+        self.assertFalse(StaleThresholds(0, "domain:climate=0").enabled)
+
+    def test_memoized(self):
+        rules = StaleThresholds(60, "type:HAclimate=30")
+        self.assertEqual(rules.seconds("climate.hall", "HAclimate"), 30 * 60)
+        rules.types["HAclimate"] = 5 * 60
+        self.assertEqual(rules.seconds("climate.hall", "HAclimate"), 30 * 60)
+
+    def test_invalid_rules(self):
+        for raw in ("sensor.a", "sensor.a=soon", "=10", "domain:sensor=-1"):
+            with self.assertRaises(ValueError, msg=raw):
+                StaleThresholds(60, raw)
+        self.assertEqual(StaleThresholds(60, " ;\n; ").override_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
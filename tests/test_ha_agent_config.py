@@ -0,0 +1,38 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - HA Agent connection settings tests
+####################
+
+import unittest
+
+import support
+from support import indigo
+
+
+class ReadHAAgentConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = support.make_plugin(port=8123)
+        self.agent = indigo.server.getPlugin(support.HA_AGENT_PLUGIN_ID)
+
+    def test_cached_until_file_changes(self):
+        self.assertTrue(self.plugin._read_ha_agent_config(force=True))
+        self.assertEqual(self.plugin.ha_base_url, "http://127.0.0.1:8123")
+        self.assertEqual(self.plugin.primary_instance.token, support.TOKEN)
+        self.assertTrue(self.plugin._read_ha_agent_config())
+
+    def test_disabled_agent_is_noticed_on_the_fast_path(self):
+        self.assertTrue(self.plugin._read_ha_agent_config(force=True))
+        self.agent.isEnabled = lambda: False
+        self.assertFalse(self.plugin._read_ha_agent_config())
+        self.assertIsNone(self.plugin.ha_token)
+        self.assertIsNone(self.plugin.primary_instance.token)
+
+        self.agent.isEnabled = lambda: True
+        self.assertTrue(self.plugin._read_ha_agent_config())
+        self.assertEqual(self.plugin.primary_instance.token, support.TOKEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
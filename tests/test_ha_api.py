@@ -0,0 +1,46 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - HA REST API helper tests
+####################
+
+import unittest
+
+import support
+from ha_api import HAClient, parse_template_states, project_state
+
+
+class TemplateStatesTest(unittest.TestCase):
+
+    def test_parse(self):
+        entities, total = parse_template_states(
+            "120\n"
+            "sensor.a|21.5|2026-10-17T09:00:00+00:00\n"
+            "sensor.b|a|b|2026-10-17T09:00:01+00:00\n"
+            "!light.gone\n"
+            "climate.c|heat|2026-10-17T09:00:02+00:00|20.4\n"
+            "climate.d|off|2026-10-17T09:00:03+00:00|"
+        )
+        self.assertEqual(total, 120)
+        self.assertEqual(set(entities), {"sensor.a", "sensor.b", "climate.c", "climate.d"})
+        self.assertEqual(entities["sensor.b"]["state"], "a|b")
+        self.assertNotIn("value", entities["sensor.a"])
+        self.assertEqual(entities["climate.c"]["value"], "20.4")
+        self.assertIsNone(entities["climate.d"]["value"])
+
+    def test_null_temperature_matches_rest(self):
+        server, ha = support.start_fake_ha(10)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with ha.lock:
+            ha.states["climate.fake_000004"]["attributes"]["current_temperature"] = None
+        client = HAClient(f"http://127.0.0.1:{server.server_port}", support.TOKEN)
+        self.addCleanup(client.close)
+
+        entities, _ = client.render_states_template(["climate.fake_000004"])
+        self.assertIsNone(entities["climate.fake_000004"]["value"])
+        self.assertIsNone(project_state(ha.states["climate.fake_000004"])["value"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - multiple HA instance tests
+####################
+
+import logging
+import unittest
+from unittest import mock
+
+import support
+import plugin
+from ha_api import BREAKER_MAX_SECONDS, BREAKER_MIN_SECONDS, HAInstance
+
+NOW = 1_800_000_000.0
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        instance = HAInstance("main")
+        self.assertFalse(instance.breaker_open(NOW))
+        backoffs = [instance.record_failure(NOW) for _ in range(7)]
+        self.assertEqual(backoffs, [30, 60, 120, 240, 480, 600, 600])
+        self.assertEqual(backoffs[0], BREAKER_MIN_SECONDS)
+        self.assertEqual(backoffs[-1], BREAKER_MAX_SECONDS)
+        self.assertEqual(instance.failures, 7)
+        self.assertEqual(instance.down_since, NOW)
+
+    def test_retry_at(self):
+        instance = HAInstance("main")
+        instance.record_failure(NOW)
+        instance.record_failure(NOW + 30)
+        self.assertEqual(instance.retry_at, NOW + 90)
+        self.assertTrue(instance.breaker_open(NOW + 89))
+        self.assertFalse(instance.breaker_open(NOW + 90))
+        self.assertEqual(instance.down_since, NOW)   # from the first failure in the run
+
+        instance.record_success()
+        self.assertEqual((instance.failures, instance.down_since, instance.retry_at), (0, None, 0.0))
+        self.assertFalse(instance.breaker_open(NOW + 31))
+        self.assertEqual(instance.record_failure(NOW + 100), BREAKER_MIN_SECONDS)
+
+
+class InstanceOutageLogTest(unittest.TestCase):
+    """An outage is logged once when it starts and once when it ends."""
+
+    def setUp(self):
+        self.p = support.make_plugin()
+        self.log = ListHandler()
+        self.p.logger.addHandler(self.log)
+        self.p.logger.setLevel(logging.DEBUG)
+        self.addCleanup(self.p.logger.removeHandler, self.log)
+        self.instance = self.p.primary_instance
+
+    def test_unreachable_then_back(self):
+        with mock.patch.object(plugin.time, "time", return_value=NOW):
+            for _ in range(3):
+                self.p._instance_failed(self.instance, "HA API connection error: refused")
+        with mock.patch.object(plugin.time, "time", return_value=NOW + 600):
+            self.p._instance_recovered(self.instance)
+            self.p._instance_recovered(self.instance)
+
+        logged = [(level, message) for level, message in self.log.records if level >= logging.INFO]
+        self.assertEqual(logged, [
+            (logging.ERROR, "HA unreachable - HA API connection error: refused. Retrying in 30s, "
+                            "backing off up to 10m until it answers"),
+            (logging.INFO, "HA back after 10m (3 failed attempt(s))"),
+        ])
+        retries = [message for level, message in self.log.records
+                   if level == logging.DEBUG and "still unreachable" in message]
+        self.assertEqual(len(retries), 2)
+        self.assertEqual(self.p.fetch_failures, {"main": 3})
+        self.assertEqual(self.instance.failures, 0)
+        self.assertIsNone(self.instance.last_error)
+
+
+class InstanceReloadTest(unittest.TestCase):
+    """Saving the config mustn't swap instances under a running check cycle."""
+
+    def setUp(self):
+        self.server, self.ha = support.start_fake_ha(20)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.p = support.make_plugin(
+            {"scheduleMode": "continuous", "staleThreshold": "0",
+             "haInstances": f"barn|{self.url}|{support.TOKEN}|*.fake_00001*"},
+            port=self.server.server_port,
+            devices=[("Dev 1", "HAswitchType", "switch.fake_000002"),
+                     ("Dev 11", "HAswitchType", "switch.fake_000011")],
+        )
+        self.addCleanup(self.p.shutdown)
+        self.p.startup()
+
+    def reload(self, spec):
+        self.p.pluginPrefs["haInstances"] = spec
+        self.p._load_extra_instances()
+
+    def test_reload_between_cycles_applies_at_once(self):
+        self.p._run_check_cycle()
+        old = self.p.extra_instances[0]
+        self.assertIsNotNone(old.client)
+        self.reload(f"loft|{self.url}|{support.TOKEN}|*.fake_00001*")
+        self.assertEqual([i.name for i in self.p.extra_instances], ["loft"])
+        self.assertIsNone(self.p.pending_extra_instances)
+        self.assertIsNone(old.client)
+
+    def test_reload_during_cycle_waits_for_it(self):
+        self.p._run_check_cycle()
+        old = self.p.extra_instances[0]
+        routed = self.p._instance_for("switch.fake_000011")
+        self.assertIs(routed, old)
+
+        with self.p.cycle_lock:    # a cycle is running
+            self.reload(f"loft|{self.url}|{support.TOKEN}|*.fake_00001*")
+            self.reload(f"attic|{self.url}|{support.TOKEN}|*.fake_00001*")
+            self.assertEqual(self.p.extra_instances, [old])
+            self.assertIs(self.p._instance_for("switch.fake_000011"), old)
+            self.assertIsNotNone(old.client)
+
+        self.p._run_check_cycle()
+        self.assertEqual([i.name for i in self.p.extra_instances], ["attic"])
+        self.assertIsNone(old.client)
+        self.assertEqual(self.p._instance_for("switch.fake_000011").name, "attic")
+        self.assertEqual(self.p.known_problems, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
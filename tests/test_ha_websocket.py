@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - WebSocket event stream tests (against tools/fake_ha_server.py)
+####################
+
+import logging
+import time
+import unittest
+
+import support
+from ha_websocket import HAEventStream
+
+
+def wait_for(condition, timeout=10.0):
+    """Poll condition() until it is true; returns its last value."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.01)
+    return condition()
+
+
+class HAEventStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.ha = support.start_fake_ha(50)
+        logger = logging.getLogger("test_ha_websocket")
+        logger.setLevel(logging.CRITICAL)
+        self.stream = HAEventStream(f"http://127.0.0.1:{self.server.server_port}", support.TOKEN, logger)
+        self.stream.start()
+        self.assertTrue(self.stream.synced.wait(10), "initial sync")
+
+    def tearDown(self):
+        self.stream.stop()
+        self.stream.join(5)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def state(self, entity_id):
+        snapshot = self.stream.snapshot()
+        entity = snapshot.get(entity_id) if snapshot is not None else None
+        return entity["state"] if entity is not None else None
+
+    def test_snapshot_then_events(self):
+        snapshot = self.stream.snapshot()
+        self.assertEqual(len(snapshot), 50)
+        self.assertEqual(snapshot["light.fake_000003"]["state"], "on")
+        self.assertEqual(snapshot["climate.fake_000004"]["value"], 20.4)
+
+        version = self.stream.entity_set_version
+        self.stream.changed.clear()
+        self.ha.set_state("light.fake_000003", "unavailable")
+        self.assertTrue(wait_for(lambda: self.state("light.fake_000003") == "unavailable"))
+        self.assertTrue(self.stream.changed.is_set())
+        self.assertEqual(self.stream.entity_set_version, version)
+
+        self.ha.set_state("sensor.new_entity", "12")
+        self.assertTrue(wait_for(lambda: self.state("sensor.new_entity") == "12"))
+        self.ha.set_state("light.fake_000003", None)
+        self.assertTrue(wait_for(lambda: "light.fake_000003" not in self.stream.snapshot()))
+        self.assertEqual(self.stream.entity_set_version, version + 2)
+
+    def test_reconnect_resyncs(self):
+        self.ha.drop_websockets()
+        self.assertTrue(wait_for(lambda: not self.stream.synced.is_set()), "synced cleared on disconnect")
+        self.assertIsNone(self.stream.snapshot())
+        # A change while disconnected arrives with the fresh snapshot
+        self.ha.set_state("switch.fake_000002", "unavailable")
+        self.assertTrue(self.stream.synced.wait(10), "resynced after reconnect")
+        self.assertEqual(self.stream.reconnects, 1)
+        self.assertEqual(self.state("switch.fake_000002"), "unavailable")
+
+        self.ha.set_state("switch.fake_000002", "on")
+        self.assertTrue(wait_for(lambda: self.state("switch.fake_000002") == "on"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - notification dispatcher tests
+####################
+
+import logging
+import threading
+import time
+import unittest
+
+import support  # noqa: F401  (sets up the plugin import path)
+from notifier import NotificationDispatcher
+
+
+class NotificationDispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger("test_notifier")
+        self.logger.setLevel(logging.CRITICAL)
+        self.dispatcher = NotificationDispatcher(self.logger)
+        self.addCleanup(self.dispatcher.stop, 1.0)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.sending = threading.Event()
+
+    def hung_send(self, title, message):
+        self.sending.set()
+        self.release.wait(10)
+
+    def test_reconfigure_does_not_wait_for_a_hung_channel(self):
+        self.dispatcher.configure({"Pushover": ("t", self.hung_send)}, 0)
+        self.dispatcher.notify_message("first")
+        self.assertTrue(self.sending.wait(2))
+
+        started = time.monotonic()
+        self.dispatcher.configure({"Pushover": ("t", lambda title, message: None)}, 0)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+        self.dispatcher.notify_message("second")
+        deadline = time.monotonic() + 2
+        while self.dispatcher.counts()["Pushover"] != (1, 0) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.dispatcher.counts(), {"Pushover": (1, 0)})
+
+    def test_counts_include_a_replaced_channel_once_it_finishes(self):
+        self.dispatcher.configure({"Pushover": ("t", self.hung_send)}, 0)
+        self.dispatcher.notify_message("first")
+        self.assertTrue(self.sending.wait(2))
+        old = self.dispatcher.channels["Pushover"]
+        self.dispatcher.configure({}, 0)
+        self.assertEqual(self.dispatcher.counts(), {"Pushover": (0, 0)})
+
+        self.release.set()
+        old.join(2)
+        self.assertFalse(old.is_alive())
+        # Counted exactly once, whether read before or after the reaper folds it in
+        self.assertEqual(self.dispatcher.counts(), {"Pushover": (1, 0)})
+        self.assertEqual(self.dispatcher.counts(), {"Pushover": (1, 0)})
+        self.assertEqual(self.dispatcher._retiring, [])
+
+    def test_stop_flushes_retiring_channels(self):
+        sent = []
+        self.dispatcher.configure({"Email+": ("t", lambda title, message: sent.append(message))}, 60)
+        self.dispatcher.notify(["light.a unavailable"])
+        self.dispatcher.configure({}, 60)
+        self.dispatcher.stop(2)
+        self.assertEqual(sent, ["1 new problem(s):\n- light.a unavailable"])
+        self.assertEqual(self.dispatcher.counts(), {"Email+": (1, 0)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - adaptive check interval tests
+####################
+
+import unittest
+
+import support
+import plugin
+
+NOW = 1_800_000_000.0
+PROBLEM = {"type": "unavailable", "since": "10/17/2026 09:00:00"}
+
+
+class PollIntervalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.p = support.make_plugin()
+
+    def interval(self, now_ts=NOW):
+        self.p._update_poll_interval(now_ts)
+        return self.p.poll_interval
+
+    def test_normal(self):
+        self.assertEqual(self.interval(), plugin.CHECK_INTERVAL_SECONDS)
+
+    def test_fast_while_active_problems_are_changing(self):
+        self.p.known_problems = {"light.a": PROBLEM}
+        self.p.last_problem_change = NOW
+        self.assertEqual(self.interval(), plugin.FAST_CHECK_INTERVAL_SECONDS)
+        self.assertEqual(self.interval(NOW + plugin.FAST_POLL_WINDOW_SECONDS - 1),
+                         plugin.FAST_CHECK_INTERVAL_SECONDS)
+        self.assertEqual(self.interval(NOW + plugin.FAST_POLL_WINDOW_SECONDS), plugin.CHECK_INTERVAL_SECONDS)
+
+    def test_normal_once_everything_recovered(self):
+        self.p.known_problems = {}
+        self.p.last_problem_change = NOW
+        self.assertEqual(self.interval(), plugin.CHECK_INTERVAL_SECONDS)
+
+    def test_fast_during_mass_outage(self):
+        self.p.storm = {"started": NOW - 3600, "last_ids": frozenset(), "quiet_since": NOW, "affected": set()}
+        self.assertEqual(self.interval(), plugin.FAST_CHECK_INTERVAL_SECONDS)
+
+    def test_slow_ha_stretches_interval(self):
+        self.p.known_problems = {"light.a": PROBLEM}
+        self.p.last_problem_change = NOW     # latency wins over problem activity
+        self.p.recent_fetch_ms.extend([100] * 15 + [5000] * 5)
+        self.assertEqual(self.interval(), plugin.CHECK_INTERVAL_SECONDS * 5000 // plugin.SLOW_FETCH_MS)
+        self.p.recent_fetch_ms.extend([60000] * 20)
+        self.assertEqual(self.interval(), plugin.MAX_CHECK_INTERVAL_SECONDS)
+
+    def test_too_few_samples_ignored(self):
+        self.p.recent_fetch_ms.extend([60000] * 4)
+        self.assertEqual(self.interval(), plugin.CHECK_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
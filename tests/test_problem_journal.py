@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - known problems journal tests
+####################
+
+import json
+import os
+import unittest
+
+import support
+from problem_journal import ProblemJournal
+
+A = {"type": "unavailable", "since": "10/17/2026 09:00:00"}
+B = {"type": "missing", "since": "10/17/2026 09:05:00"}
+
+
+class ProblemJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(support.temp_dir(self), "known_problems.json")
+
+    def open(self):
+        journal = ProblemJournal(self.path)
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_replay_journal(self):
+        journal = self.open()
+        journal.set("light.a", A)
+        journal.set("sensor.b", B)
+        self.assertEqual(journal.flush(), 2)
+        journal.delete("light.a")
+        self.assertEqual(journal.flush(), 1)
+        self.assertEqual(journal.flush(), 0)
+        journal.close()
+
+        state, replayed = self.open().load()
+        self.assertEqual(state, {"sensor.b": B})
+        self.assertEqual(replayed, 3)
+
+    def test_replay_snapshot_plus_journal(self):
+        journal = self.open()
+        journal.compact({"light.a": A, "sensor.b": B})
+        journal.delete("sensor.b")
+        journal.set("switch.c", A)
+        journal.flush()
+        journal.close()
+
+        reopened = self.open()
+        state, replayed = reopened.load()
+        self.assertEqual(state, {"light.a": A, "switch.c": A})
+        self.assertEqual(replayed, 2)
+        self.assertEqual(reopened.journal_records, 2)
+
+    def test_legacy_snapshot_only(self):
+        with open(self.path, "w") as f:
+            json.dump({"light.a": A}, f)
+        self.assertEqual(self.open().load(), ({"light.a": A}, 0))
+
+    def test_torn_last_line(self):
+        journal = self.open()
+        journal.set("light.a", A)
+        journal.flush()
+        journal.close()
+        with open(journal.journal_path, "a") as f:
+            f.write('{"op":"set","id":"sensor.b","v":{"ty')     # crash mid-append
+
+        reopened = self.open()
+        self.assertEqual(reopened.load(), ({"light.a": A}, 1))
+        # The next append starts on a fresh line instead of extending the torn one
+        reopened.set("switch.c", B)
+        reopened.flush()
+        reopened.close()
+        self.assertEqual(self.open().load(), ({"light.a": A, "switch.c": B}, 2))
+
+    def test_compact_then_reopen(self):
+        journal = self.open()
+        for n in range(5):
+            journal.set(f"sensor.s{n}", A)
+        journal.flush()
+        state, _ = self.open().load()
+        journal.delete("sensor.s0")
+        journal.compact({k: v for k, v in state.items() if k != "sensor.s0"})
+        self.assertEqual(journal.journal_records, 0)
+        self.assertEqual(os.path.getsize(journal.journal_path), 0)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+        # Appends after compaction go to the emptied journal
+        journal.set("light.a", B)
+        journal.flush()
+        journal.close()
+
+        state, replayed = self.open().load()
+        self.assertEqual(replayed, 1)
+        self.assertEqual(set(state), {"sensor.s1", "sensor.s2", "sensor.s3", "sensor.s4", "light.a"})
+
+    def test_recovers_then_reappears(self):
+        journal = self.open()
+        journal.set("light.a", A)
+        journal.flush()
+        journal.delete("light.a")
+        journal.flush()
+        journal.set("light.a", B)
+        journal.flush()
+        journal.close()
+        self.assertEqual(self.open().load(), ({"light.a": B}, 3))
+
+        journal = self.open()
+        journal.load()
+        journal.compact({"light.a": B})
+        journal.delete("light.a")
+        journal.set("light.a", A)
+        journal.flush()
+        journal.close()
+        self.assertEqual(self.open().load(), ({"light.a": A}, 2))
+
+    def test_needs_compaction(self):
+        journal = ProblemJournal(self.path, compact_min_records=10)
+        self.addCleanup(journal.close)
+        for n in range(11):
+            journal.set(f"sensor.s{n}", A)
+        journal.flush()
+        self.assertTrue(journal.needs_compaction(5))
+        self.assertFalse(journal.needs_compaction(6))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - rename suggestion tests
+####################
+
+import logging
+import unittest
+
+import support
+import plugin
+from rename_index import RenameIndex
+
+
+class RenameIndexTest(unittest.TestCase):
+
+    def test_suffix_rename_preferred(self):
+        index = RenameIndex(["light.kitchen_2", "light.kitchen_3", "light.kitchenette", "sensor.kitchen"])
+        self.assertEqual(index.suggest("light.kitchen"), "light.kitchen_2")
+        self.assertEqual(index.suggest("light.kitchen", taken={"light.kitchen_2"}), "light.kitchen_3")
+        self.assertIsNone(index.suggest("light.garage"))
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class RenameSuggestionFetchTest(unittest.TestCase):
+    """Suggestions need every HA entity ID, which only /api/states returns."""
+
+    def setUp(self):
+        self.server, self.ha = support.start_fake_ha(50)
+        self.ha.set_state("sensor.kitchen_temperature_2", "21.5")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _plugin(self, fetch_method):
+        p = support.make_plugin(
+            {"scheduleMode": "continuous", "staleThreshold": "0", "fetchMethod": fetch_method,
+             "targetedFetchPercent": "0"},
+            port=self.server.server_port,
+            devices=[("Kitchen temperature", "HAsensor", "sensor.kitchen_temperature"),
+                     ("Porch light", "HAdimmerType", "light.fake_000003")],
+        )
+        log = ListHandler()
+        p.logger.addHandler(log)
+        p.logger.setLevel(logging.DEBUG)
+        self.addCleanup(p.logger.removeHandler, log)
+        self.addCleanup(p.shutdown)
+        p.startup()
+        return p, log
+
+    def _assert_suggested(self, log):
+        self.assertIn("NEW PROBLEM: Kitchen temperature: missing in HA - renamed to sensor.kitchen_temperature_2?",
+                      log.messages)
+
+    def test_states_mode(self):
+        p, log = self._plugin("states")
+        p._run_check_cycle()
+        self._assert_suggested(log)
+
+    def test_template_mode(self):
+        p, log = self._plugin("template")
+        p._run_check_cycle()
+        p._run_check_cycle()
+        self._assert_suggested(log)
+        # The first cycle fills the ID set from /api/states, later ones use the template
+        self.assertEqual([path for _, path in self.server.requests], ["/api/states", "/api/template"])
+        self.assertEqual(p.primary_instance.last_fetch_strategy, "template")
+
+        # Once the ID set is BULK_RECALIBRATE_SECONDS old, /api/states runs again and picks up renames
+        self.ha.set_state("light.porch_renamed", "on")
+        p.primary_instance.last_bulk_fetch -= plugin.BULK_RECALIBRATE_SECONDS + 1
+        p._run_check_cycle()
+        self.assertEqual(self.server.requests[-1], ("GET", "/api/states"))
+        self.assertIn("light.porch_renamed", p.primary_instance.entity_ids)
+        self.assertEqual(p._rename_suggestion("sensor.kitchen_temperature", "HAsensor", set()),
+                         "sensor.kitchen_temperature_2")
+
+
+if __name__ == "__main__":
+    unittest.main()
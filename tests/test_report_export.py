@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - manual report export tests
+####################
+
+import logging
+import os
+import unittest
+from unittest import mock
+
+import support
+import plugin
+from report_export import ReportExporter, prune_reports
+
+
+class FailingExporter(ReportExporter):
+    """Raises OSError (as a full disk would) from the fourth row on."""
+
+    def row(self, *args):
+        if self.rows == 3:
+            raise OSError(28, "No space left on device")
+        super().row(*args)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class LogReportExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = support.make_plugin({"reportExportFormat": "csv"})
+        self.log = ListHandler()
+        self.plugin.logger.addHandler(self.log)
+        self.plugin.logger.setLevel(logging.DEBUG)
+        self.folder = self.plugin._get_log_folder()
+        rows = plugin.REPORT_LOG_ROWS + 10
+        self.missing = [{"name": f"Missing {n:03d}", "entity": f"sensor.missing_{n:03d}", "detail": "Not found in HA"}
+                        for n in range(rows)]
+        self.stale = [{"name": f"Stale {n:03d}", "entity": f"sensor.stale_{n:03d}", "detail": "3d 2h"}
+                      for n in range(rows)]
+
+    def tearDown(self):
+        self.plugin.logger.removeHandler(self.log)
+
+    def _report(self):
+        self.plugin._log_report(len(self.missing) + len(self.stale), len(self.missing) + len(self.stale),
+                                self.missing, [], [], self.stale, [], [], 2880)
+        reports = [r for r in self.log.records if "MISSING ENTITIES" in r.getMessage()]
+        self.assertEqual(len(reports), 1)
+        return reports[0].getMessage()
+
+    def test_export_truncates_log(self):
+        report = self._report()
+        self.assertIn("Missing 000", report)
+        self.assertNotIn(f"Missing {plugin.REPORT_LOG_ROWS:03d}", report)
+        self.assertIn("more in the report file", report)
+        files = [f for f in os.listdir(self.folder) if f.startswith("report_")]
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(self.folder, files[0])) as f:
+            self.assertEqual(len(f.read().splitlines()), 1 + len(self.missing) + len(self.stale))
+
+    def test_failing_export_keeps_full_log(self):
+        with mock.patch.object(plugin, "ReportExporter", FailingExporter):
+            report = self._report()
+        for item in self.missing + self.stale:
+            self.assertIn(item["name"], report)
+        self.assertIn("STALE", report)
+        self.assertNotIn("report file", report)
+        self.assertNotIn("Full report", report)
+        warnings = [r for r in self.log.records
+                    if r.levelno == logging.WARNING and "Could not write report file" in r.getMessage()]
+        self.assertEqual(len(warnings), 1)
+        self.assertEqual([f for f in os.listdir(self.folder) if f.startswith("report_")], [])
+
+
+class ReportExporterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = support.temp_dir(self)
+
+    def test_same_second_reports_get_unique_names(self):
+        with mock.patch("report_export.time.strftime", return_value="20261017_120000"):
+            first = ReportExporter(self.folder, "csv", {})
+            second = ReportExporter(self.folder, "csv", {})    # while the first is still open
+            first.row("missing", "One", "light.one", "Not found in HA")
+            first.close()
+            third = ReportExporter(self.folder, "csv", {})     # after the first is in place
+            second.close()
+            third.close()
+        names = [os.path.basename(e.path) for e in (first, second, third)]
+        self.assertEqual(names, ["report_20261017_120000.csv", "report_20261017_120000_2.csv",
+                                 "report_20261017_120000_3.csv"])
+        self.assertEqual(sorted(os.listdir(self.folder)), names)
+        with open(first.path) as f:
+            self.assertIn("light.one", f.read())
+
+        prune_reports(self.folder, keep=1)
+        self.assertEqual(os.listdir(self.folder), ["report_20261017_120000_3.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - mass outage (storm) tests
+####################
+
+import logging
+import unittest
+from unittest import mock
+
+import support
+from fake_ha_server import DOMAINS
+
+DEVICE_TYPES = {
+    "sensor": "HAsensor", "binary_sensor": "HAbinarySensorType", "switch": "HAswitchType",
+    "light": "HAdimmerType", "climate": "HAclimate", "cover": "ha_cover", "lock": "ha_lock",
+    "fan": "ha_fan", "media_player": "ha_media_player",
+}
+DEVICES = 40
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class StormTest(unittest.TestCase):
+    """40 monitored devices; the default 20% threshold trips at 10 transitions."""
+
+    def setUp(self):
+        self.server, self.ha = support.start_fake_ha(DEVICES)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        devices = []
+        for i in range(DEVICES):
+            domain = DOMAINS[i % len(DOMAINS)]
+            devices.append((f"Dev {i}", DEVICE_TYPES[domain], f"{domain}.fake_{i:06d}"))
+        self.entity_ids = [entity_id for _, _, entity_id in devices]
+        self.p = support.make_plugin({"scheduleMode": "continuous", "staleThreshold": "0"},
+                                     port=self.server.server_port, devices=devices)
+        self.log = ListHandler()
+        self.p.logger.addHandler(self.log)
+        self.p.logger.setLevel(logging.INFO)
+        self.addCleanup(self.p.logger.removeHandler, self.log)
+        self.addCleanup(self.p.shutdown)
+        self.p.startup()
+        self.notify = mock.patch.object(self.p.notifier, "notify").start()
+        self.notify_message = mock.patch.object(self.p.notifier, "notify_message").start()
+        self.addCleanup(mock.patch.stopall)
+        self.p._run_check_cycle()
+
+    def set_states(self, entity_ids, state):
+        for entity_id in entity_ids:
+            self.ha.set_state(entity_id, state)
+
+    def messages(self, prefix):
+        return [m for m in self.log.messages if m.startswith(prefix)]
+
+    def sent(self):
+        return [call.args[0].splitlines()[0] for call in self.notify_message.call_args_list]
+
+    def test_outage_held_until_settled(self):
+        down = self.entity_ids[:25]
+        self.set_states(down, "unavailable")
+        self.p._run_check_cycle()
+        self.assertIsNotNone(self.p.storm)
+        self.assertEqual(len(self.messages("MASS OUTAGE:")), 1)
+        self.assertEqual(self.sent(), ["Mass outage: 25 of 40 devices went into a problem state at once "
+                                       "(HA restart or coordinator dropout?)"])
+
+        # Held: nothing committed, no per-device alerts, no second outage alert
+        self.set_states(down[20:], "on")
+        self.p._run_check_cycle()
+        self.p._run_check_cycle()
+        self.assertIsNotNone(self.p.storm)
+        self.assertEqual(self.p.known_problems, {})
+        self.assertEqual(self.messages("NEW PROBLEM"), [])
+        self.assertEqual(self.messages("RECOVERED"), [])
+        self.assertEqual(len(self.messages("MASS OUTAGE:")), 1)
+        self.assertEqual(len(self.sent()), 1)
+        self.notify.assert_not_called()
+
+        # Stable for STORM_SETTLE_SECONDS: the net result is committed in one summary
+        self.p.storm["quiet_since"] -= 100
+        self.p._run_check_cycle()
+        self.assertIsNone(self.p.storm)
+        self.assertEqual(set(self.p.known_problems), set(down[:20]))
+        self.assertEqual(self.messages("MASS OUTAGE OVER"),
+                         ["MASS OUTAGE OVER after 1m: 5 device(s) back to normal, 20 still failing"])
+        self.assertEqual(len(self.messages("NEW PROBLEM")), 20)
+        self.assertEqual(self.sent()[-1], "Mass outage over after 1m: 5 device(s) back to normal, 20 still failing")
+
+        # The devices still failing then come back together: a recovery burst, not a new outage
+        self.set_states(down[:20], "on")
+        self.p._run_check_cycle()
+        self.assertIsNone(self.p.storm)
+        self.assertEqual(self.p.known_problems, {})
+        self.assertEqual(self.messages("MASS RECOVERY"), ["MASS RECOVERY: 20 device(s) back to normal in one check"])
+        self.assertEqual(self.sent()[-1], "Mass recovery: 20 of 40 devices back to normal at once")
+        self.assertEqual(len(self.messages("MASS OUTAGE:")), 1)
+
+    def test_below_threshold_is_reported_per_device(self):
+        self.set_states(self.entity_ids[:5], "unavailable")
+        self.p._run_check_cycle()
+        self.assertIsNone(self.p.storm)
+        self.assertEqual(len(self.messages("NEW PROBLEM")), 5)
+        self.assertEqual(len(self.notify.call_args.args[0]), 5)
+        self.set_states(self.entity_ids[:5], "on")
+        self.p._run_check_cycle()
+        self.assertEqual(len(self.messages("RECOVERED")), 5)
+        self.assertEqual(self.messages("MASS"), [])
+        self.notify_message.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
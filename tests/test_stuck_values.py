@@ -0,0 +1,92 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - stuck value detection tests
+####################
+
+import unittest
+
+import support  # noqa: F401  (sets up the plugin import path)
+from stuck_values import StuckValueTracker
+
+RING = 4
+
+
+class StuckValueTrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = StuckValueTracker(ring_size=RING)
+        self.n = 0
+
+    def feed(self, entity_id, *values, start=0.0):
+        """One sample per value with a fresh last_updated, 60 s apart from `start`."""
+        for i, value in enumerate(values):
+            self.n += 1
+            self.tracker.update(entity_id, value, f"stamp-{self.n}", start + 60 * i)
+
+    def test_stuck_once_ring_is_full(self):
+        self.feed("sensor.a", "21.5", "21.5", "21.5")
+        self.assertIsNone(self.tracker.stuck_seconds("sensor.a", 1000))
+        self.feed("sensor.a", 21.5, start=180)
+        self.assertEqual(self.tracker.stuck_seconds("sensor.a", 1000), 1000)
+        self.assertEqual(self.tracker.value("sensor.a"), 21.5)
+
+    def test_same_last_updated_is_not_a_new_sample(self):
+        for now in range(0, 600, 60):
+            self.tracker.update("sensor.a", "20", "2026-10-17T09:00:00+00:00", now)
+        self.assertIsNone(self.tracker.stuck_seconds("sensor.a", 600))
+        self.assertEqual(self.tracker._count[self.tracker._slots["sensor.a"]], 1)
+
+    def test_changed_value_resets_stuck_time(self):
+        self.feed("sensor.a", 20, 20, 20, 20)
+        self.assertEqual(self.tracker.stuck_seconds("sensor.a", 300), 300)
+        self.feed("sensor.a", 21, start=1000)
+        self.assertIsNone(self.tracker.stuck_seconds("sensor.a", 1100))
+        # Stuck again only once the different value has left the ring
+        self.feed("sensor.a", 21, 21, start=1060)
+        self.assertIsNone(self.tracker.stuck_seconds("sensor.a", 1200))
+        self.feed("sensor.a", 21, start=1180)
+        self.assertEqual(self.tracker.stuck_seconds("sensor.a", 1300), 300)
+
+    def test_value_returning_to_old_reading_is_a_change(self):
+        self.feed("sensor.a", 20, 20, 21, 20, 20, 20)
+        self.assertIsNone(self.tracker.stuck_seconds("sensor.a", 1000))
+        self.feed("sensor.a", 20, start=360)
+        self.assertEqual(self.tracker.stuck_seconds("sensor.a", 1000), 1000 - 180)
+
+    def test_nan_and_non_numeric_ignored(self):
+        self.feed("sensor.a", 20, 20, "unavailable", "nan", None, "None", float("nan"), 20, 20)
+        self.assertEqual(self.tracker.stuck_seconds("sensor.a", 1000), 1000)
+        self.assertEqual(self.tracker._count[self.tracker._slots["sensor.a"]], RING)
+        self.feed("sensor.b", "unknown", "NaN")
+        self.assertNotIn("sensor.b", self.tracker._slots)
+        self.assertIsNone(self.tracker.value("sensor.b"))
+
+    def test_slot_reused_after_retain(self):
+        self.feed("sensor.a", 5, 5, 5, 5)
+        self.feed("sensor.b", 7, 8, 9, 10)
+        memory = self.tracker.memory_bytes()
+        slot_a = self.tracker._slots["sensor.a"]
+        self.tracker.retain({"sensor.b"})
+        self.assertEqual(len(self.tracker), 1)
+        self.assertIsNone(self.tracker.stuck_seconds("sensor.a", 1000))
+
+        # The new entity takes the freed slot with an empty ring, not sensor.a's samples
+        self.feed("climate.c", 19.5, start=2000)
+        self.assertEqual(self.tracker._slots["climate.c"], slot_a)
+        self.assertEqual(self.tracker.memory_bytes(), memory)
+        self.assertIsNone(self.tracker.stuck_seconds("climate.c", 3000))
+        self.assertEqual(self.tracker.value("climate.c"), 19.5)
+        self.feed("climate.c", 19.5, 19.5, 19.5, start=2060)
+        self.assertEqual(self.tracker.stuck_seconds("climate.c", 3000), 1000)
+        self.assertEqual(self.tracker.value("sensor.b"), 10)
+
+    def test_clear(self):
+        self.feed("sensor.a", 1, 1, 1, 1)
+        self.tracker.clear()
+        self.assertEqual(len(self.tracker), 0)
+        self.assertEqual(self.tracker.memory_bytes(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,250 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - check cycle benchmark runner
+#
+# Runs the real plugin.py against tools/fake_indigo and tools/fake_ha_server.py
+# for every combination of device and entity counts, and records per-cycle
+# wall time, peak RSS and peak Python allocations. Each combination runs in
+# a fresh worker process (so peak RSS is per combination) against its own
+# fake HA server process. Results are written as JSON; pass --compare to
+# diff against an earlier run.
+#
+# Usage:
+#     python3 tools/bench_check_cycle.py --devices 100,1000 --entities 1000,10000,100000
+#     python3 tools/bench_check_cycle.py --output after.json --compare before.json
+#     python3 tools/bench_check_cycle.py --entities 5000 --latency-ms 40 --failure-rate 0.05
+####################
+
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from datetime import datetime
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.join(TOOLS_DIR, "..", "HADeviceMonitor.indigoPlugin", "Contents", "Server Plugin")
+
+HA_AGENT_PLUGIN_ID = "no.homeassistant.plugin"
+DEVICE_TYPES = {
+    "sensor": "HAsensor", "binary_sensor": "HAbinarySensorType", "switch": "HAswitchType",
+    "light": "HAdimmerType", "climate": "HAclimate", "cover": "ha_cover", "lock": "ha_lock",
+    "fan": "ha_fan", "media_player": "ha_media_player",
+}
+TOKEN = "bench"
+
+
+# -----------------------------------------------------------------------------
+# Worker: one (devices, entities) combination, in its own process
+# -----------------------------------------------------------------------------
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(args):
+    sys.path[:0] = [os.path.join(TOOLS_DIR, "fake_indigo"), PLUGIN_DIR, TOOLS_DIR]
+    import logging
+    import indigo
+    from fake_ha_server import DOMAINS
+
+    indigo.reset()
+    prefs_path = os.path.join(indigo.server.getInstallFolderPath(), "Preferences", "Plugins",
+                              f"{HA_AGENT_PLUGIN_ID}.indiPref")
+    with open(prefs_path, "w") as f:
+        f.write(f'<?xml version="1.0"?><Prefs><address>127.0.0.1</address><port>{args.port}</port>'
+                f'<use_ssl type="bool">false</use_ssl><haToken>{TOKEN}</haToken></Prefs>')
+
+    # Devices point at existing entities, spread evenly; 1% point at entities HA doesn't have
+    step = max(1, args.entity_count // max(1, args.device_count))
+    for i in range(args.device_count):
+        if i % 100 == 99:
+            entity_id, domain = f"sensor.missing_{i:06d}", "sensor"
+        else:
+            n = (i * step) % args.entity_count
+            domain = DOMAINS[n % len(DOMAINS)]
+            entity_id = f"{domain}.fake_{n:06d}"
+        indigo.add_device(i + 1, f"Device {i}", HA_AGENT_PLUGIN_ID, DEVICE_TYPES[domain], entity_id)
+
+    import plugin
+    prefs = indigo.Dict(scheduleMode="continuous", staleThreshold=str(args.stale_threshold),
+                        fetchMethod=args.fetch_method, logLevel=str(logging.WARNING))
+    p = plugin.Plugin("com.clives.indigoplugin.hadevicemonitor", "HA Device Monitor", "bench", prefs)
+    p.logger.setLevel(logging.ERROR)
+    p.startup()
+
+    for _ in range(args.warmup):
+        p._run_check_cycle(manual=False)
+
+    timings = []
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        p._run_check_cycle(manual=False)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    p._run_check_cycle(manual=False)
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    phases = {name: round(stats["mean_ms"], 2) for name, stats in p.phase_timer.snapshot().items()}
+    p.shutdown()
+    timings.sort()
+    result = {
+        "devices": args.device_count,
+        "entities": args.entity_count,
+        "cycles": len(timings),
+        "cycle_ms_mean": round(statistics.mean(timings), 2),
+        "cycle_ms_p50": round(timings[(len(timings) - 1) // 2], 2),
+        "cycle_ms_p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        "cycle_ms_min": round(timings[0], 2),
+        "peak_alloc_mb": round(peak_alloc / 1e6, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "fetch_strategy": p.primary_instance.last_fetch_strategy,
+        "phase_ms_mean": phases,
+    }
+    print(json.dumps(result))
+
+
+# -----------------------------------------------------------------------------
+# Runner
+# -----------------------------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(entities, args):
+    port = _free_port()
+    cmd = [sys.executable, os.path.join(TOOLS_DIR, "fake_ha_server.py"),
+           "--port", str(port), "--entities", str(entities), "--token", TOKEN,
+           "--churn-interval", "0", "--attribute-bytes", str(args.attribute_bytes),
+           "--latency-ms", str(args.latency_ms), "--failure-rate", str(args.failure_rate)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            req = urllib.request.Request(f"http://127.0.0.1:{port}/api/",
+                                         headers={"Authorization": f"Bearer {TOKEN}"})
+            urllib.request.urlopen(req, timeout=1)
+        except urllib.error.HTTPError:
+            return proc, port   # server is answering
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("fake_ha_server.py exited during startup")
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("fake_ha_server.py did not start")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=TOOLS_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["devices"], r["entities"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    print(f"  {'devices':>8} {'entities':>9}  {'cycle p50 ms':>22}  {'peak RSS MB':>20}  {'peak alloc MB':>20}")
+    for r in results:
+        old = baseline.get((r["devices"], r["entities"]))
+        if old is None:
+            continue
+        cells = []
+        for key in ("cycle_ms_p50", "peak_rss_mb", "peak_alloc_mb"):
+            change = (r[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{old[key]:>8.1f} -> {r[key]:>8.1f} {change:+5.0f}%")
+        print(f"  {r['devices']:>8} {r['entities']:>9}  " + "  ".join(cells))
+
+
+def run_all(args):
+    device_counts = [int(x) for x in args.devices.split(",")]
+    entity_counts = [int(x) for x in args.entities.split(",")]
+    results = []
+    for entities in entity_counts:
+        server, port = _start_server(entities, args)
+        try:
+            for devices in device_counts:
+                cmd = [sys.executable, os.path.abspath(__file__), "--worker",
+                       "--port", str(port), "--device-count", str(devices), "--entity-count", str(entities),
+                       "--cycles", str(args.cycles), "--warmup", str(args.warmup),
+                       "--stale-threshold", str(args.stale_threshold), "--fetch-method", args.fetch_method]
+                proc = subprocess.run(cmd, capture_output=True, text=True,
+                                      env=dict(os.environ, FAKE_INDIGO_INSTALL=tempfile.mkdtemp()))
+                if proc.returncode != 0:
+                    print(f"  {devices} devices / {entities} entities: worker failed\n{proc.stderr}")
+                    continue
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print(f"  {devices:>7} devices {entities:>7} entities: "
+                      f"p50 {result['cycle_ms_p50']:8.1f} ms  p95 {result['cycle_ms_p95']:8.1f} ms  "
+                      f"RSS {result['peak_rss_mb']:7.1f} MB  alloc {result['peak_alloc_mb']:7.2f} MB  "
+                      f"({result['fetch_strategy']})")
+        finally:
+            server.kill()
+            server.wait()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {k: getattr(args, k) for k in (
+                "cycles", "warmup", "attribute_bytes", "latency_ms", "failure_rate",
+                "stale_threshold", "fetch_method")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        _compare(results, args.compare)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HA Device Monitor check cycle benchmark")
+    parser.add_argument("--devices", default="100,1000", help="comma-separated Indigo device counts")
+    parser.add_argument("--entities", default="1000,10000", help="comma-separated HA entity counts (100-100000)")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--attribute-bytes", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--stale-threshold", type=int, default=2880, help="minutes (0 disables the stale check)")
+    parser.add_argument("--fetch-method", choices=("states", "template"), default="states")
+    parser.add_argument("--output", default="bench_check_cycle.json")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    # Internal: worker mode
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--device-count", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--entity-count", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+    else:
+        run_all(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - known problems persistence benchmark
+#
+# Compares the old full rewrite (json.dump indent=2 on every cycle with news)
+# against the append-only journal, for a large tracked-problem set:
+#   - write cost of a burst of cycles that each add/recover a few entities
+#   - startup cost of loading a snapshot, and a snapshot plus a full journal
+#
+# Usage:
+#     python3 tools/bench_problem_journal.py --problems 10000 --cycles 200
+####################
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..",
+                                "HADeviceMonitor.indigoPlugin", "Contents", "Server Plugin"))
+
+from problem_journal import ProblemJournal  # noqa: E402
+
+
+def make_problems(count):
+    return {f"sensor.entity_{i:06d}": {"type": "unavailable", "since": "2026-01-01 00:00:00"}
+            for i in range(count)}
+
+
+def churn(problems, cycle, per_cycle):
+    """Flip `per_cycle` entities this cycle; yields (entity_id, info or None)."""
+    for k in range(per_cycle):
+        entity_id = f"sensor.entity_{(cycle * per_cycle + k) % len(problems):06d}"
+        if entity_id in problems:
+            yield entity_id, None
+        else:
+            yield entity_id, {"type": "stale", "since": "2026-01-01 00:05:00"}
+
+
+def old_write(path, problems, cycles, per_cycle):
+    start = time.perf_counter()
+    for cycle in range(cycles):
+        for entity_id, info in churn(problems, cycle, per_cycle):
+            if info is None:
+                problems.pop(entity_id)
+            else:
+                problems[entity_id] = info
+        with open(path, "w") as f:
+            json.dump(problems, f, indent=2)
+    return time.perf_counter() - start
+
+
+def journal_write(path, problems, cycles, per_cycle):
+    journal = ProblemJournal(path)
+    journal.compact(problems)
+    start = time.perf_counter()
+    for cycle in range(cycles):
+        for entity_id, info in churn(problems, cycle, per_cycle):
+            if info is None:
+                problems.pop(entity_id)
+                journal.delete(entity_id)
+            else:
+                problems[entity_id] = info
+                journal.set(entity_id, info)
+        journal.flush()
+        if journal.needs_compaction(len(problems)):
+            journal.compact(problems)
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return elapsed
+
+
+def timed_load(path):
+    start = time.perf_counter()
+    state, replayed = ProblemJournal(path).load()
+    return len(state), replayed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="known_problems persistence benchmark")
+    parser.add_argument("--problems", type=int, default=10000)
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument("--per-cycle", type=int, default=20, help="transitions per cycle")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "known_problems.json")
+        print(f"{args.problems} tracked problems, {args.cycles} cycles x {args.per_cycle} transitions")
+
+        elapsed = old_write(path, make_problems(args.problems), args.cycles, args.per_cycle)
+        print(f"  {'full rewrite (indent=2)':<28} {elapsed * 1000 / args.cycles:8.2f} ms/cycle  "
+              f"file={os.path.getsize(path) / 1e6:.2f} MB")
+        os.unlink(path)
+
+        elapsed = journal_write(path, make_problems(args.problems), args.cycles, args.per_cycle)
+        print(f"  {'journal append + fsync':<28} {elapsed * 1000 / args.cycles:8.2f} ms/cycle")
+
+        # Startup: snapshot only, then snapshot plus a journal just under the compaction limit
+        journal = ProblemJournal(path)
+        problems = make_problems(args.problems)
+        journal.compact(problems)
+        count, replayed, elapsed = timed_load(path)
+        print(f"  {'load snapshot':<28} {elapsed * 1000:8.2f} ms  ({count} problems)")
+
+        limit = max(journal.compact_min_records, 2 * args.problems)
+        for cycle in range(limit // args.per_cycle):
+            for entity_id, info in churn(problems, cycle, args.per_cycle):
+                if info is None:
+                    problems.pop(entity_id)
+                    journal.delete(entity_id)
+                else:
+                    problems[entity_id] = info
+                    journal.set(entity_id, info)
+            journal.flush()
+        journal.close()
+        count, replayed, elapsed = timed_load(path)
+        print(f"  {'load snapshot + journal':<28} {elapsed * 1000:8.2f} ms  ({count} problems, {replayed} records)")
+        assert count == len(problems)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
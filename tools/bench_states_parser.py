@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - /api/states parser memory benchmark
+#
+# Compares peak Python heap (tracemalloc) of the old approach
+# (resp.read() + json.loads + dict of full entities) against the streaming,
+# field-projecting parser, on a synthetic /api/states payload read from disk
+# the same way the plugin reads the HTTP response.
+#
+# Usage:
+#     python3 tools/bench_states_parser.py --entities 50000 --monitored 500
+####################
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..",
+                                "HADeviceMonitor.indigoPlugin", "Contents", "Server Plugin"))
+
+from ha_api import parse_states_stream  # noqa: E402
+
+
+DOMAINS = ["sensor", "binary_sensor", "switch", "light", "climate", "weather", "media_player", "calendar"]
+
+
+def make_payload(path, count, seed=1):
+    """Write a synthetic /api/states body; weather/media/calendar entities get large attributes."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("[")
+        for i in range(count):
+            domain = DOMAINS[i % len(DOMAINS)]
+            attributes = {"friendly_name": f"Entity {i}", "unit_of_measurement": "C"}
+            if domain == "weather":
+                attributes["forecast"] = [
+                    {"datetime": f"2026-01-{d:02d}T00:00:00+00:00", "temperature": rng.random() * 30,
+                     "condition": "cloudy", "precipitation": rng.random()} for d in range(1, 29)
+                ]
+            elif domain == "media_player":
+                attributes["playlist"] = [f"Track {t} - Artist {t % 17}" for t in range(200)]
+            elif domain == "calendar":
+                attributes["events"] = [{"summary": f"Event {e}", "start": "2026-01-01"} for e in range(50)]
+            entity = {
+                "entity_id": f"{domain}.entity_{i:06d}",
+                "state": "on",
+                "attributes": attributes,
+                "last_changed": "2026-01-01T00:00:00+00:00",
+                "last_updated": "2026-01-01T00:00:00+00:00",
+                "context": {"id": f"{i:026d}", "parent_id": None, "user_id": None},
+            }
+            if i:
+                f.write(",")
+            json.dump(entity, f)
+        f.write("]")
+
+
+def old_parse(path):
+    with open(path, "rb") as resp:
+        data = json.loads(resp.read().decode("utf-8"))
+    entities = {}
+    for entity in data:
+        entities[entity["entity_id"]] = entity
+    return entities
+
+
+def new_parse(path, wanted):
+    with open(path, "rb") as resp:
+        entities, _ = parse_states_stream(resp, wanted)
+    return entities
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(result), peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=50000)
+    parser.add_argument("--monitored", type=int, default=500)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        make_payload(path, args.entities)
+        size_mb = os.path.getsize(path) / 1e6
+        wanted = {f"{DOMAINS[i % len(DOMAINS)]}.entity_{i:06d}"
+                  for i in range(0, args.entities, max(1, args.entities // args.monitored))}
+
+        print(f"Payload: {args.entities} entities, {size_mb:.1f} MB, {len(wanted)} monitored")
+        for label, func, fargs in (
+            ("json.loads + full dicts", old_parse, (path,)),
+            ("streaming, all entities", new_parse, (path, None)),
+            ("streaming, monitored only", new_parse, (path, wanted)),
+        ):
+            kept, peak, elapsed = measure(func, *fargs)
+            print(f"  {label:<28} kept={kept:<7} peak={peak / 1e6:8.1f} MB  time={elapsed:6.2f}s")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
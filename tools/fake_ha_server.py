@@ -0,0 +1,342 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - stand-in Home Assistant server for local testing
+#
+# Serves /api/states (REST) and /api/websocket (auth, get_states,
+# subscribe_events, ping) from a synthetic entity table, and randomly
+# flips entities between healthy and unavailable so the realtime mode
+# can be exercised without a real HA install. Entity count (100 to 100k+),
+# attribute size, response latency and failure rate are configurable for
+# benchmarking (see tools/bench_check_cycle.py).
+#
+# Usage:
+#     python3 tools/fake_ha_server.py --port 8123 --entities 4000 --token test
+#     python3 tools/fake_ha_server.py --entities 100000 --attribute-bytes 2000 \
+#         --latency-ms 50 --failure-rate 0.01 --churn-interval 0
+####################
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+DOMAINS = ["sensor", "binary_sensor", "switch", "light", "climate", "cover", "lock", "fan", "media_player"]
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeHA:
+    """Synthetic entity table shared by the REST and WebSocket handlers."""
+
+    def __init__(self, entity_count, token, attribute_bytes=0):
+        self.token = token
+        self.lock = threading.Lock()
+        self.subscribers = []   # list of (send_func, subscription_id)
+        self.websockets = []    # sockets of open WebSocket connections
+        self.states = {}
+        self._states_body = None    # cached /api/states body (and gzip), dropped on any change
+        self._states_gzip = None
+        stamp = _now_iso()
+        padding = "x" * attribute_bytes
+        for i in range(entity_count):
+            domain = DOMAINS[i % len(DOMAINS)]
+            entity_id = f"{domain}.fake_{i:06d}"
+            attributes = {"friendly_name": f"Fake {i}"}
+            if domain == "climate":
+                attributes["current_temperature"] = 20.0 + (i % 50) / 10
+            if padding:
+                attributes["extra"] = padding
+            self.states[entity_id] = {
+                "entity_id": entity_id,
+                "state": "on",
+                "attributes": attributes,
+                "last_changed": stamp,
+                "last_updated": stamp,
+            }
+
+    def states_json(self):
+        with self.lock:
+            if self._states_body is None:
+                self._states_body = json.dumps(list(self.states.values())).encode("utf-8")
+            return self._states_body
+
+    def states_gzip(self):
+        body = self.states_json()
+        with self.lock:
+            if self._states_gzip is None or self._states_gzip[0] is not body:
+                self._states_gzip = (body, gzip.compress(body, compresslevel=5))
+            return self._states_gzip[1]
+
+    def set_state(self, entity_id, value):
+        with self.lock:
+            old = self.states.get(entity_id)
+            self._states_body = None
+            if value is None:
+                new = None
+                self.states.pop(entity_id, None)
+            else:
+                stamp = _now_iso()
+                new = dict(old or {"entity_id": entity_id, "attributes": {}}, state=value,
+                           last_updated=stamp, last_changed=stamp)
+                self.states[entity_id] = new
+            subscribers = list(self.subscribers)
+        event = {"event_type": "state_changed", "time_fired": _now_iso(),
+                 "data": {"entity_id": entity_id, "old_state": old, "new_state": new}}
+        for send, sub_id in subscribers:
+            try:
+                send({"id": sub_id, "type": "event", "event": event})
+            except OSError:
+                pass
+
+    def drop_websockets(self):
+        """Cut every open WebSocket connection, as an HA restart would."""
+        with self.lock:
+            sockets = list(self.websockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def churn(self, interval, fraction):
+        """Background thread: periodically flip random entities to simulate HA activity."""
+        while True:
+            time.sleep(interval)
+            with self.lock:
+                ids = list(self.states)
+            for entity_id in random.sample(ids, max(1, int(len(ids) * fraction))):
+                state = self.states.get(entity_id, {}).get("state")
+                self.set_state(entity_id, "unavailable" if state == "on" else "on")
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # keep-alive response stalls ~40 ms on Nagle + delayed ACK
+    disable_nagle_algorithm = True
+    ha = None  # set by main()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _authorized(self):
+        return self.headers.get("Authorization", "") == f"Bearer {self.ha.token}"
+
+    def _simulate_conditions(self):
+        """Apply configured latency; returns False if this request should fail with a 500."""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.failure_rate and random.random() < self.server.failure_rate:
+            self._reply(500, b"500: Internal Server Error")
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path == "/api/websocket":
+            self._websocket()
+            return
+        if not self._authorized():
+            self._reply(401, b"401: Unauthorized")
+            return
+        if not self._simulate_conditions():
+            return
+        if self.path == "/api/states":
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                self._reply(200, self.ha.states_gzip(), "application/json", compressed=True)
+            else:
+                self._reply(200, self.ha.states_json(), "application/json")
+            return
+        if self.path.startswith("/api/states/"):
+            entity_id = unquote(self.path[len("/api/states/"):])
+            with self.ha.lock:
+                state = self.ha.states.get(entity_id)
+            if state is None:
+                self._reply(404, b'{"message": "Entity not found."}', "application/json")
+            else:
+                self._reply(200, json.dumps(state).encode("utf-8"), "application/json")
+            return
+        self._reply(404, b"404: Not Found")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self._authorized():
+            self._reply(401, b"401: Unauthorized")
+            return
+        if not self._simulate_conditions():
+            return
+        if self.path == "/api/template" and not self.server.no_template:
+            # No Jinja here: render the plugin's STATES_TEMPLATE projection directly
+            ids = json.loads(body).get("variables", {}).get("ids", [])
+            with self.ha.lock:
+                lines = [str(len(self.ha.states))]
+                for entity_id in ids:
+                    state = self.ha.states.get(entity_id)
+                    if state is None:
+                        lines.append(f"!{entity_id}")
+                    else:
+                        line = f"{entity_id}|{state['state']}|{state['last_updated']}"
+                        if entity_id.startswith("climate."):
+                            temperature = state["attributes"].get("current_temperature")
+                            line += f"|{'' if temperature is None else temperature}"
+                        lines.append(line)
+            self._reply(200, "\n".join(lines).encode("utf-8"))
+            return
+        self._reply(404, b"404: Not Found")
+
+    def _reply(self, code, body, content_type="text/plain", compressed=False):
+        self.send_response(code)
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        elif "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # --- WebSocket -----------------------------------------------------------
+
+    def _websocket(self):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+
+        sock = self.connection
+        send_lock = threading.Lock()
+
+        def send(obj):
+            payload = json.dumps(obj).encode("utf-8")
+            header = bytearray([0x81])
+            if len(payload) < 126:
+                header.append(len(payload))
+            elif len(payload) < 65536:
+                header.append(126)
+                header += struct.pack("!H", len(payload))
+            else:
+                header.append(127)
+                header += struct.pack("!Q", len(payload))
+            with send_lock:
+                sock.sendall(bytes(header) + payload)
+
+        def recv():
+            def exact(n):
+                data = b""
+                while len(data) < n:
+                    chunk = self.rfile.read(n - len(data))
+                    if not chunk:
+                        raise ConnectionError("closed")
+                    data += chunk
+                return data
+            b1, b2 = exact(2)
+            length = b2 & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", exact(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", exact(8))[0]
+            mask = exact(4) if b2 & 0x80 else b"\0\0\0\0"
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(exact(length)))
+            return b1 & 0x0F, payload
+
+        subscription = None
+        with self.ha.lock:
+            self.ha.websockets.append(sock)
+        try:
+            send({"type": "auth_required", "ha_version": "fake"})
+            opcode, payload = recv()
+            msg = json.loads(payload)
+            if msg.get("access_token") != self.ha.token:
+                send({"type": "auth_invalid", "message": "Invalid access token"})
+                return
+            send({"type": "auth_ok", "ha_version": "fake"})
+
+            while True:
+                opcode, payload = recv()
+                if opcode == 0x8:
+                    return
+                if opcode != 0x1:
+                    continue
+                msg = json.loads(payload)
+                msg_id, msg_type = msg.get("id"), msg.get("type")
+                if msg_type == "subscribe_events":
+                    subscription = (send, msg_id)
+                    with self.ha.lock:
+                        self.ha.subscribers.append(subscription)
+                    send({"id": msg_id, "type": "result", "success": True, "result": None})
+                elif msg_type == "get_states":
+                    with self.ha.lock:
+                        states = list(self.ha.states.values())
+                    send({"id": msg_id, "type": "result", "success": True, "result": states})
+                elif msg_type == "ping":
+                    send({"id": msg_id, "type": "pong"})
+                else:
+                    send({"id": msg_id, "type": "result", "success": False,
+                          "error": {"code": "unknown_command", "message": msg_type}})
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            with self.ha.lock:
+                if subscription is not None:
+                    self.ha.subscribers.remove(subscription)
+                self.ha.websockets.remove(sock)
+            self.close_connection = True
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Home Assistant server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--entities", type=int, default=1000)
+    parser.add_argument("--token", default="test")
+    parser.add_argument("--churn-interval", type=float, default=5.0,
+                        help="seconds between random state flips (0 = never)")
+    parser.add_argument("--churn-fraction", type=float, default=0.001)
+    parser.add_argument("--no-template", action="store_true",
+                        help="answer /api/template with 404 to exercise the fallback")
+    parser.add_argument("--attribute-bytes", type=int, default=0,
+                        help="extra attribute payload per entity, to model chatty integrations")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="delay added before every REST response")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="fraction of REST requests answered with HTTP 500")
+    args = parser.parse_args()
+
+    Handler.ha = FakeHA(args.entities, args.token, args.attribute_bytes)
+    if args.churn_interval > 0:
+        threading.Thread(target=Handler.ha.churn, args=(args.churn_interval, args.churn_fraction),
+                         daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.no_template = args.no_template
+    server.latency = args.latency_ms / 1000.0
+    server.failure_rate = args.failure_rate
+    print(f"Fake HA listening on http://{args.host}:{args.port} with {args.entities} entities")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
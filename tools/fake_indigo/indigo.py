@@ -0,0 +1,254 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# HA Device Monitor - in-process stand-in for the Indigo `indigo` module
+#
+# Implements just the parts of the Indigo API the plugin uses (devices,
+# variables and folders, server paths, getPlugin/executeAction, PluginBase
+# with sleep/StopThread and log handlers) so plugin.py can be imported and
+# driven outside Indigo by the benchmarks in tools/.
+#
+# Usage:
+#     sys.path.insert(0, "tools/fake_indigo")
+#     import indigo
+#     indigo.reset(install_folder)      # optional: choose the fake install folder
+#     indigo.add_device(1, "Kitchen Light", "no.homeassistant.plugin", "HAdimmerType", "light.kitchen")
+####################
+
+import itertools
+import logging
+import os
+import tempfile
+import time
+
+
+_install_folder = None
+
+
+def reset(install_folder=None):
+    """Clear all devices/variables/plugins and (re)create the fake install folder layout."""
+    global _install_folder
+    _install_folder = install_folder or tempfile.mkdtemp(prefix="fake_indigo_")
+    os.makedirs(os.path.join(_install_folder, "Preferences", "Plugins"), exist_ok=True)
+    os.makedirs(os.path.join(_install_folder, "Logs"), exist_ok=True)
+    devices.clear()
+    variables.clear()
+    server.plugins.clear()
+
+
+class Dict(dict):
+    pass
+
+
+class List(list):
+    pass
+
+
+# -----------------------------------------------------------------------------
+# Devices
+# -----------------------------------------------------------------------------
+
+class Device:
+    def __init__(self, id, name, pluginId, deviceTypeId, address="", enabled=True):
+        self.id = id
+        self.name = name
+        self.pluginId = pluginId
+        self.deviceTypeId = deviceTypeId
+        self.address = address
+        self.enabled = enabled
+        self.states = {}
+
+
+class _Devices(dict):
+    """id -> Device. Iterating yields devices, like indigo.devices."""
+
+    def __iter__(self):
+        return iter(list(self.values()))
+
+    def iter(self, filter=""):
+        if not filter or filter == "self":
+            return iter(list(self.values()))
+        return iter([d for d in self.values() if d.pluginId == filter])
+
+    def subscribeToChanges(self):
+        pass
+
+
+devices = _Devices()
+
+
+def add_device(id, name, pluginId, deviceTypeId, address="", enabled=True):
+    dev = Device(id, name, pluginId, deviceTypeId, address, enabled)
+    devices[id] = dev
+    return dev
+
+
+# -----------------------------------------------------------------------------
+# Variables
+# -----------------------------------------------------------------------------
+
+class Variable:
+    def __init__(self, id, name, value, folderId=0):
+        self.id = id
+        self.name = name
+        self.value = value
+        self.folderId = folderId
+
+
+class Folder:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class _VariableFolders(list):
+    def create(self, name):
+        folder = Folder(next(_ids), name)
+        self.append(folder)
+        return folder
+
+
+class _Variables(dict):
+    """id -> Variable; also indexable and searchable by name, like indigo.variables."""
+
+    def __init__(self):
+        super().__init__()
+        self.folders = _VariableFolders()
+        self.folder = self.folders     # indigo.variables.folder.create(...)
+        self.writes = 0                # create + updateValue calls, for benchmarks
+
+    def clear(self):
+        super().clear()
+        self.folders.clear()
+        self.writes = 0
+
+    def __iter__(self):
+        return iter(list(self.values()))
+
+    def _by_name(self, name):
+        for var in self.values():
+            if var.name == name:
+                return var
+        return None
+
+    def __contains__(self, key):
+        if isinstance(key, int):
+            return dict.__contains__(self, key)
+        return self._by_name(key) is not None
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return dict.__getitem__(self, key)
+        var = self._by_name(key)
+        if var is None:
+            raise KeyError(key)
+        return var
+
+
+variables = _Variables()
+_ids = itertools.count(1000)
+
+
+class _VariableApi:
+    def create(self, name, value="", folder=0):
+        var = Variable(next(_ids), name, value, folder)
+        dict.__setitem__(variables, var.id, var)
+        variables.writes += 1
+        return var
+
+    def updateValue(self, key, value):
+        variables[key].value = value
+        variables.writes += 1
+
+
+variable = _VariableApi()
+
+
+# -----------------------------------------------------------------------------
+# Server and other plugins
+# -----------------------------------------------------------------------------
+
+class PluginHandle:
+    """Result of indigo.server.getPlugin(); records executeAction calls."""
+
+    def __init__(self, pluginId):
+        self.pluginId = pluginId
+        self.actions = []
+
+    def isEnabled(self):
+        return True
+
+    def executeAction(self, actionId, deviceId=None, props=None):
+        self.actions.append((actionId, deviceId, props))
+
+    def restart(self, waitUntilDone=True):
+        pass
+
+
+class _Server:
+    version = "2025.1"
+    apiVersion = "3.6"
+
+    def __init__(self):
+        self.plugins = {}
+
+    def getInstallFolderPath(self):
+        return _install_folder
+
+    def getLogsFolderPath(self, pluginId=None):
+        path = os.path.join(_install_folder, "Logs", pluginId or "")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def getPlugin(self, pluginId):
+        handle = self.plugins.get(pluginId)
+        if handle is None:
+            handle = self.plugins[pluginId] = PluginHandle(pluginId)
+        return handle
+
+
+server = _Server()
+
+
+# -----------------------------------------------------------------------------
+# PluginBase
+# -----------------------------------------------------------------------------
+
+class PluginBase:
+    class StopThread(Exception):
+        pass
+
+    def __init__(self, pluginId, pluginDisplayName, pluginVersion, pluginPrefs):
+        self.pluginId = pluginId
+        self.pluginDisplayName = pluginDisplayName
+        self.pluginVersion = pluginVersion
+        self.pluginPrefs = pluginPrefs
+        self.logger = logging.getLogger("Plugin")
+        self.logger.setLevel(logging.DEBUG)
+        self.indigo_log_handler = logging.StreamHandler()
+        self.plugin_file_handler = logging.NullHandler()
+        if self.indigo_log_handler not in self.logger.handlers:
+            self.logger.addHandler(self.indigo_log_handler)
+        self.stopThread = False
+
+    def stopConcurrentThread(self):
+        self.stopThread = True
+
+    def sleep(self, seconds):
+        if self.stopThread:
+            raise self.StopThread()
+        time.sleep(seconds)
+        if self.stopThread:
+            raise self.StopThread()
+
+    def deviceCreated(self, dev):
+        pass
+
+    def deviceUpdated(self, origDev, newDev):
+        pass
+
+    def deviceDeleted(self, dev):
+        pass
+
+
+reset(os.environ.get("FAKE_INDIGO_INSTALL"))